@@ -1,3 +1,14 @@
 from django.contrib import admin
+from .models import OutgoingEmail
 
 # Register your models here.
+
+
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to', 'status', 'attempts', 'next_attempt_at', 'sent_at',)
+    list_filter = ('status',)
+    search_fields = ('subject',)
+    list_per_page = 20
+
+
+admin.site.register(OutgoingEmail, OutgoingEmailAdmin)
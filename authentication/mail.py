@@ -0,0 +1,95 @@
+"""DB-backed outbox for account emails.
+
+Views call ``queue_email`` and return straight away; the ``send_queued_mail``
+command drains the outbox over one backend connection per batch and retries
+failures with exponential backoff. Bodies can hold password-reset and
+activation links, so they are blanked once a message is sent or given up on.
+"""
+import datetime
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 5
+RETRY_DELAY = datetime.timedelta(seconds=30)
+# A claimed message is hidden from other workers for this long while it is being sent.
+LEASE = datetime.timedelta(minutes=5)
+
+
+def queue_email(subject, body, from_email, to):
+    return OutgoingEmail.objects.create(subject=subject, body=body, from_email=from_email,
+                                        to=list(to), next_attempt_at=timezone.now())
+
+
+def _claim(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        messages = list(
+            OutgoingEmail.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=OutgoingEmail.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        OutgoingEmail.objects.filter(pk__in=[message.pk for message in messages]) \
+            .update(next_attempt_at=now + LEASE)
+    return messages
+
+
+def _failed(message, error, max_attempts):
+    message.attempts += 1
+    message.last_error = str(error)
+    if message.attempts >= max_attempts:
+        message.status = OutgoingEmail.FAILED
+        message.body = ''
+    else:
+        message.next_attempt_at = timezone.now() + RETRY_DELAY * 2 ** (message.attempts - 1)
+
+
+def _save(message):
+    message.save(update_fields=['body', 'attempts', 'status', 'next_attempt_at', 'last_error', 'sent_at'])
+
+
+def send_pending(batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS, backend=None):
+    """Send one batch of due messages. Returns ``(sent, failed)`` counts.
+
+    If the backend cannot connect, every claimed message counts as one failed
+    attempt and is retried later like any other failure.
+    """
+    messages = _claim(batch_size)
+    if not messages:
+        return 0, 0
+
+    connection = get_connection(backend=backend, fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        for message in messages:
+            _failed(message, e, max_attempts)
+            _save(message)
+        return 0, len(messages)
+
+    sent = failed = 0
+    try:
+        for message in messages:
+            email = EmailMessage(message.subject, message.body, message.from_email, message.to,
+                                 connection=connection)
+            try:
+                email.send(fail_silently=False)
+            except Exception as e:
+                failed += 1
+                _failed(message, e, max_attempts)
+            else:
+                sent += 1
+                message.attempts += 1
+                message.status = OutgoingEmail.SENT
+                message.sent_at = timezone.now()
+                message.last_error = ''
+                message.body = ''
+            _save(message)
+    finally:
+        connection.close()
+    return sent, failed
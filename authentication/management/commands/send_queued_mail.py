@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from authentication import mail
+
+
+class Command(BaseCommand):
+    help = 'Send the emails waiting in the outbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=mail.BATCH_SIZE)
+        parser.add_argument('--max-attempts', type=int, default=mail.MAX_ATTEMPTS)
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of exiting.')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds to sleep when the outbox is empty.')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = mail.send_pending(options['batch_size'], options['max_attempts'])
+            if sent or failed:
+                self.stdout.write(f'Sent {sent}, failed {failed}')
+            if sent + failed < options['batch_size']:
+                if not options['loop']:
+                    return
+                time.sleep(options['interval'])
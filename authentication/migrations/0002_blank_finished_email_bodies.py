@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def blank_bodies(apps, schema_editor):
+    """Drop the bodies, and the links in them, of messages already sent or given up on."""
+    OutgoingEmail = apps.get_model('authentication', 'OutgoingEmail')
+    OutgoingEmail.objects.filter(status__in=['sent', 'failed']).exclude(body='').update(body='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(blank_bodies, migrations.RunPython.noop, elidable=True),
+    ]
@@ -1,3 +1,92 @@
+import datetime
+
+from django.core import mail as outbox
+from django.core.mail.backends.base import BaseEmailBackend
 from django.test import TestCase
+from django.utils import timezone
+
+from . import mail
+from .models import OutgoingEmail
+
+
+class UnreachableBackend(BaseEmailBackend):
+    def open(self):
+        raise ConnectionRefusedError('SMTP server is down')
+
+    def send_messages(self, email_messages):
+        raise AssertionError('send_messages called without a connection')
+
+
+class RejectingBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ValueError('Recipient rejected')
+
+
+class OutboxTests(TestCase):
+    """send_pending delivers due messages and retries failures with backoff."""
+
+    def setUp(self):
+        self.message = mail.queue_email('Welcome', 'Hello', 'noreply@example.com', ['user@example.com'])
+
+    def make_due(self):
+        OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+
+    def test_sends_due_messages(self):
+        sent, failed = mail.send_pending(backend='django.core.mail.backends.locmem.EmailBackend')
+        self.assertEqual((sent, failed), (1, 0))
+        self.assertEqual(len(outbox.outbox), 1)
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.status, OutgoingEmail.SENT)
+        self.assertEqual(self.message.attempts, 1)
+        self.assertEqual(mail.send_pending(), (0, 0))
+
+    def test_finished_messages_keep_no_body(self):
+        link = 'https://example.com/reset/abc123/'
+        self.message.body = f'Reset your password: {link}'
+        self.message.save()
+        mail.send_pending(backend='django.core.mail.backends.locmem.EmailBackend')
+        self.assertIn(link, outbox.outbox[0].body)
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.body, '')
+
+        rejected = mail.queue_email('Reset', f'Reset your password: {link}', 'noreply@example.com',
+                                    ['gone@example.com'])
+        for attempt in range(mail.MAX_ATTEMPTS):
+            mail.send_pending(backend=f'{__name__}.RejectingBackend')
+            rejected.refresh_from_db()
+            self.assertEqual(rejected.body == '', attempt == mail.MAX_ATTEMPTS - 1)
+            self.make_due()
+        self.assertEqual(rejected.status, OutgoingEmail.FAILED)
+
+    def test_failures_back_off_then_give_up(self):
+        backend = f'{__name__}.RejectingBackend'
+        for attempt in range(1, mail.MAX_ATTEMPTS):
+            before = timezone.now()
+            self.assertEqual(mail.send_pending(backend=backend), (0, 1))
+            self.message.refresh_from_db()
+            self.assertEqual(self.message.status, OutgoingEmail.PENDING)
+            self.assertEqual(self.message.attempts, attempt)
+            self.assertEqual(self.message.last_error, 'Recipient rejected')
+            delay = mail.RETRY_DELAY * 2 ** (attempt - 1)
+            self.assertGreaterEqual(self.message.next_attempt_at, before + delay)
+            # Not due again until the delay has passed.
+            self.assertEqual(mail.send_pending(backend=backend), (0, 0))
+            self.make_due()
+
+        self.assertEqual(mail.send_pending(backend=backend), (0, 1))
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.status, OutgoingEmail.FAILED)
+        self.assertEqual(self.message.attempts, mail.MAX_ATTEMPTS)
+        self.make_due()
+        self.assertEqual(mail.send_pending(backend=backend), (0, 0))
 
-# Create your tests here.
+    def test_connection_failure_counts_as_an_attempt(self):
+        other = mail.queue_email('Reset', 'Link', 'noreply@example.com', ['other@example.com'])
+        self.assertEqual(mail.send_pending(backend=f'{__name__}.UnreachableBackend'), (0, 2))
+        for message in (self.message, other):
+            message.refresh_from_db()
+            self.assertEqual(message.status, OutgoingEmail.PENDING)
+            self.assertEqual(message.attempts, 1)
+            self.assertEqual(message.last_error, 'SMTP server is down')
+            self.assertLess(message.next_attempt_at, timezone.now() + mail.LEASE)
+            self.assertGreater(message.next_attempt_at, timezone.now() + datetime.timedelta(seconds=1))
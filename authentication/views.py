@@ -5,13 +5,13 @@ from django.http import JsonResponse
 from django.contrib.auth.models import User
 from validate_email_address import validate_email
 from django.contrib import messages
-from django.core.mail import EmailMessage
 from django.contrib.sites.shortcuts import get_current_site
 from django.utils.encoding import force_bytes, force_str, DjangoUnicodeDecodeError
 from django.core.mail import send_mail
 from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 from django.template.loader import render_to_string
 from .utils import account_activation_token
+from .mail import queue_email
 from django.urls import reverse
 from django.contrib import auth
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
@@ -78,13 +78,12 @@ class RegistrationView(View):
 
                 activate_url = 'http://' + current_site.domain + link
 
-                email = EmailMessage(
+                queue_email(
                     email_subject,
                     'Hi ' + user.username + ', please click the link below to activate your account: \n' + activate_url,
                     'noreply@semycolon.com',
                     [email],
                 )
-                email.send(fail_silently=False)
                 messages.success(request, 'Account successfully created')
                 return render(request, 'authentication/register.html')
 
@@ -171,13 +170,12 @@ class RequestPasswordResetEmail(View):
             reset_url = f'http://{current_site.domain}{link}'
             email_subject = 'Password Reset'
 
-            email = EmailMessage(
+            queue_email(
                 email_subject,
                 f'Hi {user[0].username},\nPlease click the link below to reset your password: {reset_url}',
                 'noreply@domain.com',
                 [email],
             )
-            email.send(fail_silently=False)
 
             messages.success(request, 'Password reset link has been sent to your email')
             return render(request, 'authentication/reset-password.html', context)
@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+
+
+class BenchmarksConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'benchmarks'
+
+    def ready(self):
+        from django.core.signals import request_finished
+        from django.db.backends.signals import connection_created
+
+        from . import connections
+
+        connection_created.connect(connections.connection_opened, dispatch_uid='benchmarks.connection_opened')
+        request_finished.connect(connections.request_finished, dispatch_uid='benchmarks.request_finished')
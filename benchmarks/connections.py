@@ -0,0 +1,126 @@
+"""Per-process database connection metrics.
+
+Every process counts the requests it served and, per database alias, the
+connections it opened. With persistent connections or a pool, the opened
+count stays near the number of threads instead of growing with every request.
+Processes using a psycopg pool also report the pool's own statistics. Like
+the request profiles (see ``profiling``), each process publishes its counts
+to the shared cache, at most every ``FLUSH_INTERVAL`` seconds and at the end
+of a request. ``report`` merges what all processes published. The counts are
+cumulative since each process started.
+"""
+import os
+import threading
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import connections
+
+FLUSH_INTERVAL = 10
+CACHE_TIMEOUT = 60 * 60 * 24
+REGISTRY_KEY = 'benchmarks:connections'
+
+_lock = threading.Lock()
+_process = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+_started = time.time()
+_requests = 0
+# alias -> connections opened by this process
+_opened = {}
+_flushed_at = time.monotonic()
+
+
+def connection_opened(sender, connection, **kwargs):
+    with _lock:
+        _opened[connection.alias] = _opened.get(connection.alias, 0) + 1
+
+
+def opened(alias):
+    """Connections this process has opened to ``alias`` so far."""
+    with _lock:
+        return _opened.get(alias, 0)
+
+
+def request_finished(sender, **kwargs):
+    global _requests
+    with _lock:
+        _requests += 1
+    if time.monotonic() - _flushed_at >= FLUSH_INTERVAL:
+        flush()
+
+
+def pool_stats(alias):
+    """psycopg_pool's statistics for the pool of ``alias``, or None if it is not pooled."""
+    if not connections.settings[alias].get('OPTIONS', {}).get('pool'):
+        return None
+    return connections[alias].pool.get_stats()
+
+
+def describe(alias):
+    """How ``alias`` manages its connections, from its settings."""
+    settings_dict = connections.settings[alias]
+    return {
+        'vendor': connections[alias].vendor,
+        'conn_max_age': settings_dict.get('CONN_MAX_AGE', 0),
+        'health_checks': settings_dict.get('CONN_HEALTH_CHECKS', False),
+        'pooled': bool(settings_dict.get('OPTIONS', {}).get('pool')),
+    }
+
+
+def snapshot():
+    """This process's counts and pool statistics."""
+    with _lock:
+        requests, opened = _requests, dict(_opened)
+    return {
+        'since': _started,
+        'requests': requests,
+        'aliases': {alias: {**describe(alias), 'opened': opened.get(alias, 0), 'pool': pool_stats(alias)}
+                    for alias in connections},
+    }
+
+
+def flush():
+    """Publish this process's snapshot to the shared cache."""
+    global _flushed_at
+    _flushed_at = time.monotonic()
+    cache.set(f'{REGISTRY_KEY}:{_process}', snapshot(), CACHE_TIMEOUT)
+    processes = cache.get(REGISTRY_KEY) or []
+    if _process not in processes:
+        cache.set(REGISTRY_KEY, [*processes, _process], CACHE_TIMEOUT)
+
+
+def report():
+    """``{'processes': {process: snapshot}, 'totals': {alias: ...}}`` over every process."""
+    if _requests:
+        flush()
+    processes = cache.get(REGISTRY_KEY) or []
+    snapshots = cache.get_many([f'{REGISTRY_KEY}:{process}' for process in processes])
+    if len(snapshots) < len(processes):
+        # Drop processes whose snapshots have expired.
+        cache.set(REGISTRY_KEY, [process for process in processes if f'{REGISTRY_KEY}:{process}' in snapshots],
+                  CACHE_TIMEOUT)
+
+    totals = {}
+    for published in snapshots.values():
+        for alias, state in published['aliases'].items():
+            total = totals.setdefault(alias, {'processes': 0, 'requests': 0, 'opened': 0, 'pool': {}})
+            total['processes'] += 1
+            total['requests'] += published['requests']
+            total['opened'] += state['opened']
+            for name, value in (state['pool'] or {}).items():
+                total['pool'][name] = total['pool'].get(name, 0) + value
+    for total in totals.values():
+        total['opened_per_request'] = round(total['opened'] / total['requests'], 3) if total['requests'] else None
+    return {
+        'processes': {key.rsplit(':', 1)[1]: value for key, value in snapshots.items()},
+        'totals': totals,
+    }
+
+
+def ping(alias):
+    """Milliseconds for ``alias`` to answer ``SELECT 1``, connecting first if needed."""
+    started = time.perf_counter()
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+    return round((time.perf_counter() - started) * 1000, 3)
@@ -0,0 +1,158 @@
+"""Drive the real URL routes with concurrent logged-in clients.
+
+Each route is measured in its own phase: ``requests`` requests spread over
+``concurrency`` worker threads. Every user is logged in once up front and
+each thread works on its own copies of those clients, so the workers share
+sessions but no client state. Every request's latency covers the whole
+response body, streamed exports included, and its query count is taken from
+an execute wrapper on the worker's connection. Reports are plain JSON, and
+``compare`` lines two of them up route by route.
+"""
+import copy
+import json
+import queue
+import random
+import threading
+import time
+
+from django.db import close_old_connections, connection, connections
+from django.test import Client
+from django.urls import reverse
+
+from benchmarks import seed
+from benchmarks.utils import percentiles
+
+# Route (URL name) -> (method, request body factory)
+ROUTES = {
+    'expenses': ('get', None),
+    'stats': ('get', None),
+    'expense_category_summary': ('get', None),
+    'search_expenses': ('post', lambda rng: {'searchText': rng.choice(seed.WORDS)[:rng.randint(2, 5)]}),
+    'export-csv': ('get', None),
+    'income': ('get', None),
+    'income_stats': ('get', None),
+    'income_category_summary': ('get', None),
+    'search_income': ('post', lambda rng: {'searchText': rng.choice(seed.WORDS)[:rng.randint(2, 5)]}),
+    'export-income-csv': ('get', None),
+}
+COMPARED = ('throughput_rps', 'p50', 'p95', 'p99', 'queries_mean')
+
+
+def _send(client, route, rng):
+    method, body = ROUTES[route]
+    url = reverse(route)
+    if method == 'post':
+        return client.post(url, json.dumps(body(rng)), content_type='application/json')
+    return client.get(url)
+
+
+def _request(client, route, rng):
+    """``(seconds, queries, ok)`` for one request, reading the body to the end."""
+    queries = 0
+
+    def count(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count):
+        started = time.perf_counter()
+        response = _send(client, route, rng)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        elapsed = time.perf_counter() - started
+        response.close()
+    return elapsed, queries, 200 <= response.status_code < 300
+
+
+def _worker(jobs, samples, sessions, seed_value, own_thread, close_connections):
+    rng = random.Random(seed_value)
+    clients = {}
+    try:
+        while True:
+            try:
+                route, index = jobs.get_nowait()
+            except queue.Empty:
+                return
+            client = clients.get(index)
+            if client is None:
+                client = clients[index] = Client()
+                client.cookies = copy.deepcopy(sessions[index].cookies)
+            if close_connections:
+                # What a server does around each request; the test client skips it.
+                close_old_connections()
+                samples.append(_request(client, route, rng))
+                close_old_connections()
+            else:
+                samples.append(_request(client, route, rng))
+    finally:
+        if own_thread:
+            connections.close_all()
+
+
+def run_route(route, sessions, requests, concurrency=1, seed_value=0, close_connections=False):
+    """Measure ``requests`` requests to ``route`` from ``concurrency`` workers.
+
+    ``sessions`` are logged-in clients (see ``utils.logged_in_client``); the
+    requests cycle through them. ``close_connections`` closes obsolete database
+    connections around every request, as a server would, so ``CONN_MAX_AGE``
+    and pooling take effect. It cannot be used inside a test transaction.
+    """
+    jobs = queue.SimpleQueue()
+    for index in range(requests):
+        jobs.put((route, index % len(sessions)))
+    samples = []
+    started = time.perf_counter()
+    if concurrency <= 1:
+        _worker(jobs, samples, sessions, seed_value, False, close_connections)
+    else:
+        threads = [threading.Thread(target=_worker,
+                                    args=(jobs, samples, sessions, seed_value + n, True, close_connections))
+                   for n in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - started
+
+    queries = [count for _, count, _ in samples]
+    return {
+        'route': route,
+        'requests': len(samples),
+        'errors': sum(1 for _, _, ok in samples if not ok),
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(len(samples) / elapsed, 1) if elapsed else None,
+        **percentiles([seconds for seconds, _, _ in samples]),
+        'queries_mean': round(sum(queries) / len(queries), 1) if queries else None,
+        'queries_max': max(queries, default=None),
+    }
+
+
+def run(sessions, routes, requests, concurrency=1, warmup=0, close_connections=False):
+    """One ``run_route`` result per route, after ``warmup`` untimed requests to each."""
+    results = []
+    for number, route in enumerate(routes):
+        if warmup:
+            run_route(route, sessions, warmup, concurrency, close_connections=close_connections)
+        results.append(run_route(route, sessions, requests, concurrency, seed_value=number * 1000,
+                                 close_connections=close_connections))
+    return results
+
+
+def compare(report, baseline):
+    """Per route and metric, the baseline value, the current one and the change in percent."""
+    before = {result['route']: result for result in baseline.get('results', [])}
+    comparison = {}
+    for result in report['results']:
+        old = before.get(result['route'])
+        if old is None:
+            continue
+        metrics = {}
+        for metric in COMPARED:
+            if result.get(metric) is None or old.get(metric) is None:
+                continue
+            change = round((result[metric] - old[metric]) / old[metric] * 100, 1) if old[metric] else None
+            metrics[metric] = {'before': old[metric], 'after': result[metric], 'change_pct': change}
+        comparison[result['route']] = metrics
+    return comparison
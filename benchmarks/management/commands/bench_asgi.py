@@ -0,0 +1,74 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from benchmarks import seed, servers
+from benchmarks.utils import logged_in_client
+
+# Endpoint -> (sync URL name, async URL name, method, JSON body)
+ENDPOINTS = {
+    'expense_category_summary': ('expense_category_summary', 'async-expense-category-summary', 'GET', None),
+    'income_category_summary': ('income_category_summary', 'async-income-category-summary', 'GET', None),
+    'all_expenses_summary': ('all_expenses_summary', 'async-all-expenses-summary', 'GET', None),
+    'all_income_summary': ('all_income_summary', 'async-all-income-summary', 'GET', None),
+    'search_expenses': ('search_expenses', 'async-search-expenses', 'POST', {'searchText': 'taxi'}),
+    'search_income': ('search_income', 'async-search-income', 'POST', {'searchText': 'salary'}),
+}
+# Server and view flavour pairs; the first two are the comparison that matters.
+PAIRS = ['wsgi-sync', 'asgi-async', 'asgi-sync', 'wsgi-async']
+
+
+class Command(BaseCommand):
+    help = ('Compare JSON endpoint throughput of the sync views under gunicorn (WSGI) with the async '
+            'views under uvicorn (ASGI). Needs gunicorn and uvicorn installed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=4)
+        parser.add_argument('--expenses', type=int, default=5000, help='Expenses per user.')
+        parser.add_argument('--income', type=int, default=500, help='Income rows per user.')
+        parser.add_argument('--endpoints', nargs='+', choices=list(ENDPOINTS), default=list(ENDPOINTS))
+        parser.add_argument('--pairs', nargs='+', choices=PAIRS, default=PAIRS[:2])
+        parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint.')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--workers', type=int, default=2, help='Server worker processes.')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per gunicorn worker.')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--cleanup', action='store_true', help='Delete the benchmark users afterwards.')
+
+    def handle(self, *args, **options):
+        users = [seed.get_user(f'bench-asgi-{n}') for n in range(options['users'])]
+        for user in users:
+            seed.fill(user, options['expenses'], options['income'])
+        sessions = [logged_in_client(user).cookies[settings.SESSION_COOKIE_NAME].value for user in users]
+
+        results = []
+        try:
+            for pair in options['pairs']:
+                server, flavour = pair.split('-')
+                with servers.serve(server, options['port'], options['workers'], options['threads']):
+                    for endpoint in options['endpoints']:
+                        sync_name, async_name, method, body = ENDPOINTS[endpoint]
+                        path = reverse(sync_name if flavour == 'sync' else async_name)
+                        # One untimed round so every worker has warmed its caches.
+                        servers.drive(options['port'], method, path, body, sessions, options['concurrency'],
+                                      options['concurrency'])
+                        results.append({'server': server, 'views': flavour, 'endpoint': endpoint,
+                                        **servers.drive(options['port'], method, path, body, sessions,
+                                                        options['requests'], options['concurrency'])})
+                self.stderr.write(f'{pair} done')
+        except servers.ServerError as e:
+            raise CommandError(str(e))
+        finally:
+            if options['cleanup']:
+                for user in users:
+                    user.delete()
+
+        self.stdout.write(json.dumps({
+            'benchmark': 'asgi',
+            'workers': options['workers'],
+            'threads': options['threads'],
+            'concurrency': options['concurrency'],
+            'results': results,
+        }, indent=2))
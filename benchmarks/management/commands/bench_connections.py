@@ -0,0 +1,96 @@
+import importlib.util
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections as db_connections
+
+from benchmarks import connections, load, seed
+from benchmarks.utils import logged_in_client
+
+# The AJAX requests one chart page fires.
+CHART_ROUTES = ['expense_category_summary', 'income_category_summary', 'stats', 'income_stats']
+MODES = ['per-request', 'persistent', 'pooled']
+
+
+class Command(BaseCommand):
+    help = ('Drive the chart endpoints at a given concurrency with connections closed after every request, '
+            'kept open (CONN_MAX_AGE) and pooled, and report latency and connections opened per request.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=4)
+        parser.add_argument('--expenses', type=int, default=2000, help='Expenses per user.')
+        parser.add_argument('--income', type=int, default=200, help='Income rows per user.')
+        parser.add_argument('--routes', nargs='+', choices=list(load.ROUTES), default=CHART_ROUTES)
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per route and mode.')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--max-age', type=int, default=60, help='CONN_MAX_AGE of the persistent mode.')
+        parser.add_argument('--pool-size', type=int, default=None,
+                            help='max_size of the pool; defaults to the concurrency.')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the benchmark users afterwards.')
+
+    def handle(self, *args, **options):
+        users = [seed.get_user(f'bench-connections-{n}') for n in range(options['users'])]
+        for user in users:
+            seed.fill(user, options['expenses'], options['income'])
+        sessions = [logged_in_client(user) for user in users]
+
+        settings_dict = db_connections.settings[DEFAULT_DB_ALIAS]
+        original = {key: settings_dict.get(key) for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')}
+        original_options = dict(settings_dict.get('OPTIONS', {}))
+        report = []
+        try:
+            for mode in options['modes']:
+                skipped = self._configure(settings_dict, mode, options, original_options)
+                if skipped:
+                    report.append({'mode': mode, 'skipped': skipped})
+                    continue
+                before = connections.opened(DEFAULT_DB_ALIAS)
+                results = load.run(sessions, options['routes'], options['requests'], options['concurrency'],
+                                   close_connections=True)
+                requests = sum(result['requests'] for result in results)
+                opened = connections.opened(DEFAULT_DB_ALIAS) - before
+                entry = {'mode': mode, 'requests': requests, 'connections_opened': opened,
+                         'opened_per_request': round(opened / requests, 3) if requests else None,
+                         'results': results}
+                if mode == 'pooled':
+                    entry['pool'] = connections.pool_stats(DEFAULT_DB_ALIAS)
+                report.append(entry)
+                self.stderr.write(f'{mode} done')
+        finally:
+            self._reset(settings_dict)
+            settings_dict.update(original, OPTIONS=original_options)
+            if options['cleanup']:
+                for user in users:
+                    user.delete()
+
+        self.stdout.write(json.dumps({
+            'benchmark': 'connections',
+            'database': db_connections[DEFAULT_DB_ALIAS].vendor,
+            'concurrency': options['concurrency'],
+            'modes': report,
+        }, indent=2))
+
+    def _reset(self, settings_dict):
+        db_connections.close_all()
+        if settings_dict.get('OPTIONS', {}).get('pool'):
+            db_connections[DEFAULT_DB_ALIAS].close_pool()
+
+    def _configure(self, settings_dict, mode, options, original_options):
+        """Point the default database at ``mode``; returns why it cannot be run, if it cannot."""
+        self._reset(settings_dict)
+        base_options = {key: value for key, value in original_options.items() if key != 'pool'}
+        settings_dict.update(CONN_HEALTH_CHECKS=True, OPTIONS=base_options)
+        if mode == 'per-request':
+            settings_dict['CONN_MAX_AGE'] = 0
+        elif mode == 'persistent':
+            settings_dict['CONN_MAX_AGE'] = options['max_age']
+        else:
+            if settings_dict['ENGINE'] != 'django.db.backends.postgresql':
+                return 'pooling needs PostgreSQL'
+            if importlib.util.find_spec('psycopg_pool') is None:
+                return 'psycopg_pool is not installed'
+            size = options['pool_size'] or options['concurrency']
+            settings_dict.update(CONN_MAX_AGE=0, OPTIONS=dict(
+                base_options, pool={'name': DEFAULT_DB_ALIAS, 'min_size': size, 'max_size': size}))
+        return None
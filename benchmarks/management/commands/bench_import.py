@@ -0,0 +1,53 @@
+import csv
+import datetime
+import io
+import json
+import random
+
+from django.core.management.base import BaseCommand
+
+from benchmarks import seed
+from benchmarks.utils import timed
+from expenses.models import Expense
+from ledger import imports, labels
+from userincome.models import UserIncome
+
+
+class Command(BaseCommand):
+    help = 'Time a bulk CSV import of synthetic expenses or income.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000)
+        parser.add_argument('--income', action='store_true', help='Import income instead of expenses.')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the benchmark user afterwards.')
+
+    def handle(self, *args, **options):
+        model = UserIncome if options['income'] else Expense
+        names = seed.SOURCES if options['income'] else seed.CATEGORIES
+        # Imports only accept existing labels.
+        labels.ensure(model, names)
+        rng = random.Random(0)
+        today = datetime.date.today()
+
+        text = io.StringIO()
+        writer = csv.writer(text)
+        writer.writerow(['Amount', 'Description', 'Source' if options['income'] else 'Category', 'Date'])
+        for _ in range(options['rows']):
+            writer.writerow([round(rng.uniform(1, 500), 2), ' '.join(rng.sample(seed.WORDS, 3)),
+                             rng.choice(names), today - datetime.timedelta(days=rng.randint(0, 730))])
+        upload = io.BytesIO(text.getvalue().encode())
+
+        user = seed.get_user('bench-import')
+        elapsed, result = timed(imports.run, model, user, upload, 'csv')
+        if options['cleanup']:
+            user.delete()
+
+        self.stdout.write(json.dumps({
+            'benchmark': 'import',
+            'model': model.__name__,
+            'rows': options['rows'],
+            'imported': result['imported'],
+            'errors': result['error_count'],
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(result['imported'] / elapsed) if elapsed else None,
+        }, indent=2))
@@ -0,0 +1,64 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from benchmarks import load, seed
+from benchmarks.utils import logged_in_client
+
+
+class Command(BaseCommand):
+    help = ('Seed N users with M expenses and income each, then drive the real URL routes at a given '
+            'concurrency and report throughput, latency percentiles and query counts as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--expenses', type=int, default=5000, help='Expenses per user.')
+        parser.add_argument('--income', type=int, default=500, help='Income rows per user.')
+        parser.add_argument('--days', type=int, default=730, help='How far back the seeded dates go.')
+        parser.add_argument('--routes', nargs='+', choices=list(load.ROUTES), default=list(load.ROUTES))
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per route.')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--warmup', type=int, default=10, help='Untimed requests per route first.')
+        parser.add_argument('--output', help='Also write the report to this file.')
+        parser.add_argument('--baseline', help='A previous report to compare against.')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the benchmark users afterwards.')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as report:
+                    baseline = json.load(report)
+            except (OSError, ValueError) as error:
+                raise CommandError(f'Cannot read baseline {options["baseline"]}: {error}')
+
+        users = [seed.get_user(f'bench-load-{n}') for n in range(options['users'])]
+        for user in users:
+            seed.fill(user, options['expenses'], options['income'], options['days'])
+        self.stderr.write(f'{len(users)} users seeded')
+
+        sessions = [logged_in_client(user) for user in users]
+        results = load.run(sessions, options['routes'], options['requests'], options['concurrency'],
+                           options['warmup'])
+
+        if options['cleanup']:
+            for user in users:
+                user.delete()
+
+        report = {
+            'benchmark': 'load',
+            'database': connection.vendor,
+            'users': options['users'],
+            'expenses_per_user': options['expenses'],
+            'income_per_user': options['income'],
+            'concurrency': options['concurrency'],
+            'results': results,
+        }
+        if baseline is not None:
+            report['comparison'] = load.compare(report, baseline)
+        text = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(text)
+        self.stdout.write(text)
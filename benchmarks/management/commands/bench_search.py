@@ -0,0 +1,50 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+
+from benchmarks import seed
+from benchmarks.utils import percentiles, timed
+from ledger import search
+from ledger.models import SearchToken
+
+
+class Command(BaseCommand):
+    help = 'Measure search latency on a synthetic ledger at increasing row counts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--kind', choices=[SearchToken.EXPENSE, SearchToken.INCOME], default=SearchToken.EXPENSE)
+        parser.add_argument('--username', default='bench-search')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the benchmark user afterwards.')
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        model = search.INDEXED_FIELDS[kind][0]
+        seed_rows = seed.seed_expenses if kind == SearchToken.EXPENSE else seed.seed_income
+        user = seed.get_user(options['username'])
+        rng = random.Random(0)
+        report = []
+
+        for size in sorted(options['rows']):
+            existing = model.objects.filter(owner=user).count()
+            if size > existing:
+                last_id = model.objects.filter(owner=user).aggregate(last=Max('id'))['last'] or 0
+                seed_rows(user, size - existing, seed=size)
+                search.index_rows(kind, model.objects.filter(owner=user, id__gt=last_id))
+
+            samples = []
+            for _ in range(options['queries']):
+                word = rng.choice(seed.WORDS)
+                query = word[:rng.randint(1, len(word))]
+                elapsed, result = timed(search.search, user, kind, query)
+                samples.append(elapsed)
+            report.append({'rows': size, 'queries': len(samples), **percentiles(samples)})
+            self.stderr.write(f'{size} rows done')
+
+        if options['cleanup']:
+            user.delete()
+
+        self.stdout.write(json.dumps({'benchmark': 'search', 'kind': kind, 'results': report}, indent=2))
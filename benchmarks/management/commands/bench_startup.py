@@ -0,0 +1,21 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks import startup
+
+
+class Command(BaseCommand):
+    help = 'Measure django.setup() time and RSS of a fresh worker process against the startup budget.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--check', action='store_true', help='Exit with an error when over budget.')
+
+    def handle(self, *args, **options):
+        result = startup.measure(options['runs'])
+        self.stdout.write(json.dumps({'benchmark': 'startup', **result}, indent=2))
+        if options['check'] and (result['eager_modules']
+                                 or result['seconds'] > startup.STARTUP_SECONDS_BUDGET
+                                 or result['rss_mb'] > startup.STARTUP_RSS_MB_BUDGET):
+            raise CommandError('Worker startup is over budget')
@@ -0,0 +1,66 @@
+import datetime
+import json
+
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+
+from benchmarks import seed
+from benchmarks.utils import logged_in_client, percentiles, timed
+from ledger import rollups
+from ledger.models import ExpenseRollup, IncomeRollup
+
+
+class Command(BaseCommand):
+    help = ('Time the all_expenses_summary and all_income_summary endpoints for one user '
+            'while other tenants\' data grows. Latency should stay flat.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help='Rows owned by the measured user.')
+        parser.add_argument('--tenant-rows', type=int, nargs='+', default=[0, 100_000, 1_000_000],
+                            help='Total rows owned by other tenants at each step.')
+        parser.add_argument('--tenants', type=int, default=10)
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--cleanup', action='store_true', help='Delete the benchmark users afterwards.')
+
+    def handle(self, *args, **options):
+        user = seed.get_user('bench-summary')
+        tenants = [seed.get_user(f'bench-summary-tenant-{n}') for n in range(options['tenants'])]
+        self._fill(user, options['rows'], options['rows'] // 4)
+
+        client = logged_in_client(user)
+        window = {'start': (datetime.date.today() - datetime.timedelta(days=90)).isoformat()}
+        endpoints = [
+            ('all_expenses_summary', {}),
+            ('all_expenses_summary', window),
+            ('all_income_summary', {}),
+            ('all_income_summary', window),
+        ]
+
+        report = []
+        for tenant_rows in sorted(options['tenant_rows']):
+            per_tenant = tenant_rows // max(len(tenants), 1)
+            for tenant in tenants:
+                self._fill(tenant, per_tenant, per_tenant // 4)
+
+            for name, params in endpoints:
+                url = reverse(name)
+                samples = [timed(client.get, url, params)[0] for _ in range(options['requests'])]
+                report.append({'tenant_rows': tenant_rows, 'endpoint': name, 'params': params,
+                               **percentiles(samples)})
+            self.stderr.write(f'{tenant_rows} tenant rows done')
+
+        if options['cleanup']:
+            for owner in [user, *tenants]:
+                owner.delete()
+
+        self.stdout.write(json.dumps({'benchmark': 'summary', 'results': report}, indent=2))
+
+    def _fill(self, owner, expenses, income):
+        existing = owner.expense_set.count()
+        if expenses > existing:
+            seed.seed_expenses(owner, expenses - existing, seed=owner.pk)
+            rollups.rebuild(ExpenseRollup, owner=owner)
+        existing = owner.userincome_set.count()
+        if income > existing:
+            seed.seed_income(owner, income - existing, seed=owner.pk)
+            rollups.rebuild(IncomeRollup, owner=owner)
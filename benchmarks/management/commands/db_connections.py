@@ -0,0 +1,61 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections as db_connections
+
+from benchmarks import connections
+
+
+class Command(BaseCommand):
+    help = ('Print how each database manages its connections, how many every process opened per '
+            'request served, and the psycopg pool statistics of pooled ones.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Print the full report, per process, as JSON.')
+        parser.add_argument('--check', action='store_true',
+                            help='Also run SELECT 1 on every database and fail if one does not answer.')
+
+    def handle(self, *args, **options):
+        report = connections.report()
+        failed = []
+        if options['check']:
+            report['health'] = {}
+            for alias in db_connections:
+                try:
+                    report['health'][alias] = {'ok': True, 'ping_ms': connections.ping(alias)}
+                except DatabaseError as e:
+                    report['health'][alias] = {'ok': False, 'error': str(e)}
+                    failed.append(alias)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self._print(report)
+        if failed:
+            raise CommandError(f'No answer from: {", ".join(failed)}')
+
+    def _print(self, report):
+        for alias in db_connections:
+            state = connections.describe(alias)
+            if state['pooled']:
+                mode = 'pooled'
+            elif state['conn_max_age'] == 0:
+                mode = 'per request'
+            elif state['conn_max_age'] is None:
+                mode = 'persistent (unlimited)'
+            else:
+                mode = f'persistent ({state["conn_max_age"]}s)'
+            checks = 'on' if state['health_checks'] else 'off'
+            self.stdout.write(f'{alias}: {state["vendor"]}, {mode}, health checks {checks}')
+            total = report['totals'].get(alias)
+            if total is None:
+                self.stdout.write('  no metrics published yet; is the cache shared between processes?')
+            else:
+                self.stdout.write(f'  {total["processes"]} processes, {total["requests"]} requests, '
+                                  f'{total["opened"]} connections opened '
+                                  f'({total["opened_per_request"]} per request)')
+                for name, value in sorted(total['pool'].items()):
+                    self.stdout.write(f'  pool {name}: {value}')
+            health = report.get('health', {}).get(alias)
+            if health is not None:
+                self.stdout.write(f'  ping: {health["ping_ms"]} ms' if health['ok'] else f'  ping failed: {health["error"]}')
@@ -0,0 +1,40 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from benchmarks import profiling
+
+
+def _stat(profile, metric, *points):
+    summary = profile.get(metric)
+    if summary is None:
+        return '-'
+    return '/'.join(f'{round(summary[point], 1):g}' for point in points)
+
+
+class Command(BaseCommand):
+    help = 'Print the per-view request profiles collected by ProfilingMiddleware.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', help='Only report URL names containing this text.')
+        parser.add_argument('--json', action='store_true', help='Print the full report, histograms included, as JSON.')
+        parser.add_argument('--reset', action='store_true', help='Clear the collected profiles after printing them.')
+
+    def handle(self, *args, **options):
+        report = {name: profile for name, profile in profiling.report().items()
+                  if not options['view'] or options['view'] in name}
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        elif not report:
+            self.stdout.write('No profiles collected; is PROFILE_SAMPLE_RATE above 0 and the cache shared?')
+        else:
+            self.stdout.write(f'{"view":40} {"requests":>8} {"queries p50/p95":>16} {"sql ms p95":>10} '
+                              f'{"render ms p95":>13} {"total ms p50/p95/p99":>21} {"peak KB p95":>11}')
+            for name, profile in report.items():
+                self.stdout.write(f'{name:40} {profile["total_ms"]["count"]:>8} '
+                                  f'{_stat(profile, "queries", "p50", "p95"):>16} {_stat(profile, "sql_ms", "p95"):>10} '
+                                  f'{_stat(profile, "render_ms", "p95"):>13} '
+                                  f'{_stat(profile, "total_ms", "p50", "p95", "p99"):>21} '
+                                  f'{_stat(profile, "peak_kb", "p95"):>11}')
+        if options['reset']:
+            profiling.reset()
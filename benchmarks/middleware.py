@@ -0,0 +1,95 @@
+import contextlib
+import random
+import threading
+import time
+import tracemalloc
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+
+from . import profiling, templates
+
+# tracemalloc is process-wide, so only one request at a time is traced.
+_tracing = threading.Lock()
+
+
+class ProfilingMiddleware:
+    """Profile a sample of requests into ``benchmarks.profiling``.
+
+    Place it first in ``MIDDLEWARE`` so the timings cover the whole stack.
+    Render times need the ``benchmarks.templates.ProfiledDjangoTemplates``
+    template backend.
+    Under ASGI the ORM runs in threads whose connections this cannot wrap, so
+    async requests are profiled without query counts or SQL time.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        rate = profiling.sample_rate()
+        if not rate or random.random() >= rate:
+            return self.get_response(request)
+        return self.profile(request)
+
+    async def __acall__(self, request):
+        rate = profiling.sample_rate()
+        if not rate or random.random() >= rate:
+            return await self.get_response(request)
+
+        with templates.timed() as render:
+            started = time.perf_counter()
+            try:
+                response = await self.get_response(request)
+            finally:
+                total = time.perf_counter() - started
+        self._record(request, {'render_ms': render[0] * 1000, 'total_ms': total * 1000})
+        return response
+
+    def _record(self, request, metrics):
+        match = request.resolver_match
+        profiling.record(match.view_name if match else '<unresolved>', metrics)
+
+    def profile(self, request):
+        sql = {'queries': 0, 'seconds': 0.0}
+
+        def count_query(execute, sql_text, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql_text, params, many, context)
+            finally:
+                sql['queries'] += 1
+                sql['seconds'] += time.perf_counter() - started
+
+        traced = profiling.trace_allocations() and _tracing.acquire(blocking=False)
+        if traced:
+            tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            with contextlib.ExitStack() as stack:
+                render = stack.enter_context(templates.timed())
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(count_query))
+                response = self.get_response(request)
+        finally:
+            total = time.perf_counter() - started
+            peak = None
+            if traced:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                _tracing.release()
+
+        self._record(request, {
+            'queries': sql['queries'],
+            'sql_ms': sql['seconds'] * 1000,
+            'render_ms': render[0] * 1000,
+            'total_ms': total * 1000,
+            'peak_kb': peak / 1024 if peak is not None else None,
+        })
+        return response
@@ -0,0 +1,159 @@
+"""Per-view request profiles collected by ``ProfilingMiddleware``.
+
+Each sampled request records its query count, SQL time, template render
+time and, when ``PROFILE_ALLOCATIONS`` is on, peak traced allocations. The
+results are folded into fixed-bucket histograms per URL name. Every process
+keeps its own histograms and publishes them to the shared cache at most every
+``FLUSH_INTERVAL`` seconds. ``report`` merges what all processes published.
+
+Only ``PROFILE_SAMPLE_RATE`` of requests are profiled. Unsampled requests
+cost one ``random()`` call. Sampled ones add a few counter updates, unless
+allocation tracing is on, which is expensive and meant for staging.
+"""
+import bisect
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+FLUSH_INTERVAL = 10
+CACHE_TIMEOUT = 60 * 60 * 24
+REGISTRY_KEY = 'benchmarks:profiles'
+EPOCH_KEY = f'{REGISTRY_KEY}:epoch'
+
+# Upper bucket bounds per metric; values above the last bound land in an overflow bucket.
+BUCKETS = {
+    'queries': (0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+    'sql_ms': (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000),
+    'render_ms': (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000),
+    'total_ms': (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000),
+    'peak_kb': (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 65536),
+}
+
+_lock = threading.Lock()
+_process = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+# URL name -> metric -> {'buckets': [...], 'count', 'sum', 'max'}
+_profiles = {}
+_flushed_at = time.monotonic()
+# Changed by ``reset``; a process that sees a new epoch drops what it collected before.
+_UNSET = object()
+_epoch = _UNSET
+
+
+def sample_rate():
+    return getattr(settings, 'PROFILE_SAMPLE_RATE', 0.0)
+
+
+def trace_allocations():
+    return getattr(settings, 'PROFILE_ALLOCATIONS', False)
+
+
+def _histogram(metric):
+    return {'buckets': [0] * (len(BUCKETS[metric]) + 1), 'count': 0, 'sum': 0.0, 'max': 0.0}
+
+
+def record(url_name, metrics):
+    """Fold one request's ``{metric: value}`` into the histograms of ``url_name``."""
+    global _epoch
+    if _epoch is _UNSET:
+        _epoch = cache.get(EPOCH_KEY)
+    with _lock:
+        profile = _profiles.setdefault(url_name, {})
+        for metric, value in metrics.items():
+            if value is None:
+                continue
+            histogram = profile.setdefault(metric, _histogram(metric))
+            histogram['buckets'][bisect.bisect_left(BUCKETS[metric], value)] += 1
+            histogram['count'] += 1
+            histogram['sum'] += value
+            histogram['max'] = max(histogram['max'], value)
+    if time.monotonic() - _flushed_at >= FLUSH_INTERVAL:
+        flush()
+
+
+def flush():
+    """Publish this process's histograms to the shared cache."""
+    global _flushed_at, _epoch
+    epoch = cache.get(EPOCH_KEY)
+    with _lock:
+        if epoch != _epoch:
+            _profiles.clear()
+            _epoch = epoch
+        snapshot = {name: {metric: dict(histogram, buckets=list(histogram['buckets']))
+                           for metric, histogram in profile.items()}
+                    for name, profile in _profiles.items()}
+        _flushed_at = time.monotonic()
+    cache.set(f'{REGISTRY_KEY}:{_process}', snapshot, CACHE_TIMEOUT)
+    processes = cache.get(REGISTRY_KEY) or []
+    if _process not in processes:
+        cache.set(REGISTRY_KEY, [*processes, _process], CACHE_TIMEOUT)
+
+
+def reset():
+    """Forget every process's profiles; the others drop theirs on their next flush."""
+    global _epoch
+    with _lock:
+        _epoch = uuid.uuid4().hex
+        _profiles.clear()
+    cache.set(EPOCH_KEY, _epoch, None)
+    for process in cache.get(REGISTRY_KEY) or []:
+        cache.delete(f'{REGISTRY_KEY}:{process}')
+    cache.delete(REGISTRY_KEY)
+
+
+def _merge(into, histogram):
+    if into is None:
+        return dict(histogram, buckets=list(histogram['buckets']))
+    into['buckets'] = [a + b for a, b in zip(into['buckets'], histogram['buckets'])]
+    into['count'] += histogram['count']
+    into['sum'] += histogram['sum']
+    into['max'] = max(into['max'], histogram['max'])
+    return into
+
+
+def _quantile(metric, histogram, point):
+    """Upper bound of the bucket holding the ``point`` quantile (the max for the overflow bucket)."""
+    rank = point * histogram['count']
+    seen = 0
+    for index, count in enumerate(histogram['buckets']):
+        seen += count
+        if count and seen >= rank:
+            bounds = BUCKETS[metric]
+            return min(bounds[index], histogram['max']) if index < len(bounds) else histogram['max']
+    return histogram['max']
+
+
+def summarize(metric, histogram):
+    return {
+        'count': histogram['count'],
+        'mean': round(histogram['sum'] / histogram['count'], 3) if histogram['count'] else None,
+        'p50': _quantile(metric, histogram, 0.5),
+        'p95': _quantile(metric, histogram, 0.95),
+        'p99': _quantile(metric, histogram, 0.99),
+        'max': round(histogram['max'], 3),
+        'histogram': dict(zip([f'<={bound}' for bound in BUCKETS[metric]] + ['more'], histogram['buckets'])),
+    }
+
+
+def report():
+    """``{url name: {metric: summary}}`` merged over every process, busiest views first."""
+    if _profiles:
+        flush()
+    merged = {}
+    processes = cache.get(REGISTRY_KEY) or []
+    snapshots = cache.get_many([f'{REGISTRY_KEY}:{process}' for process in processes])
+    if len(snapshots) < len(processes):
+        # Drop processes whose snapshots have expired.
+        cache.set(REGISTRY_KEY, [process for process in processes if f'{REGISTRY_KEY}:{process}' in snapshots],
+                  CACHE_TIMEOUT)
+    for snapshot in snapshots.values():
+        for name, profile in snapshot.items():
+            views = merged.setdefault(name, {})
+            for metric, histogram in profile.items():
+                views[metric] = _merge(views.get(metric), histogram)
+    ordered = sorted(merged.items(), key=lambda item: -item[1].get('total_ms', {'count': 0})['count'])
+    return {name: {metric: summarize(metric, histogram) for metric, histogram in profile.items()}
+            for name, profile in ordered}
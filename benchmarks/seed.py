@@ -0,0 +1,108 @@
+"""Synthetic ledger data for the benchmark commands.
+
+Labels are drawn with rough real-world frequencies and each has its own
+typical amount, spread log-normally around it. Rent and salary land on the
+first of a month; everything else is spread evenly over the period.
+"""
+import datetime
+import itertools
+import math
+import random
+
+from django.contrib.auth.models import User
+from django.db.models import Max
+
+from expenses.models import Expense
+from ledger import labels, rollups, search, versions
+from ledger.models import ExpenseRollup, IncomeRollup, SearchToken
+from userincome.models import UserIncome
+
+BATCH_SIZE = 5000
+
+# Label -> (relative frequency, typical amount)
+CATEGORY_PROFILES = {
+    'Food': (30, 25), 'Travel': (8, 60), 'Bills': (8, 90), 'Rent': (2, 1200), 'Education': (2, 150),
+    'Subscription': (6, 12), 'Shopping': (15, 45), 'Health': (4, 60), 'Entertainment': (10, 30),
+    'Other': (15, 20),
+}
+SOURCE_PROFILES = {
+    'Salary': (40, 3500), 'Business': (10, 2000), 'Freelance': (20, 600), 'Investments': (15, 150),
+    'Rental': (5, 900), 'Other': (10, 100),
+}
+MONTHLY = {'Rent', 'Salary'}
+SPREAD = 0.6
+
+CATEGORIES = list(CATEGORY_PROFILES)
+SOURCES = list(SOURCE_PROFILES)
+WORDS = ['grocery', 'market', 'taxi', 'train', 'flight', 'electricity', 'water', 'internet',
+         'tuition', 'books', 'netflix', 'spotify', 'pharmacy', 'doctor', 'cinema', 'concert',
+         'restaurant', 'coffee', 'clothes', 'shoes', 'gift', 'repair', 'insurance', 'fuel',
+         'monthly', 'weekly', 'annual', 'payment', 'invoice', 'bonus', 'refund', 'dividend']
+
+
+def get_user(username):
+    user, created = User.objects.get_or_create(username=username, defaults={'email': f'{username}@example.com'})
+    if created:
+        user.set_unusable_password()
+        user.save()
+    return user
+
+
+def _description(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 4)))
+
+
+def _date(rng, today, days, monthly=False):
+    date = today - datetime.timedelta(days=rng.randint(0, days))
+    return date.replace(day=1) if monthly else date
+
+
+def _rows(model, profiles, count, days, seed):
+    """Yield ``(label, amount, date, description)`` for ``count`` rows drawn from ``profiles``."""
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    resolved = labels.ensure(model, profiles)
+    names = list(profiles)
+    weights = [profiles[name][0] for name in names]
+    for _ in range(count):
+        name = rng.choices(names, weights)[0]
+        amount = round(rng.lognormvariate(math.log(profiles[name][1]), SPREAD), 2)
+        yield resolved[name], max(amount, 0.01), _date(rng, today, days, name in MONTHLY), _description(rng)
+
+
+def seed_expenses(owner, count, days=730, seed=None):
+    rows = _rows(Expense, CATEGORY_PROFILES, count, days, seed)
+    for start in range(0, count, BATCH_SIZE):
+        Expense.objects.bulk_create([
+            Expense(owner=owner, amount=amount, date=date, category=category, descriptions=description)
+            for category, amount, date, description in itertools.islice(rows, BATCH_SIZE)
+        ])
+
+
+def seed_income(owner, count, days=730, seed=None):
+    rows = _rows(UserIncome, SOURCE_PROFILES, count, days, seed)
+    for start in range(0, count, BATCH_SIZE):
+        UserIncome.objects.bulk_create([
+            UserIncome(owner=owner, amount=amount, date=date, source=source, description=description)
+            for source, amount, date, description in itertools.islice(rows, BATCH_SIZE)
+        ])
+
+
+def fill(owner, expenses, income, days=730):
+    """Top ``owner`` up to ``expenses`` and ``income`` rows, with rollups and search index to match.
+
+    ``bulk_create`` skips the signals that normally keep both current and bump
+    the ledger version, so this does all three itself.
+    """
+    for model, wanted, seed_rows, rollup_model, kind in (
+            (Expense, expenses, seed_expenses, ExpenseRollup, SearchToken.EXPENSE),
+            (UserIncome, income, seed_income, IncomeRollup, SearchToken.INCOME)):
+        rows = model.objects.filter(owner=owner)
+        existing = rows.count()
+        if wanted <= existing:
+            continue
+        last_id = rows.aggregate(last=Max('id'))['last'] or 0
+        seed_rows(owner, wanted - existing, days, seed=owner.pk * 31 + existing)
+        rollups.rebuild(rollup_model, owner=owner)
+        search.index_rows(kind, rows.filter(id__gt=last_id))
+        versions.bump(owner.pk)
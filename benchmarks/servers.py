@@ -0,0 +1,116 @@
+"""Run the project under a real WSGI or ASGI server and drive it over HTTP.
+
+``serve`` starts gunicorn (WSGI) or uvicorn (ASGI) on a local port in a
+child process, with the same settings and database as the calling process.
+``drive`` sends requests to it from concurrent threads. Each thread holds
+one keep-alive connection and carries the session cookie of one of the given
+users. Both servers are optional dependencies and only needed here.
+"""
+import contextlib
+import http.client
+import importlib.util
+import json
+import queue
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.utils.crypto import get_random_string
+
+from benchmarks.utils import percentiles
+
+SERVERS = {
+    'wsgi': ('gunicorn', lambda port, workers, threads: [
+        'gunicorn', 'expensewebsite.wsgi:application', '--bind', f'127.0.0.1:{port}',
+        '--workers', str(workers), '--threads', str(threads), '--log-level', 'warning']),
+    'asgi': ('uvicorn', lambda port, workers, threads: [
+        'uvicorn', 'expensewebsite.asgi:application', '--host', '127.0.0.1', '--port', str(port),
+        '--workers', str(workers), '--log-level', 'warning', '--no-access-log']),
+}
+START_TIMEOUT = 30
+
+
+class ServerError(RuntimeError):
+    pass
+
+
+def _wait_for(port, process):
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise ServerError(f'Server exited with status {process.returncode}')
+        with contextlib.suppress(OSError), socket.create_connection(('127.0.0.1', port), timeout=1):
+            return
+        time.sleep(0.2)
+    raise ServerError(f'Server did not listen on port {port} within {START_TIMEOUT}s')
+
+
+@contextlib.contextmanager
+def serve(kind, port, workers=1, threads=1):
+    """Run the project under the ``kind`` server ('wsgi' or 'asgi') until the block exits."""
+    package, command = SERVERS[kind]
+    if importlib.util.find_spec(package) is None:
+        raise ServerError(f'{package} is not installed')
+    process = subprocess.Popen([sys.executable, '-m', *command(port, workers, threads)], cwd=settings.BASE_DIR)
+    try:
+        _wait_for(port, process)
+        yield process
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def _worker(port, jobs, samples, session):
+    csrf = get_random_string(32)
+    headers = {'Cookie': f'{settings.SESSION_COOKIE_NAME}={session}; {settings.CSRF_COOKIE_NAME}={csrf}',
+               'X-CSRFToken': csrf}
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        while True:
+            try:
+                method, path, body = jobs.get_nowait()
+            except queue.Empty:
+                return
+            request_headers = dict(headers, **({'Content-Type': 'application/json'} if body is not None else {}))
+            started = time.perf_counter()
+            try:
+                connection.request(method, path, json.dumps(body) if body is not None else None, request_headers)
+                response = connection.getresponse()
+                response.read()
+                ok = 200 <= response.status < 300
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                ok = False
+            samples.append((time.perf_counter() - started, ok))
+    finally:
+        connection.close()
+
+
+def drive(port, method, path, body, sessions, requests, concurrency):
+    """Send ``requests`` requests from ``concurrency`` threads; returns throughput and latency."""
+    jobs = queue.SimpleQueue()
+    for _ in range(requests):
+        jobs.put((method, path, body))
+    samples = []
+    threads = [threading.Thread(target=_worker, args=(port, jobs, samples, sessions[n % len(sessions)]))
+               for n in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, ok in samples if not ok),
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(len(samples) / elapsed, 1) if elapsed else None,
+        **percentiles([seconds for seconds, _ in samples]),
+    }
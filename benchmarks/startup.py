@@ -0,0 +1,51 @@
+"""Worker startup cost: the time and memory a fresh process spends on ``django.setup()``.
+
+The probe runs in a clean interpreter so nothing the caller already imported
+skews the numbers. It also loads the URLconf, which imports every view module,
+just as a gunicorn worker does before its first request.
+"""
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+
+# Generous enough for a cold container, small enough to catch pandas,
+# sklearn or weasyprint creeping back into import time.
+STARTUP_SECONDS_BUDGET = getattr(settings, 'STARTUP_SECONDS_BUDGET', 1.0)
+STARTUP_RSS_MB_BUDGET = getattr(settings, 'STARTUP_RSS_MB_BUDGET', 100)
+
+# Modules that must only be imported by the code paths that need them.
+LAZY_MODULES = ('numpy', 'pandas', 'sklearn', 'weasyprint')
+
+_PROBE = '''
+import json, resource, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+seconds = time.perf_counter() - started
+print(json.dumps({
+    'seconds': seconds,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'modules': sorted(name for name in sys.modules if name.split('.')[0] in %r),
+}))
+'''
+
+
+def measure(runs=3):
+    """Start ``runs`` fresh interpreters and report the fastest setup and largest RSS."""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE))
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', _PROBE % (LAZY_MODULES,)], env=env,
+                                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        'seconds': round(min(sample['seconds'] for sample in samples), 3),
+        'rss_mb': round(max(sample['rss_mb'] for sample in samples), 1),
+        'eager_modules': sorted({name.split('.')[0] for sample in samples for name in sample['modules']}),
+        'budget': {'seconds': STARTUP_SECONDS_BUDGET, 'rss_mb': STARTUP_RSS_MB_BUDGET},
+    }
@@ -0,0 +1,58 @@
+"""Django template backend that times renders for ``ProfilingMiddleware``.
+
+Only templates rendered through the backend API (``render``,
+``render_to_string``, ``TemplateResponse``) are timed, and only while the
+middleware profiles a sampled request. Includes and extends render inside
+the outer template and are not counted again.
+"""
+import contextlib
+import contextvars
+import time
+
+from django.template.backends.django import DjangoTemplates
+
+# Render time of the request being profiled in this context, or None when it is not sampled.
+_render_seconds = contextvars.ContextVar('render_seconds', default=None)
+_render_depth = contextvars.ContextVar('render_depth', default=0)
+
+
+@contextlib.contextmanager
+def timed():
+    """Add up the render time of the templates rendered in this context into ``spent[0]``."""
+    spent = [0.0]
+    token = _render_seconds.set(spent)
+    try:
+        yield spent
+    finally:
+        _render_seconds.reset(token)
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        spent = _render_seconds.get()
+        if spent is None or _render_depth.get():
+            return self.template.render(context, request)
+        # A template tag rendering another template by name is part of this render.
+        token = _render_depth.set(1)
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            spent[0] += time.perf_counter() - started
+            _render_depth.reset(token)
+
+
+class ProfiledDjangoTemplates(DjangoTemplates):
+    """``DjangoTemplates`` whose templates report their render time to a sampled request."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
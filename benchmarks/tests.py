@@ -0,0 +1,135 @@
+import io
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.template import Template, engines
+from django.template.loader import render_to_string
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from benchmarks import connections, load, profiling, seed, startup, templates
+from benchmarks.utils import logged_in_client
+from ledger import rollups
+from ledger.models import ExpenseRollup, IncomeRollup
+
+
+class StartupBudgetTests(SimpleTestCase):
+    """A worker must boot without the analytics and PDF libraries and within the startup budget."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.result = startup.measure()
+
+    def test_heavy_modules_load_lazily(self):
+        self.assertEqual(self.result['eager_modules'], [])
+
+    def test_setup_time(self):
+        self.assertLessEqual(self.result['seconds'], startup.STARTUP_SECONDS_BUDGET)
+
+    def test_setup_memory(self):
+        self.assertLessEqual(self.result['rss_mb'], startup.STARTUP_RSS_MB_BUDGET)
+
+
+class ProfilingMiddlewareTests(TestCase):
+    """Sampled requests are profiled per URL name; unsampled ones leave no trace."""
+
+    def setUp(self):
+        profiling.reset()
+        self.addCleanup(profiling.reset)
+        self.client.force_login(seed.get_user('profiled'))
+
+    @override_settings(PROFILE_SAMPLE_RATE=1.0)
+    def test_sampled_requests_are_reported(self):
+        for _ in range(3):
+            self.client.get(reverse('stats'))
+        profile = profiling.report()['stats']
+        self.assertEqual(profile['total_ms']['count'], 3)
+        self.assertGreater(profile['queries']['p50'], 0)
+        self.assertGreater(profile['render_ms']['max'], 0)
+        self.assertNotIn('peak_kb', profile)
+
+    @override_settings(PROFILE_SAMPLE_RATE=1.0, PROFILE_ALLOCATIONS=True)
+    def test_allocation_tracing(self):
+        self.client.get(reverse('stats'))
+        self.assertGreater(profiling.report()['stats']['peak_kb']['max'], 0)
+
+    @override_settings(PROFILE_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_are_skipped(self):
+        self.client.get(reverse('stats'))
+        self.assertEqual(profiling.report(), {})
+
+    @override_settings(PROFILE_SAMPLE_RATE=1.0)
+    def test_templates_are_timed_through_the_backend(self):
+        render = Template.render
+        self.client.get(reverse('stats'))
+        self.assertIs(Template.render, render)
+        self.assertFalse(hasattr(Template.render, 'profiled'))
+
+        template = engines['django'].from_string('{{ value }}')
+        self.assertEqual(template.render({'value': 1}), '1')
+        with templates.timed() as spent:
+            self.assertEqual(template.render({'value': 2}), '2')
+            self.assertEqual(render_to_string('partials/messages.html'), render_to_string('partials/messages.html'))
+        self.assertGreater(spent[0], 0)
+
+    @override_settings(PROFILE_SAMPLE_RATE=1.0)
+    def test_report_endpoint_is_staff_only(self):
+        self.assertEqual(self.client.get(reverse('profiles')).status_code, 302)
+        staff = seed.get_user('profiles-staff')
+        staff.is_staff = True
+        staff.save()
+        self.client.force_login(staff)
+        self.assertIn('views', self.client.get(reverse('profiles')).json())
+
+
+class LoadHarnessTests(TestCase):
+    """Seeded users keep rollups in step, and every route answers through the harness."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_fill_keeps_rollups_in_step(self):
+        user = seed.get_user('load-fill')
+        seed.fill(user, 120, 30)
+        seed.fill(user, 150, 30)
+        self.assertEqual(user.expense_set.count(), 150)
+        self.assertEqual(user.userincome_set.count(), 30)
+        self.assertEqual(rollups.validate(ExpenseRollup, owner=user), [])
+        self.assertEqual(rollups.validate(IncomeRollup, owner=user), [])
+
+    def test_every_route_is_measured(self):
+        users = [seed.get_user(f'load-{n}') for n in range(2)]
+        for user in users:
+            seed.fill(user, 40, 10)
+        results = load.run([logged_in_client(user) for user in users], list(load.ROUTES), requests=2)
+        self.assertEqual([result['route'] for result in results], list(load.ROUTES))
+        for result in results:
+            self.assertEqual((result['requests'], result['errors']), (2, 0), result['route'])
+            self.assertGreater(result['queries_max'], 0)
+
+        report = {'results': results}
+        slower = {'results': [dict(result, p95=result['p95'] * 2) for result in results]}
+        self.assertEqual(load.compare(report, slower)['stats']['p95']['change_pct'], -50.0)
+
+
+class ConnectionMetricsTests(TestCase):
+    """Requests and opened connections are counted per process and reported per database."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_requests_are_counted(self):
+        self.client.force_login(seed.get_user('connections'))
+        before = connections.report()['totals'].get('default', {'requests': 0})['requests']
+        self.client.get(reverse('stats'))
+        total = connections.report()['totals']['default']
+        self.assertEqual(total['requests'], before + 1)
+        self.assertEqual(total['pool'], {})
+        self.assertIsNone(connections.pool_stats('default'))
+
+    def test_command_reports_mode_and_health(self):
+        output = io.StringIO()
+        call_command('db_connections', '--check', stdout=output)
+        self.assertIn(f"default: {connections.describe('default')['vendor']}, ", output.getvalue())
+        self.assertIn('ping:', output.getvalue())
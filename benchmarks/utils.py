@@ -0,0 +1,32 @@
+import time
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """Nearest-rank percentiles of ``samples`` in milliseconds."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {f'p{point}': None for point in points}
+    return {
+        f'p{point}': round(ordered[min(len(ordered) - 1, int(len(ordered) * point / 100))] * 1000, 3)
+        for point in points
+    }
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+def logged_in_client(user):
+    """A test client for ``user`` that passes ALLOWED_HOSTS outside the test runner."""
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+
+    try:
+        setup_test_environment()
+    except RuntimeError:
+        pass
+    client = Client()
+    client.force_login(user)
+    return client
@@ -0,0 +1,12 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+
+from . import profiling
+
+
+@staff_member_required
+def profiles(request):
+    """Per-view request profiles from every process, as JSON. ``?reset=1`` (POST) clears them."""
+    if request.method == 'POST' and request.POST.get('reset'):
+        profiling.reset()
+    return JsonResponse({'sample_rate': profiling.sample_rate(), 'views': profiling.report()})
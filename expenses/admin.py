@@ -5,7 +5,8 @@ from .models import Expense, Category
 
 class ExpenseAdmin(admin.ModelAdmin):
     list_display = ('amount', 'descriptions', 'owner', 'category', 'date',)
-    search_fields = ('descriptions', 'category', 'date',)
+    search_fields = ('descriptions', 'category__name', 'date',)
+    list_select_related = ('owner', 'category')
 
     list_per_page = 5
 
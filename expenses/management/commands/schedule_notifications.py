@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from expenses import notifications
+
+
+class Command(BaseCommand):
+    help = 'Write due and expired expense notices into the Notification table. Run daily.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=1,
+                            help='Catch up on windows that changed in this many past days.')
+        parser.add_argument('--full', action='store_true',
+                            help='Recompute notices for every expense instead of only changed windows.')
+
+    def handle(self, *args, **options):
+        written = notifications.schedule(days=options['days'], full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} notifications'))
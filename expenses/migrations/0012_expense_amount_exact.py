@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """First step of moving Expense.amount from float to exact cents.
+
+    The new column is nullable so adding it is a catalog-only change, and
+    0013_backfill_expense_amount_exact fills it in batches.
+    """
+
+    dependencies = [
+        ('expenses', '0011_expense_expense_date_category_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='amount_exact',
+            field=models.DecimalField(decimal_places=2, max_digits=12, null=True),
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations, models
+from django.db.models.functions import Cast, Round
+
+
+def catch_up(apps, schema_editor):
+    """Convert rows written by the old code while the backfill was running."""
+    Expense = apps.get_model('expenses', 'Expense')
+    exact = Round(Cast('amount', models.DecimalField(max_digits=12, decimal_places=2)), 2)
+    Expense.objects.filter(amount_exact__isnull=True).update(amount_exact=exact)
+
+
+class Migration(migrations.Migration):
+    """Swap the exact column in for the float one.
+
+    Dropping and renaming columns only touches the catalog. Setting NOT NULL
+    scans the table once but does not rewrite it.
+    """
+
+    dependencies = [
+        ('expenses', '0013_backfill_expense_amount_exact'),
+    ]
+
+    operations = [
+        migrations.RunPython(catch_up, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='expense',
+            name='amount',
+        ),
+        migrations.RenameField(
+            model_name='expense',
+            old_name='amount_exact',
+            new_name='amount',
+        ),
+        migrations.AlterField(
+            model_name='expense',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, max_digits=12),
+        ),
+    ]
@@ -0,0 +1,43 @@
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.db import migrations, models
+
+FALLBACK = 'Other'
+
+
+def merge_duplicate_categories(apps, schema_editor):
+    """Keep one Category per case-insensitive name so the new unique constraint holds."""
+    Category = apps.get_model('expenses', 'Category')
+    seen = {}
+    for pk, name in Category.objects.order_by('pk').values_list('pk', 'name'):
+        clean = ' '.join(name.split()) or FALLBACK
+        if clean.lower() in seen:
+            Category.objects.filter(pk=pk).delete()
+            continue
+        seen[clean.lower()] = pk
+        if clean != name:
+            Category.objects.filter(pk=pk).update(name=clean)
+
+
+class Migration(migrations.Migration):
+    """First step of turning Expense.category into a foreign key to Category.
+
+    The new column is nullable, and 0016_backfill_expense_category_ref fills it in batches.
+    """
+
+    dependencies = [
+        ('expenses', '0014_expense_amount_decimal'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_categories, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='category',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='expenses_category_name_key'),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='category_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='expenses.category'),
+        ),
+    ]
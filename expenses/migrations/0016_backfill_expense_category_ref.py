@@ -0,0 +1,48 @@
+from django.db import migrations
+from django.db.models import Case, Max, Min, Value, When
+
+BATCH_SIZE = 5000
+FALLBACK = 'Other'
+
+
+def category_ids(apps):
+    """Map every distinct category string in the ledger to a Category id, creating missing ones.
+
+    Strings that differ only in case or spacing share one Category.
+    """
+    Expense = apps.get_model('expenses', 'Expense')
+    Category = apps.get_model('expenses', 'Category')
+    by_key = {name.lower(): pk for pk, name in Category.objects.values_list('pk', 'name')}
+    ids = {}
+    for text in Expense.objects.values_list('category', flat=True).distinct().order_by():
+        clean = ' '.join(text.split()) or FALLBACK
+        if clean.lower() not in by_key:
+            by_key[clean.lower()] = Category.objects.create(name=clean).pk
+        ids[text] = by_key[clean.lower()]
+    return ids
+
+
+def backfill(apps, schema_editor):
+    """Point category_ref at the matching Category, one id range per transaction."""
+    Expense = apps.get_model('expenses', 'Expense')
+    ids = category_ids(apps)
+    if not ids:
+        return
+    category_ref = Case(*[When(category=text, then=Value(pk)) for text, pk in ids.items()])
+    bounds = Expense.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    for start in range(bounds['low'], bounds['high'] + 1, BATCH_SIZE):
+        (Expense.objects
+         .filter(pk__gte=start, pk__lt=start + BATCH_SIZE, category_ref__isnull=True)
+         .update(category_ref_id=category_ref))
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('expenses', '0015_expense_category_ref'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop, elidable=True),
+    ]
@@ -0,0 +1,56 @@
+import importlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The catch-up reuses the batched backfill of the previous migration.
+backfill = importlib.import_module('expenses.migrations.0016_backfill_expense_category_ref')
+
+
+def catch_up(apps, schema_editor):
+    """Link rows written by the old code while the backfill was running."""
+    Expense = apps.get_model('expenses', 'Expense')
+    if Expense.objects.filter(category_ref__isnull=True).exists():
+        backfill.backfill(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+    """Swap the Category foreign key in for the free-text category column."""
+
+    dependencies = [
+        ('expenses', '0016_backfill_expense_category_ref'),
+    ]
+
+    operations = [
+        migrations.RunPython(catch_up, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='expense',
+            name='expense_owner_category_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='expense',
+            name='expense_date_category_idx',
+        ),
+        migrations.RemoveField(
+            model_name='expense',
+            name='category',
+        ),
+        migrations.RenameField(
+            model_name='expense',
+            old_name='category_ref',
+            new_name='category',
+        ),
+        migrations.AlterField(
+            model_name='expense',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='expenses.category'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['owner', 'category', 'date'], name='expense_owner_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['date', 'category'], name='expense_date_category_idx'),
+        ),
+    ]
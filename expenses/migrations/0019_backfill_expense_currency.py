@@ -0,0 +1,29 @@
+from django.db import migrations
+
+
+def backfill(apps, schema_editor):
+    """Stamp each owner's expenses with the currency of their preference, one owner per transaction.
+
+    Amounts were always entered in the currency the user had picked, so that
+    is the best record of what they are in. Owners without a preference keep
+    a blank currency, which is never converted.
+    """
+    Expense = apps.get_model('expenses', 'Expense')
+    UserPreference = apps.get_model('userpreferences', 'UserPreference')
+    for owner_id, label in UserPreference.objects.exclude(currency=None).values_list('user_id', 'currency').iterator():
+        code = label.split(' - ', 1)[0].strip().upper()
+        if len(code) == 3:
+            Expense.objects.filter(owner_id=owner_id, currency='').update(currency=code)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('expenses', '0018_expense_currency'),
+        ('userpreferences', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop, elidable=True),
+    ]
@@ -0,0 +1,65 @@
+import datetime
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+# Frozen copy of the notice rules in expenses.notifications as of this migration.
+NOTIFY_CATEGORIES = ['Bills', 'Education', 'Subscription']
+DUE_AFTER = datetime.timedelta(days=30)
+NOTICE_BEFORE = datetime.timedelta(days=1)
+DUE_MESSAGES = {
+    'Bills': "Your bill is going to be due soon",
+    'Subscription': "Your subscription is going to expire soon",
+    'Education': "Your education-related expense is about to come soon",
+}
+
+
+def _message(category, descriptions, expiry_date, today):
+    if today < expiry_date:
+        prefix = DUE_MESSAGES.get(category, "Your expense is going to expire soon")
+        return f"{prefix}: {descriptions}"
+    return f"Your {category.lower()} related expense has expired: {descriptions}"
+
+
+def backfill(apps, schema_editor):
+    """Write the notices of every expense that has reached its window.
+
+    Expenses stored before notices were precomputed have none, and the daily
+    ``schedule_notifications`` run only looks at the last few days. This is
+    the same as ``schedule_notifications --full``.
+    """
+    Expense = apps.get_model('expenses', 'Expense')
+    Notification = apps.get_model('expenses', 'Notification')
+    today = datetime.date.today()
+    rows = (Expense.objects
+            .filter(category__name__in=NOTIFY_CATEGORIES, date__lte=today - DUE_AFTER + NOTICE_BEFORE)
+            .values_list('id', 'owner_id', 'category__name', 'descriptions', 'date')
+            .iterator(chunk_size=BATCH_SIZE))
+    pending = []
+    for expense_id, owner_id, category, descriptions, date in rows:
+        expiry_date = date + DUE_AFTER
+        pending.append(Notification(owner_id=owner_id, expense_id=expense_id, category=category,
+                                    message=_message(category, descriptions, expiry_date, today),
+                                    expiry_date=expiry_date))
+        if len(pending) >= BATCH_SIZE:
+            _save(Notification, pending)
+            pending = []
+    _save(Notification, pending)
+
+
+def _save(Notification, notices):
+    Notification.objects.bulk_create(notices, update_conflicts=True, unique_fields=['expense'],
+                                     update_fields=['category', 'message', 'expiry_date'])
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('expenses', '0019_backfill_expense_currency'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop, elidable=True),
+    ]
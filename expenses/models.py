@@ -1,22 +1,30 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.db.models.functions import Lower
 from django.utils.timezone import now
 
 
 # Create your models here.
 
 class Expense(models.Model):
-    amount = models.FloatField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
     date = models.DateField(default=now)
     descriptions = models.TextField()
     owner = models.ForeignKey(to=User, on_delete=models.CASCADE)
-    category = models.CharField(max_length=300)
+    category = models.ForeignKey(to='Category', on_delete=models.PROTECT)
+    # ISO code; blank on rows entered before amounts carried a currency.
+    currency = models.CharField(max_length=3, blank=True, default='')
 
     def __str__(self):
-        return self.category
+        return self.category.name
 
     class Meta:
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['owner', 'date', 'id'], name='expense_owner_date_id_idx'),
+            models.Index(fields=['owner', 'category', 'date'], name='expense_owner_category_idx'),
+            models.Index(fields=['date', 'category'], name='expense_date_category_idx'),
+        ]
 
 
 class Category(models.Model):
@@ -24,6 +32,30 @@ class Category(models.Model):
 
     class Meta:
         verbose_name_plural = 'Categories'
+        constraints = [
+            models.UniqueConstraint(Lower('name'), name='expenses_category_name_key'),
+        ]
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+class Notification(models.Model):
+    owner = models.ForeignKey(to=User, on_delete=models.CASCADE)
+    expense = models.ForeignKey(to=Expense, on_delete=models.CASCADE)
+    category = models.CharField(max_length=255)
+    message = models.TextField()
+    expiry_date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    viewed = models.BooleanField(default=False)
+
+    def __str__(self):
+        return self.message
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['expense'], name='notification_one_per_expense'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', 'viewed', 'expiry_date'], name='notification_inbox_idx'),
+        ]
@@ -0,0 +1,123 @@
+"""Precomputed due/expired notices for recurring expenses.
+
+A Bills, Education or Subscription expense falls due ``DUE_AFTER`` days after
+its date: it is announced the day before and reported as expired from then
+on. The ``schedule_notifications`` command writes those notices into
+``Notification`` rows once a day, and saving an expense refreshes its own
+notice, so the notification page only reads a small indexed slice.
+"""
+import datetime
+
+from .models import Expense, Notification
+
+NOTIFY_CATEGORIES = ['Bills', 'Education', 'Subscription']
+DUE_AFTER = datetime.timedelta(days=30)
+NOTICE_BEFORE = datetime.timedelta(days=1)
+BATCH_SIZE = 1000
+# The notification page lists at most this many expired notices.
+MAX_EXPIRED = 50
+
+DUE_MESSAGES = {
+    'Bills': "Your bill is going to be due soon",
+    'Subscription': "Your subscription is going to expire soon",
+    'Education': "Your education-related expense is about to come soon",
+}
+
+
+def _as_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value)
+    return value
+
+
+def build(expense_id, owner_id, category, descriptions, date, today):
+    """The Notification for an expense on ``today``, or None if none is due yet."""
+    expiry_date = date + DUE_AFTER
+    if today < expiry_date - NOTICE_BEFORE:
+        return None
+    if today < expiry_date:
+        prefix = DUE_MESSAGES.get(category, "Your expense is going to expire soon")
+        message = f"{prefix}: {descriptions}"
+    else:
+        message = f"Your {category.lower()} related expense has expired: {descriptions}"
+    return Notification(owner_id=owner_id, expense_id=expense_id, category=category,
+                        message=message, expiry_date=expiry_date)
+
+
+def _save(notices):
+    Notification.objects.bulk_create(
+        notices,
+        update_conflicts=True,
+        unique_fields=['expense'],
+        update_fields=['category', 'message', 'expiry_date'],
+    )
+
+
+def sync_expense(expense, today=None):
+    """Bring one expense's notice in line with its current category and date."""
+    today = today or datetime.date.today()
+    notice = None
+    if expense.category.name in NOTIFY_CATEGORIES:
+        notice = build(expense.pk, expense.owner_id, expense.category.name, expense.descriptions,
+                       _as_date(expense.date), today)
+    if notice is None:
+        Notification.objects.filter(expense_id=expense.pk).delete()
+    else:
+        _save([notice])
+
+
+def sync_many(expenses, today=None):
+    """``sync_expense`` for a batch of expenses in a couple of queries."""
+    today = today or datetime.date.today()
+    notices = []
+    for expense in expenses:
+        if expense.category.name in NOTIFY_CATEGORIES:
+            notice = build(expense.pk, expense.owner_id, expense.category.name, expense.descriptions,
+                           _as_date(expense.date), today)
+            if notice is not None:
+                notices.append(notice)
+    noticed = {notice.expense_id for notice in notices}
+    stale = [expense.pk for expense in expenses if expense.pk not in noticed]
+    for start in range(0, len(stale), 500):
+        Notification.objects.filter(expense_id__in=stale[start:start + 500]).delete()
+    for start in range(0, len(notices), BATCH_SIZE):
+        _save(notices[start:start + BATCH_SIZE])
+
+
+def schedule(today=None, days=1, full=False):
+    """Write the notices whose state changed in the last ``days`` days.
+
+    Only expenses that became due or expired in that window are read, unless
+    ``full`` asks for every expense that has reached its window. Returns the
+    number of notices written.
+    """
+    today = today or datetime.date.today()
+    expenses = Expense.objects.filter(category__name__in=NOTIFY_CATEGORIES,
+                                      date__lte=today - DUE_AFTER + NOTICE_BEFORE)
+    if not full:
+        expenses = expenses.filter(date__gt=today - DUE_AFTER - datetime.timedelta(days=days))
+
+    written = 0
+    pending = []
+    rows = expenses.values_list('id', 'owner_id', 'category__name', 'descriptions', 'date')
+    for row in rows.iterator(chunk_size=BATCH_SIZE):
+        pending.append(build(*row, today))
+        if len(pending) >= BATCH_SIZE:
+            _save(pending)
+            written += len(pending)
+            pending = []
+    _save(pending)
+    return written + len(pending)
+
+
+def unread(owner, today=None):
+    """``(upcoming, expired)`` querysets of ``owner``'s unread notices, latest expiry first."""
+    today = today or datetime.date.today()
+    notices = Notification.objects.filter(
+        owner=owner,
+        viewed=False,
+        expiry_date__lte=today + NOTICE_BEFORE
+    ).order_by('-expiry_date')
+    return notices.filter(expiry_date__gt=today), notices.filter(expiry_date__lte=today)[:MAX_EXPIRED]
@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Expense
+from . import notifications
+
+
+@receiver(post_save, sender=Expense)
+def refresh_notification(sender, instance, **kwargs):
+    notifications.sync_expense(instance)
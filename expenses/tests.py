@@ -1,3 +1,886 @@
-from django.test import TestCase
+import csv
+import datetime
+import decimal
+import gzip
+import importlib
+import io
+import itertools
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from benchmarks import seed
+from expenses import notifications
+from expenses.models import Category, Expense, Notification
+from ledger import (api, dashboard, explain, forecast, fx, imports, labels, pagination, reports, rollups, search,
+                    versions)
+from ledger.models import ExpenseForecast, ExpenseRollup, SearchToken
+from userpreferences.models import UserPreference
+
+
+class ExpenseQueryPlanTests(explain.IndexedQueriesMixin, TestCase):
+    """Every query the expense views send must reach the ledger tables through an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed.get_user('plan-owner')
+        other = seed.get_user('plan-other')
+        for owner in (cls.user, other):
+            seed.seed_expenses(owner, 300, seed=owner.pk)
+            rollups.rebuild(ExpenseRollup, owner=owner)
+            search.rebuild(SearchToken.EXPENSE, owner=owner)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_list_pages(self):
+        self.assertIndexedQueries('get', reverse('expenses'))
+        self.assertIndexedQueries('get', reverse('expenses'), {'size': 25, 'last': 1})
+        self.assertIndexedQueries('get', reverse('dashboard'))
+        self.assertIndexedQueries('get', reverse('dashboard'), {'start': '2020-01-01'})
+        self.assertIndexedQueries('get', reverse('api-dashboard'))
+
+    def test_summaries(self):
+        month = datetime.date.today().month
+        self.assertIndexedQueries('get', reverse('expense_category_summary'))
+        self.assertIndexedQueries('get', reverse('expense_category_summary'), {'month': month})
+        self.assertIndexedQueries('get', reverse('all_expenses_summary'))
+        self.assertIndexedQueries('get', reverse('all_expenses_summary'), {'start': '2020-01-01'})
+        self.assertIndexedQueries('get', reverse('stats'))
+
+    def test_dashboard_aggregates_in_two_queries(self):
+        start, end = dashboard.window({})
+        with self.assertNumQueries(2):
+            data = dashboard.build(self.user, start, end)
+        self.assertEqual(data['totals']['net'], data['totals']['income'] - data['totals']['expenses'])
+        self.assertEqual(data['totals']['expenses'], sum(row['expenses'] for row in data['months']))
+        self.assertEqual([row['date'] for row in data['recent']],
+                         sorted((row['date'] for row in data['recent']), reverse=True))
+
+    def test_search(self):
+        self.assertIndexedQueries('post', reverse('search_expenses'), json.dumps({'searchText': 'taxi'}),
+                                  content_type='application/json')
+
+    def test_notifications_and_export(self):
+        self.assertIndexedQueries('get', reverse('notification'))
+        self.assertIndexedQueries('get', reverse('export-csv'), {'category': 'Bills', 'start': '2020-01-01'})
+
+
+class AsyncEndpointTests(TestCase):
+    """The async JSON endpoints answer exactly like their sync counterparts."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cache.clear()
+        cls.user = seed.get_user('async-owner')
+        seed.fill(cls.user, 200, 0)
+        notifications.schedule(full=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    async def test_summaries_match(self):
+        await self.async_client.aforce_login(self.user)
+        month = {'month': datetime.date.today().month}
+        for sync_name, async_name, params in [
+            ('expense_category_summary', 'async-expense-category-summary', {}),
+            ('expense_category_summary', 'async-expense-category-summary', month),
+            ('all_expenses_summary', 'async-all-expenses-summary', {}),
+            ('all_expenses_summary', 'async-all-expenses-summary', {'start': '2020-01-01'}),
+        ]:
+            with self.subTest(async_name, **params):
+                expected = (await sync_to_async(self.client.get)(reverse(sync_name), params)).json()
+                response = await self.async_client.get(reverse(async_name), params)
+                self.assertEqual(response.json(), expected)
+                self.assertIn('ETag', response)
+
+    async def test_search_and_notifications(self):
+        await self.async_client.aforce_login(self.user)
+        body = json.dumps({'searchText': 'taxi'})
+        expected = (await sync_to_async(self.client.post)(reverse('search_expenses'), body,
+                                                          content_type='application/json')).json()
+        response = await self.async_client.post(reverse('async-search-expenses'), body,
+                                                content_type='application/json')
+        self.assertEqual(response.json(), expected)
+
+        response = await self.async_client.get(reverse('async-notifications'))
+        upcoming, expired = await sync_to_async(lambda: [list(rows) for rows in notifications.unread(self.user)])()
+        self.assertTrue(expired)
+        self.assertEqual([notice['id'] for notice in response.json()['expired']], [notice.pk for notice in expired])
+        self.assertEqual(len(response.json()['upcoming']), len(upcoming))
+
+    def test_revalidation_uses_the_etag_only(self):
+        url = reverse('expense_category_summary')
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT').status_code,
+                         200)
+
+    async def test_month_out_of_range(self):
+        await self.async_client.aforce_login(self.user)
+        for name in ('expense_category_summary', 'async-expense-category-summary',
+                     'income_category_summary', 'async-income-category-summary'):
+            for month in ('0', '-1', '13', 'may'):
+                with self.subTest(name, month=month):
+                    if name.startswith('async-'):
+                        response = await self.async_client.get(reverse(name), {'month': month})
+                    else:
+                        response = await sync_to_async(self.client.get)(reverse(name), {'month': month})
+                    self.assertEqual(response.status_code, 400)
+
+    async def test_search_rejects_bad_page(self):
+        await self.async_client.aforce_login(self.user)
+        body = json.dumps({'searchText': 'taxi', 'page': 'two'})
+        response = await sync_to_async(self.client.post)(reverse('search_expenses'), body,
+                                                          content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = await self.async_client.post(reverse('async-search-expenses'), body,
+                                                content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    async def test_login_required(self):
+        response = await self.async_client.get(reverse('async-all-expenses-summary'))
+        self.assertEqual(response.status_code, 401)
+
+
+class CategoryChoicesTests(TestCase):
+    """The expense forms read categories from the label registry, not the database."""
+
+    def setUp(self):
+        self.client.force_login(seed.get_user('choices-owner'))
+
+    def category_queries(self, url):
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return [query['sql'] for query in captured.captured_queries if 'FROM "expenses_category"' in query['sql']]
+
+    def test_forms_skip_the_database_once_loaded(self):
+        self.category_queries(reverse('add-expenses'))
+        self.assertEqual(self.category_queries(reverse('add-expenses')), [])
+        self.assertEqual(self.category_queries(reverse('expenses')), [])
+
+    def test_saving_a_category_refreshes_the_choices(self):
+        self.category_queries(reverse('add-expenses'))
+        Category.objects.create(name='Gardening')
+        self.assertContains(self.client.get(reverse('add-expenses')), 'Gardening')
+
+    def test_labels_deleted_elsewhere_are_not_trusted(self):
+        gardening = Category.objects.create(name='Gardening')
+        self.category_queries(reverse('add-expenses'))
+        with connection.cursor() as cursor:
+            # As another process would, where this one's signals never run.
+            cursor.execute('DELETE FROM expenses_category WHERE id = %s', [gardening.pk])
+        self.assertIsNone(labels.resolve(Expense, 'Gardening'))
+        self.assertNotContains(self.client.get(reverse('add-expenses')), 'Gardening')
+
+
+class CurrencyConversionTests(TestCase):
+    """Summaries convert every expense into the viewer's preferred currency."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed.get_user('fx-owner')
+        UserPreference.objects.create(user=cls.user, currency='USD - United States Dollar')
+        groceries = labels.ensure(Expense, ['Groceries'])['Groceries']
+        last_month = datetime.date.today().replace(day=1) - datetime.timedelta(days=1)
+        Expense.objects.create(owner=cls.user, amount='10.00', currency='USD', date=last_month,
+                               category=groceries, descriptions='milk')
+        Expense.objects.create(owner=cls.user, amount='100.00', currency='EUR', date=last_month,
+                               category=groceries, descriptions='cheese')
+
+    def setUp(self):
+        # Preferences and converted totals are cached across the rolled-back test transactions.
+        cache.clear()
+        rates = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False)
+        rates.write('date,currency,rate\n2000-01-01,EUR,0.5\n2000-01-01,INR,80\n2099-01-01,EUR,0.25\n')
+        rates.close()
+        self.addCleanup(os.remove, rates.name)
+        fx.load(rates.name)
+        self.addCleanup(fx.load, fx.rates_file())
+        self.client.force_login(self.user)
+
+    def test_rate_lookup(self):
+        day = datetime.date(2024, 6, 1)
+        self.assertEqual(fx.rate('EUR', 'USD', day), 2.0)
+        self.assertEqual(fx.rate('EUR', 'INR', day), 160.0)
+        self.assertEqual(fx.rate('EUR', 'USD', datetime.date(1990, 1, 1)), 2.0)
+        self.assertEqual(fx.rate('EUR', 'USD', datetime.date(2099, 2, 1)), 4.0)
+        self.assertIsNone(fx.rate('GBP', 'USD', day))
+        self.assertIsNone(fx.rate('USD', 'GBP', day))
+
+    def test_summaries_are_converted(self):
+        response = self.client.get(reverse('all_expenses_summary'))
+        self.assertEqual(response.json()['total_expenses'], 210.0)
+        response = self.client.get(reverse('all_expenses_summary'), {'start': '2000-01-01'})
+        self.assertEqual(response.json()['total_expenses'], 210.0)
+        self.assertEqual(response.json()['total_expenses'],
+                         float(sum(rollups.summarize(ExpenseRollup, self.user, currency='USD').values())))
+
+    def test_changing_currency_reconverts(self):
+        self.client.get(reverse('all_expenses_summary'))
+        preference = UserPreference.objects.get(user=self.user)
+        preference.currency = 'EUR - Euro'
+        preference.save()
+        response = self.client.get(reverse('all_expenses_summary'))
+        self.assertEqual(response.json()['total_expenses'], 105.0)
+
+    def test_currencies_without_rates_are_left_out(self):
+        last_month = datetime.date.today().replace(day=1) - datetime.timedelta(days=1)
+        Expense.objects.create(owner=self.user, amount='7.00', currency='GBP', date=last_month,
+                               category=labels.resolve(Expense, 'Groceries'), descriptions='tea')
+        for name in ('all_expenses_summary', 'expense_category_summary'):
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.json()['total_expenses'], 210.0)
+            self.assertEqual(response.json()['unconverted_currencies'], ['GBP'])
+
+        data = dashboard.build(self.user, *dashboard.window({}), currency='USD')
+        self.assertEqual(data['totals']['expenses'], 210)
+        self.assertEqual(data['unconverted_currencies'], ['GBP'])
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, '-7.00 GBP')
+        self.assertContains(response, 'Totals leave out amounts in GBP')
+
+    def test_pdf_report_totals_are_converted(self):
+        last_month = datetime.date.today().replace(day=1) - datetime.timedelta(days=1)
+        Expense.objects.create(owner=self.user, amount='7.00', currency='GBP', date=last_month,
+                               category=labels.resolve(Expense, 'Groceries'), descriptions='tea')
+        context = reports.context(self.user, 'USD')
+        self.assertEqual(context['total'], 210)
+        self.assertEqual(context['unconverted_currencies'], ['GBP'])
+        html = render_to_string(reports.PDF_TEMPLATE, context)
+        self.assertIn('100.00 EUR', html)
+        self.assertIn('7.00 GBP', html)
+        self.assertIn('210.00 USD', html)
+
+        context = reports.context(self.user, None)
+        self.assertEqual(context['subtotals'], [('EUR', 100), ('GBP', 7), ('USD', 10)])
+
+
+class ImportTests(TestCase):
+    """Unreadable bytes and broken CSV lines are reported per row; the rest is imported."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = seed.get_user('import-owner')
+        self.client.force_login(self.user)
+        labels.ensure(Expense, ['Food', 'Travel'])
+
+    def upload(self, content, name='expenses.csv'):
+        upload = SimpleUploadedFile(name, content)
+        return self.client.post(reverse('import-expenses'), {'file': upload})
+
+    def test_undecodable_rows_are_reported(self):
+        response = self.upload(b'Amount,Description,Category,Date\n'
+                               b'12.50,caf\xe9 au lait,Food,2024-01-02\n'
+                               b'3.00,bus ticket,Travel,2024-01-03\n')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['imported'], 1)
+        self.assertEqual(response.json()['errors'], [{'row': 2, 'errors': [imports.NOT_UTF8]}])
+        self.assertEqual(rollups.summarize(ExpenseRollup, self.user), {'Travel': 3})
+
+    def test_malformed_csv_rows_are_reported(self):
+        limit = csv.field_size_limit()
+        self.addCleanup(csv.field_size_limit, limit)
+        csv.field_size_limit(100)
+        response = self.upload(b'Amount,Description,Category,Date\n'
+                               b'1.00,' + b'x' * 200 + b',Food,2024-01-02\n'
+                               b'2.00,lunch,Food,2024-01-03\n')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['imported'], 1)
+        self.assertEqual(response.json()['errors'][0]['row'], 2)
+        self.assertTrue(response.json()['errors'][0]['errors'][0].startswith('Malformed CSV row'))
+
+    def test_unknown_and_blank_categories_are_reported(self):
+        response = self.upload(b'Amount,Description,Category,Date\n'
+                               b'1.00,lunch,  food ,2024-01-02\n'
+                               b'2.00,bribe,Secret Stash,2024-01-03\n'
+                               b'3.00,snack,  ,2024-01-04\n')
+        self.assertEqual(response.json()['imported'], 1)
+        self.assertEqual(response.json()['errors'], [
+            {'row': 3, 'errors': [labels.unknown(Expense, 'Secret Stash')]},
+            {'row': 4, 'errors': ['Category is required']},
+        ])
+        self.assertFalse(Category.objects.filter(name__iexact='Secret Stash').exists())
+
+
+class BatchDeleteTests(TestCase):
+    """Rows deleted through the batch API are accounted for exactly once."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = seed.get_user('batch-owner')
+        self.client.force_login(self.user)
+        bills = labels.ensure(Expense, ['Bills'])['Bills']
+        day = datetime.date.today() - datetime.timedelta(days=40)
+        self.kept = Expense.objects.create(owner=self.user, amount='5.00', date=day, category=bills,
+                                           descriptions='water')
+        self.doomed = [Expense.objects.create(owner=self.user, amount='10.00', date=day, category=bills,
+                                              descriptions='electricity') for _ in range(2)]
+        notifications.schedule(full=True)
+
+    def test_delete(self):
+        response = self.client.post(reverse('api-expenses-batch'),
+                                    json.dumps({'delete': [expense.pk for expense in self.doomed]}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(rollups.summarize(ExpenseRollup, self.user), {'Bills': 5})
+        self.assertFalse(Expense.objects.filter(pk__in=[expense.pk for expense in self.doomed]).exists())
+        self.assertEqual(search.search(self.user, SearchToken.EXPENSE, 'electricity'), [])
+        self.assertEqual(list(Notification.objects.filter(owner=self.user).values_list('expense_id', flat=True)),
+                         [self.kept.pk])
+
+
+class ExpenseFormTests(TestCase):
+    """The add and edit forms validate amounts before saving them."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = seed.get_user('form-owner')
+        self.client.force_login(self.user)
+        Category.objects.create(name='Food')
+
+    def post(self, url, **values):
+        data = {'amount': '12.50', 'description': 'lunch', 'expense_date': '2024-01-02', 'category': 'Food',
+                'currency': ''}
+        data.update(values)
+        return self.client.post(url, data)
+
+    def test_amounts_are_parsed(self):
+        self.assertRedirects(self.post(reverse('add-expenses'), amount=' 12.345 '), reverse('expenses'))
+        expense = Expense.objects.get(owner=self.user)
+        self.assertEqual(expense.amount, decimal.Decimal('12.35'))
+        self.assertRedirects(self.post(reverse('expense-edit', args=[expense.pk]), amount='7'), reverse('expenses'))
+        expense.refresh_from_db()
+        self.assertEqual(expense.amount, decimal.Decimal('7.00'))
+
+    def test_categories_must_exist(self):
+        for category in ('', '  ', 'Made Up'):
+            with self.subTest(category=category):
+                response = self.post(reverse('add-expenses'), category=category)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(list(response.context['messages'])), 1)
+        data = {'amount': '1', 'descriptions': 'x', 'date': '2024-01-02', 'category': 'Made Up'}
+        response = self.client.post(reverse('api-expenses'), json.dumps(data), content_type='application/json')
+        self.assertEqual(response.json(), {'errors': [labels.unknown(Expense, 'Made Up')]})
+        response = self.client.post(reverse('api-expenses-batch'), json.dumps({'create': [data]}),
+                                    content_type='application/json')
+        self.assertEqual(response.json()['errors'], [{'op': 'create', 'index': 0,
+                                                      'errors': [labels.unknown(Expense, 'Made Up')]}])
+        self.assertEqual(list(Category.objects.values_list('name', flat=True)), ['Food'])
+        self.assertFalse(Expense.objects.filter(owner=self.user).exists())
+
+    def test_bad_amounts_are_rejected(self):
+        for amount in ('1e20', 'abc', 'NaN'):
+            with self.subTest(amount=amount):
+                response = self.post(reverse('add-expenses'), amount=amount)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(list(response.context['messages'])), 1)
+        self.assertFalse(Expense.objects.filter(owner=self.user).exists())
+        self.assertEqual(rollups.summarize(ExpenseRollup, self.user), {})
+        self.assertEqual(self.client.get(reverse('expenses')).status_code, 200)
+
+
+class NotificationScheduleTests(TestCase):
+    """The daily run writes the notices whose window changed; --full and the migration write all of them."""
+
+    def setUp(self):
+        self.user = seed.get_user('notice-owner')
+        self.today = datetime.date.today()
+        categories = labels.ensure(Expense, ['Bills', 'Food'])
+        expiry = self.today - notifications.DUE_AFTER
+        self.expenses = {}
+        for name, category, date in (('due', 'Bills', expiry + notifications.NOTICE_BEFORE),
+                                     ('expired', 'Bills', expiry),
+                                     ('old', 'Bills', expiry - datetime.timedelta(days=5)),
+                                     ('later', 'Bills', self.today - datetime.timedelta(days=10)),
+                                     ('food', 'Food', expiry)):
+            self.expenses[name] = Expense.objects.create(owner=self.user, amount='1.00', date=date,
+                                                         category=categories[category], descriptions=name)
+        # As if the expenses predated precomputed notices.
+        Notification.objects.all().delete()
+
+    def noticed(self):
+        return set(Notification.objects.values_list('expense__descriptions', flat=True))
+
+    def test_incremental_window(self):
+        self.assertEqual(notifications.schedule(self.today), 2)
+        self.assertEqual(self.noticed(), {'due', 'expired'})
+        self.assertEqual(Notification.objects.get(expense=self.expenses['due']).message,
+                         'Your bill is going to be due soon: due')
+        self.assertEqual(Notification.objects.get(expense=self.expenses['expired']).message,
+                         'Your bills related expense has expired: expired')
+
+        self.assertEqual(notifications.schedule(self.today, days=6), 3)
+        self.assertEqual(self.noticed(), {'due', 'expired', 'old'})
+
+    def test_full(self):
+        self.assertEqual(notifications.schedule(self.today, full=True), 3)
+        self.assertEqual(self.noticed(), {'due', 'expired', 'old'})
+        # A day later the due bill has expired; its notice is rewritten in place.
+        notifications.schedule(self.today + datetime.timedelta(days=1))
+        notice = Notification.objects.get(expense=self.expenses['due'])
+        self.assertEqual(notice.message, 'Your bills related expense has expired: due')
+        self.assertEqual(Notification.objects.count(), 3)
+
+    def test_migration_backfills_every_notice(self):
+        migration = importlib.import_module('expenses.migrations.0020_backfill_notifications')
+        migration.backfill(apps, None)
+        self.assertEqual(self.noticed(), {'due', 'expired', 'old'})
+        self.assertEqual(
+            set(Notification.objects.values_list('expense_id', 'message', 'expiry_date')),
+            {(notice.expense_id, notice.message, notice.expiry_date)
+             for notice in (notifications.build(expense.pk, self.user.pk, 'Bills', expense.descriptions,
+                                                expense.date, self.today)
+                            for name, expense in self.expenses.items() if name != 'food')
+             if notice is not None})
+
+    def test_expired_list_is_capped(self):
+        bills = labels.resolve(Expense, 'Bills')
+        expiry = self.today - notifications.DUE_AFTER
+        for offset in range(notifications.MAX_EXPIRED + 5):
+            Expense.objects.create(owner=self.user, amount='1.00', category=bills, descriptions=f'bill {offset}',
+                                   date=expiry - datetime.timedelta(days=offset))
+        upcoming, expired = notifications.unread(self.user, self.today)
+        self.assertEqual(list(upcoming), [])
+        expired = list(expired)
+        self.assertEqual(len(expired), notifications.MAX_EXPIRED)
+        self.assertEqual(expired[0].expiry_date, self.today)
+        self.assertEqual([notice.expiry_date for notice in expired],
+                         sorted((notice.expiry_date for notice in expired), reverse=True))
+
+
+class PaginationTests(TestCase):
+    """The expense list pages through (date, id) cursors, ties on the date included."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed.get_user('page-owner')
+        food = labels.ensure(Expense, ['Food'])['Food']
+        today = datetime.date.today()
+        for day in range(3):
+            for _ in range(4):
+                Expense.objects.create(owner=cls.user, amount='1.00', category=food, descriptions='lunch',
+                                       date=today - datetime.timedelta(days=day))
+        cls.newest_first = list(Expense.objects.filter(owner=cls.user).order_by('-date', '-id')
+                                .values_list('id', flat=True))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def page(self, query=''):
+        page = self.client.get(f"{reverse('expenses')}?{query}").context['page_obj']
+        return page, [expense.pk for expense in page]
+
+    def test_walk_forward_and_back(self):
+        page, ids = self.page('size=5')
+        self.assertEqual((page.number, page.num_pages, page.has_previous()), (1, 3, False))
+        seen = [ids]
+        while page.has_next():
+            page, ids = self.page(page.next_query())
+            seen.append(ids)
+        self.assertEqual([len(ids) for ids in seen], [5, 5, 2])
+        self.assertEqual(sum(seen, []), self.newest_first)
+        self.assertEqual(page.number, 3)
+
+        backwards = [ids]
+        while page.has_previous():
+            page, ids = self.page(page.previous_query())
+            backwards.append(ids)
+        self.assertEqual(backwards, seen[::-1])
+        self.assertEqual(page.number, 1)
+
+    def test_last_page(self):
+        page, ids = self.page('size=5&last=1')
+        self.assertEqual(ids, self.newest_first[10:])
+        self.assertEqual((page.number, page.has_next(), page.has_previous()), (3, False, True))
+        page, ids = self.page(page.previous_query())
+        self.assertEqual(ids, self.newest_first[5:10])
+        self.assertEqual(page.number, 2)
+
+    def test_bad_cursor_starts_over(self):
+        for cursor in ('garbage', '2024-13-01.5', '2024-01-01.x', '2024-01-01'):
+            page, ids = self.page(f'size=5&after={cursor}&page=3')
+            self.assertEqual(ids, self.newest_first[:5])
+            self.assertEqual(page.number, 1)
+
+    def test_page_size_is_clamped(self):
+        for size in ('7', '-5', '0', 'many', '1000'):
+            page, ids = self.page(f'size={size}')
+            self.assertEqual(page.page_size, pagination.DEFAULT_PAGE_SIZE)
+            self.assertEqual(ids, self.newest_first[:pagination.DEFAULT_PAGE_SIZE])
+        page, ids = self.page('size=10')
+        self.assertEqual((page.page_size, page.num_pages), (10, 2))
+        self.assertEqual(ids, self.newest_first[:10])
+
+
+class SearchTests(TestCase):
+    """The n-gram index matches prefixes, inner trigrams, amounts and dates, and ranks by field weight."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed.get_user('search-owner')
+        other = seed.get_user('search-other')
+        found = labels.ensure(Expense, ['Food', 'Travel', 'Coffee'])
+        cls.rows = {}
+        for name, owner, category, description, amount, date in (
+                ('lunch', cls.user, 'Food', 'lunch with coffee', '12.50', '2024-03-05'),
+                ('beans', cls.user, 'Coffee', 'beans', '8.00', '2024-03-06'),
+                ('train', cls.user, 'Travel', 'train to Lyon', '42.00', '2023-11-20'),
+                ('latte', cls.user, 'Food', 'latte', '4.25', '2024-01-09'),
+                ('espresso', cls.user, 'Food', 'espresso coffee', '3.10', '2024-01-10'),
+                ('elsewhere', other, 'Coffee', 'coffee', '5.00', '2024-03-05')):
+            cls.rows[name] = Expense.objects.create(owner=owner, category=found[category], descriptions=description,
+                                                    amount=amount, date=datetime.date.fromisoformat(date))
+
+    def found(self, text, **kwargs):
+        return [row['descriptions'] for row in search.search(self.user, SearchToken.EXPENSE, text, **kwargs)]
+
+    def test_matching(self):
+        # One- and two-letter words match as word prefixes only.
+        self.assertEqual(self.found('tr'), ['train to Lyon'])
+        self.assertEqual(self.found('ly'), ['train to Lyon'])
+        self.assertEqual(self.found('yo'), [])
+        # Longer words match anywhere inside a word.
+        self.assertEqual(self.found('ress'), ['espresso coffee'])
+        self.assertEqual(self.found('TRAIN lyon'), ['train to Lyon'])
+        self.assertEqual(self.found('train paris'), [])
+        self.assertEqual(self.found('42'), ['train to Lyon'])
+        self.assertEqual(self.found('12.50'), ['lunch with coffee'])
+        self.assertEqual(self.found('2024-01'), ['espresso coffee', 'latte'])
+        self.assertEqual(self.found(''), [])
+
+    def test_ranking(self):
+        # The category weighs more than the description; ties go to the latest row.
+        self.assertEqual(self.found('coffee'), ['beans', 'espresso coffee', 'lunch with coffee'])
+        self.assertEqual(self.found('coffee', page=2, page_size=2), ['lunch with coffee'])
+        hit = search.search(self.user, SearchToken.EXPENSE, 'beans')[0]
+        self.assertEqual((hit['id'], hit['category'], hit['amount']), (self.rows['beans'].pk, 'Coffee', 8))
+
+    def test_edits_are_reindexed(self):
+        latte = self.rows['latte']
+        latte.descriptions = 'flat white'
+        latte.save()
+        self.assertEqual(self.found('latte'), [])
+        self.assertEqual(self.found('white'), ['flat white'])
+        latte.delete()
+        self.assertEqual(self.found('white'), [])
+
+    def test_migration_matches_the_live_tokenizer(self):
+        migration = importlib.import_module('ledger.migrations.0009_backfill_search_index')
+        SearchToken.objects.all().delete()
+        migration.backfill(apps, None)
+        self.assertEqual(self.found('coffee'), ['beans', 'espresso coffee', 'lunch with coffee'])
+        stored = set(SearchToken.objects.filter(kind=SearchToken.EXPENSE, object_id=self.rows['train'].pk)
+                     .values_list('token', 'weight'))
+        row = {'category__name': 'Travel', 'descriptions': 'train to Lyon', 'amount': decimal.Decimal('42.00'),
+               'date': datetime.date(2023, 11, 20)}
+        self.assertEqual(stored, set(search.document_tokens(SearchToken.EXPENSE, row).items()))
+
+
+class ForecastTests(TestCase):
+    """Forecasts fit each category's monthly series and are refitted after changes inside the window."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = seed.get_user('forecast-owner')
+        self.categories = labels.ensure(Expense, ['Food', 'Travel'])
+        self.first, self.last = forecast.history_window()
+
+    def spend(self, category, amount, month):
+        return Expense.objects.create(owner=self.user, amount=amount, date=month.replace(day=10),
+                                      category=self.categories[category], descriptions=category.lower())
+
+    def months(self):
+        month = self.first
+        while month <= self.last:
+            yield month
+            month = (month + datetime.timedelta(days=32)).replace(day=1)
+
+    def test_fit_recovers_a_seasonal_series(self):
+        months = list(range(1, 13))
+        angles = [2 * math.pi * month / 12 for month in months]
+        series = [[100 + 30 * math.sin(angle) - 10 * math.cos(angle) for angle in angles],
+                  [5.0] * 12,
+                  [-40.0] * 12]
+        target = datetime.date(2025, 3, 1)
+        expected = 100 + 30 * math.sin(2 * math.pi * 3 / 12) - 10 * math.cos(2 * math.pi * 3 / 12)
+        predictions = forecast.fit(series, months, target)
+        self.assertAlmostEqual(predictions[0], expected)
+        self.assertAlmostEqual(predictions[1], 5.0)
+        # Forecasts never go negative.
+        self.assertEqual(predictions[2], 0)
+
+    def test_per_category_forecast(self):
+        for month in self.months():
+            self.spend('Food', '50.00', month)
+            self.spend('Travel', '20.00', month)
+        self.assertEqual(forecast.lookup(self.user), {'total': 70.0, 'categories': {'Food': 50.0, 'Travel': 20.0}})
+
+    def test_too_little_history(self):
+        self.spend('Food', '50.00', self.last)
+        self.assertEqual(forecast.compute(self.user.pk), {'total': 0, 'categories': {}})
+
+    def test_changes_in_the_window_refit_on_next_lookup(self):
+        expenses = [self.spend('Food', '30.00', month) for month in self.months()]
+        self.assertEqual(forecast.lookup(self.user)['total'], 30.0)
+
+        # Saving only drops the stored forecast; the fit waits for the next lookup.
+        for expense in expenses:
+            expense.amount = decimal.Decimal('45.00')
+            expense.save()
+        self.assertFalse(ExpenseForecast.objects.filter(owner=self.user).exists())
+        self.assertEqual(forecast.lookup(self.user)['total'], 45.0)
+
+        for expense in expenses[:-3]:
+            expense.delete()
+        self.assertFalse(ExpenseForecast.objects.filter(owner=self.user).exists())
+        self.assertEqual(forecast.lookup(self.user)['total'], 45.0)
+        expenses[-3].delete()
+        self.assertEqual(forecast.lookup(self.user), {'total': 0, 'categories': {}})
+
+    def test_changes_outside_the_window_keep_the_forecast(self):
+        for month in self.months():
+            self.spend('Food', '30.00', month)
+        forecast.lookup(self.user)
+        self.spend('Food', '999.00', self.first - datetime.timedelta(days=40))
+        self.assertTrue(ExpenseForecast.objects.filter(owner=self.user).exists())
+        self.assertEqual(forecast.lookup(self.user)['total'], 30.0)
+
+
+class ApiTests(TestCase):
+    """The JSON API takes API keys without CSRF, revalidates with ETags and applies batches atomically."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = seed.get_user('api-owner')
+        self.categories = labels.ensure(Expense, ['Food', 'Travel'])
+        self.key = api.create_token(self.user, 'script')
+        self.client = Client(enforce_csrf_checks=True, headers={'Authorization': f'Bearer {self.key}'})
+
+    def post(self, name, payload, client=None):
+        return (client or self.client).post(reverse(name), json.dumps(payload), content_type='application/json')
+
+    def expense(self, description, amount='1.00', category='Food'):
+        return Expense.objects.create(owner=self.user, amount=amount, date=datetime.date(2024, 5, 1),
+                                      category=self.categories[category], descriptions=description)
+
+    def test_api_keys_skip_csrf(self):
+        response = self.post('api-expenses', {'amount': '12.50', 'descriptions': 'lunch', 'category': 'food',
+                                              'date': '2024-05-02'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['category'], 'Food')
+        self.assertTrue(Expense.objects.filter(owner=self.user, descriptions='lunch').exists())
+        response = self.post('async-search-expenses', {'searchText': 'lunch'})
+        self.assertEqual([row['descriptions'] for row in response.json()], ['lunch'])
+
+        wrong = Client(headers={'Authorization': 'Bearer not-a-key'})
+        self.assertEqual(wrong.get(reverse('api-expenses')).status_code, 401)
+        self.assertEqual(self.post('api-expenses', {}, client=wrong).status_code, 401)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('api-expenses')).status_code, 401)
+
+    def test_session_writes_need_the_csrf_token(self):
+        browser = Client(enforce_csrf_checks=True)
+        browser.force_login(self.user)
+        self.assertEqual(browser.get(reverse('api-expenses')).status_code, 200)
+        payload = {'amount': '3.00', 'descriptions': 'bus', 'category': 'Travel', 'date': '2024-05-02'}
+        self.assertEqual(self.post('api-expenses', payload, client=browser).status_code, 403)
+        self.assertFalse(Expense.objects.filter(descriptions='bus').exists())
+
+        browser.get(reverse('expenses'))
+        token = browser.cookies[settings.CSRF_COOKIE_NAME].value
+        response = browser.post(reverse('api-expenses'), json.dumps(payload), content_type='application/json',
+                                headers={'X-CSRFToken': token})
+        self.assertEqual(response.status_code, 201)
+
+    def test_conditional_get(self):
+        lunch = self.expense('lunch')
+        url = reverse('api-expense', args=[lunch.pk])
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 304)
+
+        # A renamed category changes the body, so it must change the ETag.
+        Category.objects.filter(pk=self.categories['Food'].pk).update(name='Groceries')
+        category = Category.objects.get(name='Groceries')
+        category.save()
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['category'], 'Groceries')
+        etag = response['ETag']
+
+        lunch.amount = decimal.Decimal('2.00')
+        lunch.save()
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['amount'], 2)
+
+    def test_batch(self):
+        keep, change, drop = self.expense('keep'), self.expense('change'), self.expense('drop', '4.00')
+        response = self.post('api-expenses-batch', {
+            'create': [{'amount': '5.00', 'descriptions': 'taxi', 'category': 'Travel', 'date': '2024-05-03'}],
+            'update': [{'id': change.pk, 'amount': '9.00'}],
+            'delete': [drop.pk],
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['descriptions'] for row in response.json()['created']], ['taxi'])
+        self.assertEqual(response.json()['updated'][0]['amount'], 9)
+        self.assertEqual(response.json()['deleted'], [drop.pk])
+        self.assertEqual(rollups.summarize(ExpenseRollup, self.user), {'Food': 10, 'Travel': 5})
+
+        # One bad row rejects the whole batch.
+        response = self.post('api-expenses-batch', {
+            'create': [{'amount': '1.00', 'descriptions': 'ok', 'category': 'Food', 'date': '2024-05-03'},
+                       {'amount': 'lots', 'descriptions': 'bad', 'category': 'Food', 'date': '2024-05-03'}],
+            'update': [{'id': keep.pk, 'category': 'Nope'}],
+            'delete': [drop.pk],
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([(error['op'], error['index']) for error in response.json()['errors']],
+                         [('create', 1), ('delete', 0), ('update', 0)])
+        self.assertFalse(Expense.objects.filter(descriptions='ok').exists())
+        self.assertEqual(rollups.summarize(ExpenseRollup, self.user), {'Food': 10, 'Travel': 5})
+
+
+class PdfReportTests(TestCase):
+    """PDF reports are cached per ledger version; large ones render in the background behind a 202."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = seed.get_user('pdf-owner')
+        self.client.force_login(self.user)
+        self.food = labels.ensure(Expense, ['Food'])['Food']
+        self.expenses = [Expense.objects.create(owner=self.user, amount='1.00', date=datetime.date(2024, 5, day),
+                                                category=self.food, descriptions='lunch') for day in (1, 2, 3)]
+        # weasyprint needs system libraries; the HTML it would be given is tested in CurrencyConversionTests.
+        renderer = mock.patch.object(reports, 'render_pdf', side_effect=lambda *args: b'%PDF-' + next(self.renders))
+        self.render_pdf = renderer.start()
+        self.addCleanup(renderer.stop)
+        self.renders = (str(number).encode() for number in itertools.count(1))
+
+    def test_small_reports_are_cached_per_version(self):
+        response = self.client.get(reverse('export-pdf'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response.content, b'%PDF-1')
+        self.assertEqual(self.client.get(reverse('export-pdf')).content, b'%PDF-1')
+        self.assertEqual(self.render_pdf.call_count, 1)
+
+        self.expenses[0].delete()
+        self.assertEqual(self.client.get(reverse('export-pdf')).content, b'%PDF-2')
+        UserPreference.objects.create(user=self.user, currency='EUR - Euro')
+        self.assertEqual(self.client.get(reverse('export-pdf')).content, b'%PDF-3')
+
+    @mock.patch.object(reports, 'BACKGROUND_ROWS', 2)
+    def test_large_reports_render_in_the_background(self):
+        release = threading.Event()
+        self.render_pdf.side_effect = lambda *args: release.wait(5) and b'%PDF-1'
+        response = self.client.get(reverse('export-pdf'))
+        self.assertEqual(response.status_code, 202)
+        self.assertTemplateUsed(response, 'expenses/pdf_pending.html')
+        # Still rendering: the next request waits too, without queuing another job.
+        self.assertEqual(self.client.get(reverse('export-pdf')).status_code, 202)
+        version = versions.current(self.user)
+        self.assertIsNone(reports.submit(self.user, version, None))
+        release.set()
+        self.wait_for(version)
+
+        response = self.client.get(reverse('export-pdf'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'%PDF-1')
+        self.assertEqual(self.render_pdf.call_count, 1)
+
+    @mock.patch.object(reports, 'BACKGROUND_ROWS', 2)
+    def test_failed_background_renders_are_retried(self):
+        self.render_pdf.side_effect = RuntimeError('no fonts')
+        version = versions.current(self.user)
+        with self.assertLogs('ledger.reports', 'ERROR'):
+            reports.submit(self.user, version, None).result()
+        self.assertIsNone(reports.cached_pdf(self.user, None)[1])
+        self.render_pdf.side_effect = lambda *args: b'%PDF-ok'
+        reports.submit(self.user, version, None).result()
+        self.assertEqual(reports.cached_pdf(self.user, None), (version, b'%PDF-ok'))
+
+    def wait_for(self, version, seconds=5):
+        deadline = time.monotonic() + seconds
+        while cache.get(reports.cache_key(self.user.pk, version, None)) is None:
+            self.assertLess(time.monotonic(), deadline, 'background render did not finish')
+            time.sleep(0.01)
+
+
+class CsvExportTests(TestCase):
+    """CSV exports stream the owner's rows, filtered by date range and category, optionally gzipped."""
+
+    def setUp(self):
+        self.user = seed.get_user('export-owner')
+        self.client.force_login(self.user)
+        found = labels.ensure(Expense, ['Food', 'Travel'])
+        for amount, description, category, date in (('1.00', 'lunch', 'Food', '2024-01-05'),
+                                                    ('2.00', 'train', 'Travel', '2024-02-10'),
+                                                    ('3.00', 'dinner, late', 'Food', '2024-03-15')):
+            Expense.objects.create(owner=self.user, amount=amount, currency='EUR', descriptions=description,
+                                   category=found[category], date=datetime.date.fromisoformat(date))
+        Expense.objects.create(owner=seed.get_user('export-other'), amount='9.00', descriptions='not mine',
+                               category=found['Food'], date=datetime.date(2024, 2, 1))
+
+    def export(self, **params):
+        response = self.client.get(reverse('export-csv'), params)
+        return response, b''.join(response.streaming_content)
+
+    def rows(self, content):
+        return list(csv.reader(io.StringIO(content.decode())))
+
+    def test_plain_csv(self):
+        response, content = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertRegex(response['Content-Disposition'], r'^attachment; filename=Expenses_[\d_-]+\.csv$')
+        self.assertEqual(self.rows(content), [
+            ['Amount', 'Currency', 'Description', 'Category', 'Date'],
+            ['3.00', 'EUR', 'dinner, late', 'Food', '2024-03-15'],
+            ['2.00', 'EUR', 'train', 'Travel', '2024-02-10'],
+            ['1.00', 'EUR', 'lunch', 'Food', '2024-01-05'],
+        ])
+
+    def test_filters(self):
+        response, content = self.export(start='2024-02-01', end='2024-03-31')
+        self.assertEqual([row[2] for row in self.rows(content)[1:]], ['dinner, late', 'train'])
+        response, content = self.export(category=' food ')
+        self.assertEqual([row[2] for row in self.rows(content)[1:]], ['dinner, late', 'lunch'])
+        response, content = self.export(category='Food', end='2024-02-28')
+        self.assertEqual([row[2] for row in self.rows(content)[1:]], ['lunch'])
+
+    def test_gzip(self):
+        response, content = self.export(gzip=1, category='Travel')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertRegex(response['Content-Disposition'], r'^attachment; filename=Expenses_[\d_-]+\.csv\.gz$')
+        self.assertEqual(self.rows(gzip.decompress(content)),
+                         [['Amount', 'Currency', 'Description', 'Category', 'Date'],
+                          ['2.00', 'EUR', 'train', 'Travel', '2024-02-10']])
+
+    def test_bad_filters(self):
+        for params in ({'start': '2024-13-01'}, {'end': 'yesterday'}, {'start': '2024-03-01', 'end': '2024-01-01'}):
+            response = self.client.get(reverse('export-csv'), params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', response.json())
+        response = self.client.get(reverse('export-income-csv'), {'start': 'soon'})
+        self.assertEqual(response.status_code, 400)
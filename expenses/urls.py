@@ -16,4 +16,5 @@ urlpatterns = [
     path('delete-notification/<int:id>/', views.delete_notification, name='delete-notification'),
     path('export_csv', views.export_csv, name='export-csv'),
     path('export_pdf', views.export_pdf, name='export-pdf'),
+    path('import', views.import_expenses, name='import-expenses'),
 ]
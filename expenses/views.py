@@ -1,55 +1,39 @@
 from django.shortcuts import render, redirect,  get_object_or_404
 from django.contrib.auth.decorators import login_required
 from .models import Category, Expense
+from . import notifications
 from django.contrib import messages
-from django.core.paginator import Paginator
 import json
-from django.db.models import Sum
 from django.http import JsonResponse,HttpResponse
-from userpreferences.models import UserPreference
+from userpreferences import currencies
+from userpreferences.cache import get_currency, get_currency_code
+from ledger import dashboard as dashboards, export, forecast, imports, labels, money, pagination, reports, responses, rollups, search, summary
+from ledger.models import ExpenseRollup, SearchToken
 import datetime
-import numpy as np
-import pandas as pd
-from sklearn.linear_model import LinearRegression
 from django.utils import timezone
-import csv
-import os
-from django.template.loader import render_to_string
-from weasyprint import HTML
-import tempfile
 
 
 def search_expenses(request):
     if request.method == 'POST':
-        search_str = json.loads(request.body).get('searchText')
-        expenses = Expense.objects.filter(
-            amount__istartswith=search_str, owner=request.user
-        ) | Expense.objects.filter(
-            date__istartswith=search_str, owner=request.user
-        ) | Expense.objects.filter(
-            descriptions__icontains=search_str, owner=request.user
-        ) | Expense.objects.filter(
-            category__icontains=search_str, owner=request.user
-        )
-        data = expenses.values()
-        return JsonResponse(list(data), safe=False)
+        body = json.loads(request.body)
+        try:
+            data = search.search(request.user, SearchToken.EXPENSE, body.get('searchText'),
+                                 page=body.get('page', 1), page_size=body.get('pageSize', search.DEFAULT_PAGE_SIZE))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse(data, safe=False, encoder=money.JSONEncoder)
 
 
 @login_required(login_url='/authentication/login')
 def index(request):
-    categories = Category.objects.all()
-    expenses = Expense.objects.filter(owner=request.user)
-    paginator = Paginator(expenses, 5)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    categories = labels.choices(Category)
+    expenses = Expense.objects.filter(owner=request.user).select_related('category')
+    page_obj = pagination.paginate(expenses, request.GET, rollups.count(ExpenseRollup, request.user))
 
-    try:
-        currency = UserPreference.objects.get(user=request.user).currency
-    except UserPreference.DoesNotExist:
-        currency = 'DefaultCurrency'  
+    currency = get_currency(request)
     context = {
-        'expenses': expenses,
         'page_obj': page_obj,
+        'page_sizes': pagination.PAGE_SIZES,
         'currency': currency,
         'categories': categories
     }
@@ -57,30 +41,29 @@ def index(request):
 
 @login_required(login_url='/authentication/login')
 def dashboard(request):
-    
-    recent_expenses = Expense.objects.filter(owner=request.user).order_by('-date')[:5]
-
-    expense_descriptions = [expense.descriptions for expense in recent_expenses]
-    expense_amounts = [expense.amount for expense in recent_expenses]
-
     try:
-        currency = UserPreference.objects.get(user=request.user).currency
-    except UserPreference.DoesNotExist:
-        currency = 'DefaultCurrency'  
+        start, end = dashboards.window(request.GET)
+    except ValueError as e:
+        messages.error(request, str(e))
+        start, end = dashboards.window({})
+
+    # The page carries its chart data, so it renders without follow-up requests.
+    data = dashboards.build(request.user, start, end, get_currency_code(request))
 
     context = {
-        'recent_expenses': recent_expenses,
-        'currency': currency,
-        'expense_descriptions': expense_descriptions,
-        'expense_amounts': expense_amounts,
+        'dashboard': data,
+        'chart_data': json.loads(json.dumps(data['months'], cls=money.JSONEncoder)),
+        'currency': get_currency(request),
     }
     return render(request, 'expenses/dashboard.html', context)
 
 @login_required(login_url='/authentication/login')
 def add_expense(request):
-    categories = Category.objects.all()
+    categories = labels.choices(Category)
     context = {
         'categories': categories,
+        'currencies': currencies.choices(),
+        'selected_currency': request.POST.get('currency') or get_currency_code(request),
         'values': request.POST
     }
     if request.method == 'GET':
@@ -91,17 +74,32 @@ def add_expense(request):
         descriptions = request.POST.get('description')
         date = request.POST.get('expense_date')
         category = request.POST.get('category')
+        currency = request.POST.get('currency', '')
 
         today = datetime.date.today()
 
         if not amount:
             messages.error(request, 'Amount is required')
             return render(request, 'expenses/add_expense.html', context)
+        try:
+            amount = money.parse(amount)
+        except ValueError as e:
+            messages.error(request, str(e))
+            return render(request, 'expenses/add_expense.html', context)
+
+        if currency and currency not in currencies.currencies():
+            messages.error(request, 'Please choose a currency from the list')
+            return render(request, 'expenses/add_expense.html', context)
 
         if not descriptions:
             messages.error(request, 'Description is required')
             return render(request, 'expenses/add_expense.html', context)
 
+        category = labels.resolve(Expense, category)
+        if category is None:
+            messages.error(request, 'Please choose a category from the list')
+            return render(request, 'expenses/add_expense.html', context)
+
         if not date:
             messages.error(request, 'Date is required')
             return render(request, 'expenses/add_expense.html', context)
@@ -110,7 +108,7 @@ def add_expense(request):
             messages.error(request, 'Date cannot be in the future')
             return render(request, 'expenses/add_expense.html', context)
 
-        Expense.objects.create(owner=request.user, amount=amount, date=date,
+        Expense.objects.create(owner=request.user, amount=amount, date=date, currency=currency,
                                category=category, descriptions=descriptions)
         messages.success(request, 'Expense saved successfully')
 
@@ -125,11 +123,13 @@ def expense_edit(request, id):
         messages.error(request, 'Expense record not found.')
         return redirect('expenses')
 
-    categories = Category.objects.all()
+    categories = labels.choices(Category)
     context = {
         'expense': expense,
         'values': expense,
-        'categories': categories
+        'categories': categories,
+        'currencies': currencies.choices(),
+        'selected_currency': expense.currency,
     }
 
     if request.method == 'GET':
@@ -140,22 +140,38 @@ def expense_edit(request, id):
         descriptions = request.POST.get('description')
         date = request.POST.get('expense_date')
         category = request.POST.get('category')
+        currency = request.POST.get('currency', expense.currency)
 
         today = datetime.date.today()
 
         if not amount:
             messages.error(request, 'Amount is required')
             return render(request, 'expenses/edit-expense.html', context)
+        try:
+            amount = money.parse(amount)
+        except ValueError as e:
+            messages.error(request, str(e))
+            return render(request, 'expenses/edit-expense.html', context)
+
+        if currency and currency not in currencies.currencies():
+            messages.error(request, 'Please choose a currency from the list')
+            return render(request, 'expenses/edit-expense.html', context)
 
         if not descriptions:
             messages.error(request, 'Description is required')
             return render(request, 'expenses/edit-expense.html', context)
 
+        category = labels.resolve(Expense, category)
+        if category is None:
+            messages.error(request, 'Please choose a category from the list')
+            return render(request, 'expenses/edit-expense.html', context)
+
         if datetime.datetime.strptime(date, '%Y-%m-%d').date() > today:
             messages.error(request, 'Date cannot be in the future')
             return render(request, 'expenses/edit-expense.html', context)
 
         expense.amount = amount
+        expense.currency = currency
         expense.date = date
         expense.category = category
         expense.descriptions = descriptions
@@ -178,127 +194,82 @@ def delete_expense(request, id):
 
 
 @login_required(login_url='/authentication/login')
+@responses.cached_per_version
 def expense_category_summary(request):
     todays_date = datetime.date.today()
+    currency_code = get_currency_code(request)
     six_months_ago = todays_date - datetime.timedelta(days=30 * 6)
 
-    selected_month = request.GET.get('month')
+    try:
+        month_start = summary.parse_month(request.GET, todays_date)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    selected_month = month_start.month if month_start else None
 
     if selected_month:
-        selected_month = int(selected_month)
-
         if selected_month > todays_date.month:
-            expenses = Expense.objects.none()
-            prediction = 0
+            finalrep = {}
+            unconverted = []
         else:
-            expenses = Expense.objects.filter(
-                owner=request.user,
-                date__year=todays_date.year,
-                date__month=selected_month
-            )
+            finalrep = rollups.summarize(ExpenseRollup, request.user, month_start, month_start, currency=currency_code)
+            unconverted = rollups.unconverted(ExpenseRollup, request.user, currency_code, month_start, month_start)
     else:
-        expenses = Expense.objects.filter(owner=request.user, date__gte=six_months_ago, date__lte=todays_date)
+        finalrep = rollups.summarize(ExpenseRollup, request.user, six_months_ago, todays_date, currency=currency_code)
+        unconverted = rollups.unconverted(ExpenseRollup, request.user, currency_code, six_months_ago, todays_date)
 
-    total_expenses = expenses.aggregate(total=Sum('amount'))['total'] or 0
-    category_summary = expenses.values('category').annotate(total_amount=Sum('amount'))
-
-    finalrep = {}
-    for expense in category_summary:
-        category_name = expense['category']
-        finalrep[category_name] = expense['total_amount']
+    total_expenses = sum(finalrep.values())
 
     categories = list(finalrep.keys())
     total_amounts = list(finalrep.values())
 
     if selected_month and selected_month <= todays_date.month:
-        last_three_months_expenses = Expense.objects.filter(
-            owner=request.user,
-            date__gte=todays_date - pd.DateOffset(months=3)
-        ).values('date', 'amount')
-
-        df = pd.DataFrame(list(last_three_months_expenses))
-
-        if not df.empty:
-            df['date'] = pd.to_datetime(df['date'])
-            df['month'] = df['date'].dt.month
-            monthly_totals = df.groupby('month')['amount'].sum().reset_index()
-
-            if len(monthly_totals) >= 3:
-                df['month_sin'] = np.sin(2 * np.pi * df['month'] / 12)
-                df['month_cos'] = np.cos(2 * np.pi * df['month'] / 12)
-
-                X = df[['month_sin', 'month_cos']].values
-                y = monthly_totals['amount'].values
-
-                try:
-                    model = LinearRegression()
-                    model.fit(X, y)
-
-                    next_month = (todays_date.month % 12) + 1
-                    next_month_sin = np.sin(2 * np.pi * next_month / 12)
-                    next_month_cos = np.cos(2 * np.pi * next_month / 12)
-
-                    predicted_expense = model.predict([[next_month_sin, next_month_cos]])
-
-                    prediction = predicted_expense[0]
-                except Exception as e:
-                    print(f"Error in model prediction: {e}")
-                    prediction = 0
-            else:
-                prediction = 0
-        else:
-            prediction = 0
+        prediction = forecast.lookup(request.user)
 
         return JsonResponse({
             'categories': categories,
             'total_amounts': total_amounts,
             'total_expenses': total_expenses,
-            'predicted_expense': prediction
-        }, safe=False)
+            'predicted_expense': prediction['total'],
+            'predicted_categories': prediction['categories'],
+            'unconverted_currencies': unconverted,
+        }, safe=False, encoder=money.JSONEncoder)
 
     return JsonResponse({
         'categories': categories,
         'total_amounts': total_amounts,
-        'total_expenses': total_expenses
-    }, safe=False)
+        'total_expenses': total_expenses,
+        'unconverted_currencies': unconverted,
+    }, safe=False, encoder=money.JSONEncoder)
 
 
 
 @login_required(login_url='/authentication/login')
+@responses.cached_per_version
 def all_expenses_summary(request):
-    expenses = Expense.objects.all()
-    
-    categories = []
-    total_amounts = []
-    total_expenses = sum(expense.amount for expense in expenses)
-
-    for expense in expenses:
-        if expense.category not in categories:
-            categories.append(expense.category)
-            total_amounts.append(expense.amount)
-        else:
-            index = categories.index(expense.category)
-            total_amounts[index] += expense.amount
+    try:
+        start, end = summary.parse_date_range(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    currency_code = get_currency_code(request)
+    categories, total_amounts, total_expenses = summary.category_totals(Expense, request.user, start, end, currency_code)
 
     data = {
         'categories': categories,
         'total_amounts': total_amounts,
         'total_expenses': total_expenses,
+        'unconverted_currencies': rollups.unconverted(ExpenseRollup, request.user, currency_code, start, end),
     }
 
-    return JsonResponse(data)
+    return JsonResponse(data, encoder=money.JSONEncoder)
 
 
 @login_required(login_url='/authentication/login')
 def stats_view(request):
-    user_preferences = UserPreference.objects.filter(user=request.user).first()
-    currency = user_preferences.currency if user_preferences else 'DefaultCurrency'
-
-    expense_summary = Expense.objects.filter(owner=request.user) \
-        .values('category') \
-        .annotate(total_amount=Sum('amount'))
+    currency = get_currency(request)
 
-    expense_summary_dict = {item['category']: item['total_amount'] for item in expense_summary}
+    currency_code = get_currency_code(request)
+    expense_summary_dict = rollups.summarize(ExpenseRollup, request.user, currency=currency_code)
 
     total_expenses = sum(expense_summary_dict.values())
 
@@ -306,6 +277,7 @@ def stats_view(request):
         'expense_summary': expense_summary_dict,
         'total_expenses': total_expenses,
         'currency': currency,
+        'unconverted_currencies': rollups.unconverted(ExpenseRollup, request.user, currency_code),
     }
 
     return render(request, 'expenses/stats.html', context)
@@ -314,45 +286,9 @@ def stats_view(request):
 
 @login_required(login_url='/authentication/login')
 def notification(request):
-    today = datetime.date.today()
-    upcoming_notifications = []
-    previous_notifications = []
-
-    expenses = Expense.objects.filter(
-        owner=request.user,
-        category__in=['Bills', 'Education', 'Subscription']
-    )
-
-    for expense in expenses:
-        expiry_date = expense.date + datetime.timedelta(days=30)
-        
-        if expense.category == 'Bills':
-            message_prefix = "Your bill is going to be due soon"
-        elif expense.category == 'Subscription':
-            message_prefix = "Your subscription is going to expire soon"
-        elif expense.category == 'Education':
-            message_prefix = "Your education-related expense is about to come soon"
-        else:
-            message_prefix = "Your expense is going to expire soon"
-        
-        if today < expiry_date:
-            if today >= expiry_date - datetime.timedelta(days=1):
-                message = f"{message_prefix}: {expense.descriptions}"
-                upcoming_notifications.append({
-                    'category': expense.category,
-                    'message': message,
-                    'expiry_date': expiry_date,
-                    'expense_id': expense.id 
-                })
-
-        elif today >= expiry_date:
-            message = f"Your {expense.category.lower()} related expense has expired: {expense.descriptions}"
-            previous_notifications.append({
-                'category': expense.category,
-                'message': message,
-                'expiry_date': expiry_date,
-                'expense_id': expense.id  
-            })
+    upcoming, expired = notifications.unread(request.user)
+    upcoming_notifications = list(upcoming)
+    previous_notifications = list(expired)
 
     context = {
         'upcoming_notifications': upcoming_notifications,
@@ -367,48 +303,40 @@ def delete_notification(request, id):
     messages.success(request, 'Expense notification deleted successfully!')
     return redirect('notification')
 
+@login_required(login_url='/authentication/login')
 def export_csv(request):
-    response = HttpResponse(content_type='text/csv')
+    try:
+        return export.csv_response(Expense, request.user, request.GET, 'Expenses')
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
 
-    current_time = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-    response['Content-Disposition'] = f'attachment; filename=Expenses_{current_time}.csv'
+@login_required(login_url='/authentication/login')
+def import_expenses(request):
+    if request.method != 'POST' or 'file' not in request.FILES:
+        return JsonResponse({'error': 'POST a CSV or OFX file as "file"'}, status=400)
 
-    writer = csv.writer(response)
-    writer.writerow(['Amount', 'Description', 'Category', 'Date'])
+    upload = request.FILES['file']
+    file_format = imports.detect_format(upload, request.POST.get('format'))
+    result = imports.run(Expense, request.user, upload, file_format, request.POST.get('category', ''),
+                         get_currency_code(request) or '')
+    return JsonResponse(result)
 
-    expenses = Expense.objects.filter(owner=request.user)
+@login_required(login_url='/authentication/login')
+def export_pdf(request):
+    currency_code = get_currency_code(request)
+    version, pdf = reports.cached_pdf(request.user, currency_code)
 
-    for expense in expenses:
-        formatted_date = expense.date.strftime('%Y-%m-%d') 
-        writer.writerow([expense.amount, expense.descriptions, expense.category, formatted_date])
+    if pdf is None and reports.is_large(request.user):
+        reports.submit(request.user, version, currency_code)
+        return render(request, 'expenses/pdf_pending.html', status=202)
 
-    return response
+    if pdf is None:
+        pdf = reports.build(request.user, version, currency_code)
 
-def export_pdf(request):
-    response = HttpResponse(content_type='application/pdf')
+    response = HttpResponse(pdf, content_type='application/pdf')
 
     current_time = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
     response['Content-Disposition'] = f'attachment; filename=Expenses_{current_time}.pdf'
     response['Content-Transfer-Encoding'] = 'binary'
 
-    expenses = Expense.objects.filter(owner=request.user)
-    sum_result = expenses.aggregate(total=Sum('amount'))  
-    total_sum = sum_result['total'] if sum_result['total'] else 0  
-
-    html_string = render_to_string('expenses/pdf_op.html', {'expenses': expenses, 'total': total_sum})
-    html = HTML(string=html_string)
-
-    result = html.write_pdf()
-
-    with tempfile.NamedTemporaryFile(delete=False) as output:
-        output.write(result)
-        output.flush()
-        output_path = output.name
-
-    with open(output_path, 'rb') as pdf_file:
-        response.write(pdf_file.read())
-
-    os.remove(output_path)
-
     return response
-        
\ No newline at end of file
@@ -43,15 +43,20 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'expenses',
     'userpreferences',
-    'userincome'
+    'userincome',
+    'authentication',
+    'ledger',
+    'benchmarks',
 ]
 
 MIDDLEWARE = [
+    'benchmarks.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'userpreferences.middleware.UserPreferencesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -60,7 +65,9 @@ ROOT_URLCONF = 'expensewebsite.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that also times renders for benchmarks.middleware.ProfilingMiddleware.
+        'BACKEND': 'benchmarks.templates.ProfiledDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -78,6 +85,12 @@ WSGI_APPLICATION = 'expensewebsite.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
+# Connections are kept open for DB_CONN_MAX_AGE seconds (0 closes them after every request) and
+# checked before reuse. DB_POOL=True uses a psycopg 3 pool per process instead (needs psycopg[pool]);
+# prefer it under ASGI, where persistent connections are tied to short-lived threads.
+# Connection and pool metrics are in `manage.py db_connections`.
+
+DB_POOL = env.bool('DB_POOL', default=False)
 
 DATABASES = {
     'default': {
@@ -87,9 +100,29 @@ DATABASES = {
         'PASSWORD': env('DB_PASSWORD', default='kalp2604'),
         'HOST': env('DB_HOST', default='localhost'),
         'PORT': env('DB_PORT', default='5432'),
+        # Pools hand connections back on close, so they must not also be persistent.
+        'CONN_MAX_AGE': 0 if DB_POOL else env.int('DB_CONN_MAX_AGE', default=60),
+        'CONN_HEALTH_CHECKS': env.bool('DB_CONN_HEALTH_CHECKS', default=True),
+        'OPTIONS': {
+            'pool': {
+                'name': 'default',
+                'min_size': env.int('DB_POOL_MIN_SIZE', default=2),
+                'max_size': env.int('DB_POOL_MAX_SIZE', default=10),
+                'timeout': env.float('DB_POOL_TIMEOUT', default=10.0),
+                'max_idle': env.float('DB_POOL_MAX_IDLE', default=600.0),
+            },
+        } if DB_POOL else {},
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Use a shared backend (e.g. CACHE_URL=redis://localhost:6379/1) when running several workers.
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -133,7 +166,10 @@ MESSAGE_TAGS = {
 
 # Email Configuration
 # Email Configuration
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Set EMAIL_BACKEND to django.core.mail.backends.filebased.EmailBackend (writes to
+# EMAIL_FILE_PATH) or .console.EmailBackend to work offline.
+EMAIL_BACKEND = env('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = env('EMAIL_FILE_PATH', default=os.path.join(BASE_DIR, 'sent_emails'))
 EMAIL_HOST = env('EMAIL_HOST', default='smtp.gmail.com')
 EMAIL_HOST_USER = env('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD')
@@ -145,3 +181,20 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# PDF reports
+# Reports with more rows than this are rendered in the background and downloaded once ready.
+PDF_BACKGROUND_ROWS = env.int('PDF_BACKGROUND_ROWS', default=500)
+PDF_WORKERS = env.int('PDF_WORKERS', default=2)
+PDF_CACHE_TIMEOUT = env.int('PDF_CACHE_TIMEOUT', default=60 * 60 * 24)
+
+# Exchange rates
+# CSV of date,currency,rate rows, rate being units of the currency per one FX_BASE_CURRENCY.
+FX_RATES_FILE = env('FX_RATES_FILE', default=os.path.join(BASE_DIR, 'fx_rates.csv'))
+FX_BASE_CURRENCY = env('FX_BASE_CURRENCY', default='USD')
+
+# Request profiling (benchmarks.middleware.ProfilingMiddleware)
+# Share of requests profiled; per-view results are in `manage.py profile_report` and /admin/profiles/.
+PROFILE_SAMPLE_RATE = env.float('PROFILE_SAMPLE_RATE', default=0.01)
+# Trace peak allocations of sampled requests; slows them down severalfold.
+PROFILE_ALLOCATIONS = env.bool('PROFILE_ALLOCATIONS', default=False)
@@ -22,5 +22,7 @@ urlpatterns = [
     path('authentication/',include('authentication.urls')),
     path('preferences/',include('userpreferences.urls')),
     path('income/',include('userincome.urls')),
+    path('api/',include('ledger.urls')),
+    path('admin/profiles/',include('benchmarks.urls')),
     path('admin/', admin.site.urls),
 ]
@@ -0,0 +1,391 @@
+"""JSON API for expenses and income.
+
+``/api/expenses/`` and ``/api/income/`` list (newest first, cursor paged on
+(date, id)) and create rows, ``/api/<kind>/<id>`` reads, updates and deletes
+one row, and ``/api/<kind>/batch`` creates, updates and deletes many rows in
+one transaction. Rows are read with ``.values()`` and every response carries
+an ETag derived from the owner's ledger version and the label revision, so
+a client repeating a request with ``If-None-Match`` gets a 304 without the
+ledger being read. ``/api/dashboard`` returns every dashboard widget for a
+date window at once.
+
+Browsers use their session and must send the CSRF token on writes. Scripts
+and mobile clients send ``Authorization: Bearer <key>`` instead, with a key
+from ``manage.py create_api_token``, and are exempt from CSRF checks since
+no cookie is involved.
+"""
+import copy
+import datetime
+import functools
+import hashlib
+import json
+import secrets
+
+from asgiref.sync import iscoroutinefunction
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_http_methods
+
+from expenses.models import Expense
+from userpreferences.cache import get_currency_code
+from userincome.models import UserIncome
+from .models import ApiToken
+from . import bulk, dashboard as dashboards, imports, labels, money, pagination, responses, versions
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+MAX_BATCH_SIZE = 1000
+
+# Fields exposed by the API per model, in response order.
+API_FIELDS = {
+    Expense: ('id', 'amount', 'currency', 'date', 'descriptions', 'category'),
+    UserIncome: ('id', 'amount', 'currency', 'date', 'description', 'source'),
+}
+
+
+class PayloadError(ValueError):
+    pass
+
+
+def _token_digest(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def create_token(user, name=''):
+    """Issue an API key for ``user``. Only its digest is stored, so it is shown once."""
+    key = secrets.token_urlsafe(32)
+    ApiToken.objects.create(user=user, digest=_token_digest(key), name=name)
+    return key
+
+
+def _bearer_key(request):
+    """The key of an ``Authorization: Bearer`` header, '' for a blank one, None without one."""
+    scheme, _, key = request.headers.get('Authorization', '').partition(' ')
+    return key.strip() if scheme.lower() == 'bearer' else None
+
+
+def _tokens(key):
+    return ApiToken.objects.select_related('user').filter(digest=_token_digest(key), user__is_active=True)
+
+
+def _csrf_failure(request):
+    """The 403 for a session-authenticated write without a valid CSRF token, or None."""
+    check = CsrfViewMiddleware(lambda request: None)
+    check.process_request(request)
+    return check.process_view(request, None, (), {})
+
+
+def _unauthorized(message='Authentication required'):
+    return JsonResponse({'error': message}, status=401)
+
+
+def api_login_required(view):
+    """Like ``login_required`` but answers 401 instead of redirecting to the login page.
+
+    Accepts an API key (see ``create_token``) or the session; only session
+    requests are held to the CSRF check. For async views the user is
+    resolved with ``request.auser()`` and stored on ``request.user``, so the
+    view and the decorators below it can read it without touching the
+    database from the event loop.
+    """
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            key = _bearer_key(request)
+            if key is not None:
+                token = await _tokens(key).afirst()
+                if token is None:
+                    return _unauthorized('Invalid API key')
+                request.user = token.user
+                return await view(request, *args, **kwargs)
+            request.user = await request.auser()
+            if not request.user.is_authenticated:
+                return _unauthorized()
+            return _csrf_failure(request) or await view(request, *args, **kwargs)
+        return csrf_exempt(async_wrapper)
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = _bearer_key(request)
+        if key is not None:
+            token = _tokens(key).first()
+            if token is None:
+                return _unauthorized('Invalid API key')
+            request.user = token.user
+            return view(request, *args, **kwargs)
+        if not request.user.is_authenticated:
+            return _unauthorized()
+        return _csrf_failure(request) or view(request, *args, **kwargs)
+    return csrf_exempt(wrapper)
+
+
+def ledger_etag(request, *args, **kwargs):
+    """Changes whenever the owner's ledger or a label name does, and differs per URL and query."""
+    path = hashlib.sha1(request.get_full_path().encode()).hexdigest()[:16]
+    return f'{versions.current(request.user)}-{labels.revision()}-{path}'
+
+
+def _load_json(request):
+    try:
+        return json.loads(request.body or b'{}')
+    except ValueError:
+        raise PayloadError('Request body must be JSON')
+
+
+def _text(value):
+    return '' if value is None else str(value)
+
+
+def _clean(model, payload, current=None, default_currency=''):
+    """Validate ``payload`` (merged over ``current`` for updates) with the add-form rules.
+
+    Returns ``(fields, errors)`` where ``fields`` are model field values, except
+    that the category/source is still a name (see ``_resolve_labels``).
+    """
+    if not isinstance(payload, dict):
+        return {}, ['Expected an object']
+    description_field, label_field = imports.IMPORT_FIELDS[model]
+    merged = dict(current or {}, **payload)
+    values = {
+        'amount': _text(merged.get('amount')),
+        'description': _text(merged.get(description_field)),
+        'label': _text(merged.get(label_field)),
+        'date': _text(merged.get('date')),
+        'currency': _text(merged.get('currency')),
+    }
+    cleaned, errors = imports.validate(values, '', datetime.date.today(), label_field.capitalize(), default_currency)
+    if errors:
+        return {}, errors
+    return {
+        'amount': cleaned['amount'],
+        'currency': cleaned['currency'],
+        'date': cleaned['date'],
+        description_field: cleaned['description'],
+        label_field: cleaned['label'],
+    }, []
+
+
+def _resolve_labels(model, rows):
+    """Replace the category/source names in cleaned ``rows`` with their rows, in one lookup.
+
+    Returns ``{position in rows: error}`` for the names that match no label.
+    """
+    label_field = labels.LABELS[model][0]
+    found = labels.resolve_many(model, [fields[label_field] for fields in rows])
+    unknown = {}
+    for position, fields in enumerate(rows):
+        label = found.get(labels.clean_name(fields[label_field]))
+        if label is None:
+            unknown[position] = labels.unknown(model, fields[label_field])
+        else:
+            fields[label_field] = label
+    return unknown
+
+
+def _serialize(model, obj):
+    row = {field: getattr(obj, field) for field in API_FIELDS[model]}
+    label_field = labels.LABELS[model][0]
+    row[label_field] = row[label_field].name
+    return row
+
+
+def _limit(params):
+    try:
+        return max(1, min(int(params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT))
+    except ValueError:
+        return DEFAULT_LIMIT
+
+
+def _list(request, model):
+    rows = model.objects.filter(owner=request.user)
+    cursor = request.GET.get('after')
+    if cursor:
+        after = pagination.decode_cursor(cursor)
+        if after is None:
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+        rows = pagination.older_than(rows, after)
+    limit = _limit(request.GET)
+    results = list(labels.values(rows.order_by('-date', '-id')[:limit + 1], API_FIELDS[model]))
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        next_cursor = pagination.encode_cursor(results[-1]['date'], results[-1]['id'])
+    return JsonResponse({'results': results, 'next': next_cursor}, encoder=money.JSONEncoder)
+
+
+def _create(request, model):
+    fields, errors = _clean(model, _load_json(request), default_currency=get_currency_code(request) or '')
+    if errors:
+        return JsonResponse({'errors': errors}, status=400)
+    unknown = _resolve_labels(model, [fields])
+    if unknown:
+        return JsonResponse({'errors': list(unknown.values())}, status=400)
+    obj = model.objects.create(owner=request.user, **fields)
+    return JsonResponse(_serialize(model, obj), status=201, encoder=money.JSONEncoder)
+
+
+@api_login_required
+@require_http_methods(['GET', 'HEAD', 'POST'])
+@condition(etag_func=ledger_etag)
+def collection(request, model):
+    try:
+        if request.method == 'POST':
+            return _create(request, model)
+        return _list(request, model)
+    except PayloadError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+@api_login_required
+@require_http_methods(['GET', 'HEAD', 'PUT', 'PATCH', 'DELETE'])
+@condition(etag_func=ledger_etag)
+def detail(request, model, id):
+    if request.method in ('GET', 'HEAD'):
+        row = next(labels.values(model.objects.filter(owner=request.user, pk=id), API_FIELDS[model]), None)
+        if row is None:
+            return JsonResponse({'error': 'Not found'}, status=404)
+        return JsonResponse(row, encoder=money.JSONEncoder)
+
+    obj = model.objects.filter(owner=request.user, pk=id).first()
+    if obj is None:
+        return JsonResponse({'error': 'Not found'}, status=404)
+
+    if request.method == 'DELETE':
+        obj.delete()
+        return HttpResponse(status=204)
+
+    try:
+        payload = _load_json(request)
+    except PayloadError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    # PUT replaces the row, PATCH only changes the given fields.
+    current = _serialize(model, obj) if request.method == 'PATCH' else None
+    fields, errors = _clean(model, payload, current, get_currency_code(request) or '')
+    if errors:
+        return JsonResponse({'errors': errors}, status=400)
+    unknown = _resolve_labels(model, [fields])
+    if unknown:
+        return JsonResponse({'errors': list(unknown.values())}, status=400)
+    for name, value in fields.items():
+        setattr(obj, name, value)
+    obj.save()
+    return JsonResponse(_serialize(model, obj), encoder=money.JSONEncoder)
+
+
+def _batch_list(payload, key):
+    items = payload.get(key) or []
+    if not isinstance(items, list):
+        raise PayloadError(f'"{key}" must be a list')
+    return items
+
+
+def _apply_batch(request, model, payload):
+    """Validate and write a batch; returns ``(result, errors)`` and writes nothing on errors."""
+    to_create = _batch_list(payload, 'create')
+    to_update = _batch_list(payload, 'update')
+    to_delete = _batch_list(payload, 'delete')
+    if len(to_create) + len(to_update) + len(to_delete) > MAX_BATCH_SIZE:
+        raise PayloadError(f'A batch may hold at most {MAX_BATCH_SIZE} operations')
+
+    if not all(isinstance(item, dict) and isinstance(item.get('id'), int) for item in to_update):
+        raise PayloadError('Each update must be an object with an integer "id"')
+    if not all(isinstance(pk, int) for pk in to_delete):
+        raise PayloadError('"delete" must be a list of integer ids')
+    update_ids = [item['id'] for item in to_update]
+    # Rows named twice in one batch would be rolled up twice.
+    if len(set(update_ids) | set(to_delete)) != len(update_ids) + len(to_delete):
+        raise PayloadError('Each row may be updated or deleted only once per batch')
+
+    errors = []
+    default_currency = get_currency_code(request) or ''
+    label_field = labels.LABELS[model][0]
+    existing = (model.objects.select_for_update(of=('self',)).select_related(label_field)
+                .filter(owner=request.user).in_bulk(update_ids + to_delete))
+
+    # (op, index) of each row in new_rows + changes, to report unknown labels.
+    positions = []
+    new_rows = []
+    for index, item in enumerate(to_create):
+        fields, row_errors = _clean(model, item, default_currency=default_currency)
+        if row_errors:
+            errors.append({'op': 'create', 'index': index, 'errors': row_errors})
+        else:
+            new_rows.append(fields)
+            positions.append(('create', index))
+
+    before, after, changes = [], [], []
+    for index, item in enumerate(to_update):
+        obj = existing.get(item['id'])
+        if obj is None:
+            errors.append({'op': 'update', 'index': index, 'errors': ['Not found']})
+            continue
+        fields, row_errors = _clean(model, item, _serialize(model, obj), default_currency)
+        if row_errors:
+            errors.append({'op': 'update', 'index': index, 'errors': row_errors})
+            continue
+        before.append(copy.copy(obj))
+        after.append(obj)
+        changes.append(fields)
+        positions.append(('update', index))
+
+    doomed = []
+    for index, pk in enumerate(to_delete):
+        if pk not in existing:
+            errors.append({'op': 'delete', 'index': index, 'errors': ['Not found']})
+        else:
+            doomed.append(existing[pk])
+
+    unknown = _resolve_labels(model, new_rows + changes)
+    for position, error in unknown.items():
+        op, index = positions[position]
+        errors.append({'op': op, 'index': index, 'errors': [error]})
+    if errors:
+        return None, errors
+
+    for obj, fields in zip(after, changes):
+        for name, value in fields.items():
+            setattr(obj, name, value)
+    created = model.objects.bulk_create([model(owner=request.user, **fields) for fields in new_rows])
+    bulk.created(model, created)
+    if after:
+        model.objects.bulk_update(after, [name for name in API_FIELDS[model] if name != 'id'])
+        bulk.updated(model, before, after)
+    bulk.delete(model, doomed)
+
+    return {
+        'created': [_serialize(model, obj) for obj in created],
+        'updated': [_serialize(model, obj) for obj in after],
+        'deleted': [obj.pk for obj in doomed],
+    }, []
+
+
+@api_login_required
+@require_http_methods(['POST'])
+def batch(request, model):
+    """Apply ``{"create": [...], "update": [{"id": ..}, ...], "delete": [ids]}`` atomically."""
+    try:
+        payload = _load_json(request)
+        if not isinstance(payload, dict):
+            raise PayloadError('Expected an object')
+        with transaction.atomic():
+            result, errors = _apply_batch(request, model, payload)
+    except PayloadError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if errors:
+        return JsonResponse({'errors': errors}, status=400)
+    return JsonResponse(result, encoder=money.JSONEncoder)
+
+
+@api_login_required
+@require_http_methods(['GET', 'HEAD'])
+@responses.cached_per_version
+def dashboard(request):
+    """Totals, monthly net savings, top labels and recent rows for ``?start=&end=``."""
+    try:
+        start, end = dashboards.window(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    data = dashboards.build(request.user, start, end, get_currency_code(request))
+    return JsonResponse(data, encoder=money.JSONEncoder)
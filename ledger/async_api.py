@@ -0,0 +1,144 @@
+"""Async versions of the JSON endpoints, for ASGI deployments.
+
+``/api/async/...`` answers like the chart, search and notification endpoints
+of the expense and income pages, on Django's async ORM. Lookups within one
+request that do not depend on each other are awaited together with
+``asyncio.gather``. Examples are the category totals next to the forecast,
+and the upcoming next to the expired notices.
+
+Django runs async ORM calls on one thread per request. Under uvicorn, a
+request waiting on the database therefore holds no worker, but its gathered
+queries still take turns on that thread's connection. ``bench_asgi`` compares
+these views under uvicorn with the sync ones under a WSGI server.
+"""
+import asyncio
+import datetime
+import json
+
+from django.http import JsonResponse
+from django.views.decorators.http import require_http_methods
+
+from expenses import notifications
+from expenses.models import Expense
+from userincome.models import UserIncome
+from userpreferences.cache import aget_currency_code
+from .api import api_login_required
+from .models import ExpenseRollup, IncomeRollup
+from . import forecast, money, responses, rollups, search, summary
+
+SUMMARY_WINDOW = datetime.timedelta(days=30 * 6)
+NOTICE_FIELDS = ('id', 'expense_id', 'category', 'message', 'expiry_date')
+
+
+async def _window_totals(rollup_model, user, start, end):
+    """``(totals, unconverted currencies)`` of ``user`` for the months ``start`` through ``end``."""
+    currency = await aget_currency_code(user)
+    return await asyncio.gather(rollups.asummarize(rollup_model, user, start, end, currency),
+                                rollups.aunconverted(rollup_model, user, currency, start, end))
+
+
+def _chart(totals, unconverted, total_key, **extra):
+    return JsonResponse({
+        'categories': list(totals),
+        'total_amounts': list(totals.values()),
+        total_key: sum(totals.values()),
+        'unconverted_currencies': unconverted,
+        **extra,
+    }, encoder=money.JSONEncoder)
+
+
+@api_login_required
+@require_http_methods(['GET', 'HEAD'])
+@responses.cached_per_version
+async def expense_category_summary(request):
+    """Expense totals per category for ``?month=`` (with its forecast) or the last six months."""
+    today = datetime.date.today()
+    try:
+        month = summary.parse_month(request.GET, today)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    if month is None:
+        return _chart(*await _window_totals(ExpenseRollup, request.user, today - SUMMARY_WINDOW, today),
+                      'total_expenses')
+    if month > today:
+        return _chart({}, [], 'total_expenses')
+    (totals, unconverted), prediction = await asyncio.gather(
+        _window_totals(ExpenseRollup, request.user, month, month), forecast.alookup(request.user))
+    return _chart(totals, unconverted, 'total_expenses', predicted_expense=prediction['total'],
+                  predicted_categories=prediction['categories'])
+
+
+@api_login_required
+@require_http_methods(['GET', 'HEAD'])
+@responses.cached_per_version
+async def income_category_summary(request):
+    """Income totals per source for ``?month=`` or the last six months."""
+    today = datetime.date.today()
+    try:
+        month = summary.parse_month(request.GET, today)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    start, end = (month, month) if month else (today - SUMMARY_WINDOW, today)
+    return _chart(*await _window_totals(IncomeRollup, request.user, start, end), 'total_income')
+
+
+async def _all_summary(request, model, total_key):
+    try:
+        start, end = summary.parse_date_range(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    currency = await aget_currency_code(request.user)
+    (categories, total_amounts, total), unconverted = await asyncio.gather(
+        summary.acategory_totals(model, request.user, start, end, currency),
+        rollups.aunconverted(rollups.ROLLUP_FOR_MODEL[model], request.user, currency, start, end))
+    return JsonResponse({'categories': categories, 'total_amounts': total_amounts, total_key: total,
+                         'unconverted_currencies': unconverted}, encoder=money.JSONEncoder)
+
+
+@api_login_required
+@require_http_methods(['GET', 'HEAD'])
+@responses.cached_per_version
+async def all_expenses_summary(request):
+    """Expense totals per category over everything or ``?start=&end=``."""
+    return await _all_summary(request, Expense, 'total_expenses')
+
+
+@api_login_required
+@require_http_methods(['GET', 'HEAD'])
+@responses.cached_per_version
+async def all_income_summary(request):
+    """Income totals per source over everything or ``?start=&end=``."""
+    return await _all_summary(request, UserIncome, 'total_income')
+
+
+@api_login_required
+@require_http_methods(['POST'])
+async def search_ledger(request, kind):
+    """One page of matches for ``{"searchText", "page", "pageSize"}``."""
+    try:
+        body = json.loads(request.body or b'{}')
+        if not isinstance(body, dict):
+            raise ValueError
+    except ValueError:
+        return JsonResponse({'error': 'Expected a JSON object'}, status=400)
+    try:
+        data = await search.asearch(request.user, kind, body.get('searchText'), page=body.get('page', 1),
+                                    page_size=body.get('pageSize', search.DEFAULT_PAGE_SIZE))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(data, safe=False, encoder=money.JSONEncoder)
+
+
+async def _notices(queryset):
+    return [{field: getattr(notice, field) for field in NOTICE_FIELDS} async for notice in queryset]
+
+
+@api_login_required
+@require_http_methods(['GET', 'HEAD'])
+async def unread_notifications(request):
+    """The user's unread notices, upcoming and expired, as on the notification page."""
+    upcoming, expired = notifications.unread(request.user)
+    upcoming, expired = await asyncio.gather(_notices(upcoming), _notices(expired))
+    return JsonResponse({'upcoming': upcoming, 'expired': expired}, encoder=money.JSONEncoder)
@@ -0,0 +1,145 @@
+"""Derived-data upkeep for rows written in bulk.
+
+``bulk_create`` and queryset ``update``/``delete`` skip model signals, so
+callers that write the ledger in bulk report the affected rows here to keep
+the search index, rollups, ledger versions and notifications current.
+"""
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+
+from expenses import notifications
+from expenses.models import Expense
+from . import forecast, money, rollups, search, versions
+
+
+def _add_deltas(deltas, snapshots, sign):
+    for values in snapshots:
+        date = values['date']
+        delta = deltas[(values['owner_id'], date.year, date.month, values['label'], values['currency'])]
+        delta[0] += sign * values['amount']
+        delta[1] += sign
+
+
+def _write_deltas(model, deltas):
+    rollup_model = rollups.ROLLUP_FOR_MODEL[model]
+    for (owner_id, year, month, label, currency), (amount, count) in deltas.items():
+        if amount or count:
+            rollups.apply_delta(rollup_model, owner_id, datetime.date(year, month, 1), label, currency,
+                                amount, count)
+
+
+def _new_deltas():
+    return defaultdict(lambda: [money.ZERO, 0])
+
+
+def _apply_rollups(model, snapshots, sign):
+    deltas = _new_deltas()
+    _add_deltas(deltas, snapshots, sign)
+    _write_deltas(model, deltas)
+
+
+def _discard_forecasts(model, objs):
+    if model is not Expense:
+        return
+    dates = defaultdict(list)
+    for obj in objs:
+        dates[obj.owner_id].append(obj.date)
+    for owner_id, owner_dates in dates.items():
+        forecast.changed(owner_id, owner_dates)
+
+
+class Batches:
+    """Upkeep for rows ``bulk_create``d in several batches, as an import does.
+
+    ``created`` indexes each batch and writes its notifications right away.
+    Rollup deltas, forecast discards and version bumps are merged across
+    batches and written once by ``finish``, so a rollup row that every batch
+    touches is updated once per import instead of once per batch. Call both
+    inside the transaction that creates the rows.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.deltas = _new_deltas()
+        self.dates = defaultdict(list)
+
+    def created(self, objs):
+        search.index_objects(objs)
+        _add_deltas(self.deltas, [rollups.snapshot(obj) for obj in objs], 1)
+        if self.model is Expense:
+            notifications.sync_many(objs)
+        for obj in objs:
+            self.dates[obj.owner_id].append(obj.date)
+
+    def finish(self):
+        _write_deltas(self.model, self.deltas)
+        if self.model is Expense:
+            for owner_id, dates in self.dates.items():
+                forecast.changed(owner_id, dates)
+        for owner_id in self.dates:
+            versions.bump(owner_id)
+        self.deltas = _new_deltas()
+        self.dates = defaultdict(list)
+
+
+def created(model, objs):
+    """Account for freshly ``bulk_create``d instances (with primary keys set)."""
+    if not objs:
+        return
+    with transaction.atomic():
+        batches = Batches(model)
+        batches.created(objs)
+        batches.finish()
+
+
+def deleted(model, objs):
+    """Account for instances that were removed without model signals."""
+    if not objs:
+        return
+    with transaction.atomic():
+        _apply_rollups(model, [rollups.snapshot(obj) for obj in objs], -1)
+        search.remove_objects(objs)
+        _discard_forecasts(model, objs)
+        for owner_id in {obj.owner_id for obj in objs}:
+            versions.bump(owner_id)
+
+
+def delete(model, objs):
+    """Delete ``objs`` and account for them in one pass.
+
+    The rows go through a queryset ``delete()``, which cascades to their
+    notifications. The per-row receivers in ``ledger.signals`` skip rows
+    deleted this way (see ``handled``), since ``deleted`` already covers them.
+    """
+    if not objs:
+        return
+    ids = [obj.pk for obj in objs]
+    with transaction.atomic():
+        deleted(model, objs)
+        for start in range(0, len(ids), search.DELETE_BATCH_SIZE):
+            rows = model.objects.filter(pk__in=ids[start:start + search.DELETE_BATCH_SIZE])
+            rows._ledger_bulk = True
+            rows.delete()
+
+
+def handled(origin):
+    """True if a deletion started from ``origin`` is accounted for by ``delete``."""
+    return getattr(origin, '_ledger_bulk', False)
+
+
+def updated(model, before, after):
+    """Account for rows rewritten in bulk; ``before`` holds their previous state."""
+    if not after:
+        return
+    with transaction.atomic():
+        _apply_rollups(model, [rollups.snapshot(obj) for obj in before], -1)
+        _apply_rollups(model, [rollups.snapshot(obj) for obj in after], 1)
+        search.remove_objects(before)
+        search.index_objects(after)
+        if model is Expense:
+            notifications.sync_many(after)
+        _discard_forecasts(model, before + after)
+        for owner_id in {obj.owner_id for obj in after}:
+            versions.bump(owner_id)
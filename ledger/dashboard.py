@@ -0,0 +1,125 @@
+"""Everything the dashboard shows, for one date window, in two queries.
+
+Income and expense totals, net savings per month and the top categories and
+sources all come from one UNION ALL over the two rollup tables. The most
+recent transactions of both kinds come from a second UNION ALL over the
+ledger. The rollups hold whole months, so the aggregates cover every month
+the window touches; the recent transactions respect the exact dates.
+Aggregates are converted into the viewer's currency like the summaries are
+(see ``rollups.convert_monthly``), leaving out and listing the currencies
+without FX rates; recent rows keep their own currency.
+"""
+import datetime
+
+from django.db import connection
+from django.db.models import CharField, F, Value
+
+from expenses.models import Expense
+from userincome.models import UserIncome
+from .models import ExpenseRollup, IncomeRollup
+from . import fx, money, rollups
+
+EXPENSE = 'expense'
+INCOME = 'income'
+DEFAULT_MONTHS = 12
+TOP_LABELS = 5
+RECENT_ROWS = 10
+
+
+def _add_months(date, months):
+    index = date.year * 12 + date.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def window(params, today=None):
+    """``(start, end)`` from optional ISO ``start``/``end`` query parameters.
+
+    Defaults to the last ``DEFAULT_MONTHS`` months up to today. Raises
+    ``ValueError`` when a date is malformed or the window is reversed.
+    """
+    today = today or datetime.date.today()
+    start = params.get('start')
+    end = params.get('end')
+    end = datetime.date.fromisoformat(end) if end else today
+    start = datetime.date.fromisoformat(start) if start else _add_months(end.replace(day=1), 1 - DEFAULT_MONTHS)
+    if start > end:
+        raise ValueError('start must not be after end')
+    return start, end
+
+
+def _rollup_rows(owner, start, end):
+    parts = []
+    for kind, rollup_model in ((EXPENSE, ExpenseRollup), (INCOME, IncomeRollup)):
+        label = rollup_model.LABEL_FIELD
+        parts.append(rollup_model.objects
+                     .filter(rollups.month_range(start, end), owner=owner)
+                     .annotate(kind=Value(kind, output_field=CharField()), label_name=F(f'{label}__name'))
+                     .values_list('kind', 'year', 'month', 'label_name', 'currency', 'total')
+                     .order_by())
+    return parts[0].union(parts[1], all=True)
+
+
+def _recent_rows(owner, start, end, limit):
+    parts = []
+    for kind, model, description in ((EXPENSE, Expense, 'descriptions'), (INCOME, UserIncome, 'description')):
+        label = rollups.ROLLUP_FOR_MODEL[model].LABEL_FIELD
+        rows = (model.objects
+                .filter(owner=owner, date__gte=start, date__lte=end)
+                .annotate(kind=Value(kind, output_field=CharField()), text=F(description),
+                          label_name=F(f'{label}__name'))
+                .values_list('kind', 'id', 'amount', 'currency', 'date', 'text', 'label_name'))
+        if connection.features.supports_slicing_ordering_in_compound:
+            # Each side only needs its own newest rows, read off the (owner, date, id) index.
+            rows = rows.order_by('-date', '-id')[:limit]
+        else:
+            rows = rows.order_by()
+        parts.append(rows)
+    return parts[0].union(parts[1], all=True).order_by('-date', '-id')[:limit]
+
+
+def _top(totals, limit):
+    ranked = sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+    return [{'name': name, 'total': total} for name, total in ranked[:limit]]
+
+
+def build(owner, start, end, currency=None, top=TOP_LABELS, recent=RECENT_ROWS):
+    """The dashboard data of ``owner`` for ``start`` through ``end``, JSON-ready with ``money.JSONEncoder``."""
+    first = start.replace(day=1)
+    months = {}
+    month = first
+    while month <= end:
+        months[(month.year, month.month)] = {EXPENSE: money.ZERO, INCOME: money.ZERO}
+        month = _add_months(month, 1)
+
+    labels = {EXPENSE: {}, INCOME: {}}
+    rows = list(_rollup_rows(owner, first, end))
+    today = datetime.date.today()
+    totals = fx.convert([row[5] for row in rows], [row[4] for row in rows],
+                        [rollups.conversion_date(row[1], row[2], today) for row in rows], currency)
+    for (kind, year, month, name, row_currency, stored), total in zip(rows, totals):
+        if total is None:
+            continue
+        months[(year, month)][kind] += total
+        labels[kind][name] = labels[kind].get(name, money.ZERO) + total
+
+    expenses = sum((row[EXPENSE] for row in months.values()), money.ZERO)
+    income = sum((row[INCOME] for row in months.values()), money.ZERO)
+    return {
+        'start': start,
+        'end': end,
+        'currency': currency,
+        'unconverted_currencies': fx.unconvertible([row[4] for row in rows], currency),
+        'totals': {'income': income, 'expenses': expenses, 'net': income - expenses},
+        'months': [
+            {'month': f'{year}-{month:02d}', 'income': row[INCOME], 'expenses': row[EXPENSE],
+             'net': row[INCOME] - row[EXPENSE]}
+            for (year, month), row in months.items()
+        ],
+        'top_categories': _top(labels[EXPENSE], top),
+        'top_sources': _top(labels[INCOME], top),
+        'recent': [
+            {'kind': kind, 'id': pk, 'amount': money.total(amount), 'currency': row_currency, 'date': date,
+             'description': text, 'label': name}
+            for kind, pk, amount, row_currency, date, text, name in _recent_rows(owner, start, end, recent)
+        ],
+    }
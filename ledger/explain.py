@@ -0,0 +1,52 @@
+"""Query-plan checks used by the index regression tests."""
+import re
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+LEDGER_TABLES = (
+    'expenses_expense',
+    'expenses_notification',
+    'userincome_userincome',
+    'ledger_searchtoken',
+    'ledger_expenserollup',
+    'ledger_incomerollup',
+)
+
+
+def explain(sql):
+    """Return the plan of ``sql`` as text lines for the current backend."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Tiny test tables are cheaper to scan; only ask whether an index *can* be used.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN ' + sql)
+            return [row[0] for row in cursor.fetchall()]
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def sequential_scans(sql, tables=LEDGER_TABLES):
+    """Plan lines of ``sql`` that read one of ``tables`` front to back."""
+    if connection.vendor == 'postgresql':
+        pattern = re.compile(r'Seq Scan on (%s)\b' % '|'.join(tables))
+    else:
+        pattern = re.compile(r'^SCAN (%s)\b' % '|'.join(tables))
+    return [line for line in explain(sql) if pattern.search(line)]
+
+
+class IndexedQueriesMixin:
+    """For TestCases whose ``self.client`` is logged in: every SELECT a request sends must use an index."""
+
+    def assertIndexedQueries(self, method, url, *args, **kwargs):
+        with CaptureQueriesContext(connection) as captured:
+            response = getattr(self.client, method)(url, *args, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400)
+        for query in captured.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            with self.subTest(url=url, sql=sql):
+                self.assertEqual(sequential_scans(sql), [])
@@ -0,0 +1,184 @@
+"""Next-month expense forecasts per category and in total.
+
+Each series is the owner's monthly totals over the last ``HISTORY_MONTHS``
+complete months, read from the expense rollups. It is fitted with a mean
+plus a yearly sine/cosine term. All of an owner's categories are solved at
+once with one least-squares call, since they share the same design matrix.
+Totals in other currencies are converted into the owner's preferred one
+first, so forecasts are stated in it.
+
+Forecasts are stored in ``ExpenseForecast`` and looked up by the summary
+view (through the cache, keyed by ledger version). A change inside the
+history window only discards the stored forecast; the next lookup fits it
+again. A burst of saves therefore costs one fit, and saving never waits on
+numpy.
+"""
+import datetime
+import math
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+
+from userpreferences import currencies
+from userpreferences.models import UserPreference
+from .models import ExpenseForecast, ExpenseRollup
+from . import fx, rollups, versions
+
+HISTORY_MONTHS = 12
+# Fewer months than coefficients would leave the fit underdetermined.
+MIN_MONTHS = 3
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _add_months(date, months):
+    index = date.year * 12 + date.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def target_month(today=None):
+    """First day of the month being forecast."""
+    today = today or datetime.date.today()
+    return _add_months(today.replace(day=1), 1)
+
+
+def history_window(today=None):
+    """``(first, last)`` month of the history the forecast is fitted on."""
+    this_month = (today or datetime.date.today()).replace(day=1)
+    return _add_months(this_month, -HISTORY_MONTHS), _add_months(this_month, -1)
+
+
+def _design(months):
+    import numpy as np
+
+    angles = 2 * math.pi * np.asarray(months, dtype=float) / 12
+    return np.column_stack([np.ones_like(angles), np.sin(angles), np.cos(angles)])
+
+
+def fit(series, months, target):
+    """Predict ``target``'s month for each row of ``series``.
+
+    ``series`` is a (series, months) array of monthly totals for the calendar
+    ``months`` (1-12). Returns one non-negative prediction per series.
+    """
+    import numpy as np
+
+    coefficients, *_ = np.linalg.lstsq(_design(months), np.asarray(series, dtype=float).T, rcond=None)
+    return np.maximum(_design([target.month]) @ coefficients, 0)[0]
+
+
+def preferred_currency(owner_id):
+    label = UserPreference.objects.filter(user_id=owner_id).values_list('currency', flat=True).first()
+    return currencies.code_from_label(label)
+
+
+def compute(owner_id, today=None):
+    """Return ``{'total': amount, 'categories': {category: amount}}`` for the target month."""
+    import numpy as np
+
+    first, last = history_window(today)
+    target = target_month(today)
+    rows = list(ExpenseRollup.objects
+                .filter(rollups.month_range(first, last), owner_id=owner_id)
+                .values_list('year', 'month', 'category__name', 'currency', 'total'))
+    if not rows:
+        return {'total': 0, 'categories': {}}
+
+    today = today or datetime.date.today()
+    amounts = np.asarray([float(row[4]) for row in rows]) * fx.factors(
+        [row[3] for row in rows], [rollups.conversion_date(row[0], row[1], today) for row in rows],
+        preferred_currency(owner_id))
+    categories = sorted({row[2] for row in rows})
+    positions = {category: index for index, category in enumerate(categories)}
+    series = np.zeros((len(categories) + 1, HISTORY_MONTHS))
+    for (year, month, category, currency, total), amount in zip(rows, amounts):
+        if np.isnan(amount):
+            # No FX rates for the row's currency.
+            continue
+        column = (year - first.year) * 12 + month - first.month
+        series[positions[category], column] += amount
+    series[-1] = series[:-1].sum(axis=0)
+
+    # Months before the owner's first expense are not zero-spend months.
+    spent = np.flatnonzero(series[-1])
+    active = int(spent[0]) if len(spent) else HISTORY_MONTHS
+    if HISTORY_MONTHS - active < MIN_MONTHS:
+        return {'total': 0, 'categories': {}}
+    months = [_add_months(first, offset).month for offset in range(active, HISTORY_MONTHS)]
+    predictions = fit(series[:, active:], months, target).round(2).tolist()
+    return {'total': predictions[-1], 'categories': dict(zip(categories, predictions[:-1]))}
+
+
+def refresh(owner_id, today=None):
+    """Recompute and store ``owner_id``'s forecast."""
+    target = target_month(today)
+    forecast = compute(owner_id, today)
+    rows = [ExpenseForecast(owner_id=owner_id, year=target.year, month=target.month,
+                            category=ExpenseForecast.TOTAL, amount=forecast['total'])]
+    rows.extend(ExpenseForecast(owner_id=owner_id, year=target.year, month=target.month,
+                                category=category, amount=amount)
+                for category, amount in forecast['categories'].items())
+    with transaction.atomic():
+        ExpenseForecast.objects.filter(owner_id=owner_id).delete()
+        # A concurrent refresh may have written the same month already.
+        ExpenseForecast.objects.bulk_create(rows, ignore_conflicts=True)
+    return forecast
+
+
+def discard(owner_id):
+    """Drop ``owner_id``'s stored forecast; ``lookup`` recomputes it when next asked."""
+    ExpenseForecast.objects.filter(owner_id=owner_id).delete()
+
+
+def changed(owner_id, dates, today=None):
+    """Discard the forecast if any of ``dates`` falls inside the history window."""
+    first, last = history_window(today)
+    end = _add_months(last, 1)
+    if any(first <= rollups.as_date(date) < end for date in dates):
+        discard(owner_id)
+
+
+def cache_key(owner_id, version, target):
+    return f'ledger:forecast:{owner_id}:{version}:{target:%Y-%m}'
+
+
+def _stored_rows(owner, target):
+    return (ExpenseForecast.objects.filter(owner=owner, year=target.year, month=target.month)
+            .values_list('category', 'amount'))
+
+
+def _stored(stored):
+    if ExpenseForecast.TOTAL not in stored:
+        return None
+    total = stored.pop(ExpenseForecast.TOTAL)
+    return {'total': total, 'categories': stored}
+
+
+def lookup(owner, today=None):
+    """The stored forecast for ``owner``; computed on the spot only once per target month."""
+    target = target_month(today)
+    key = cache_key(owner.pk, versions.current(owner), target)
+    forecast = cache.get(key)
+    if forecast is not None:
+        return forecast
+
+    forecast = _stored(dict(_stored_rows(owner, target)))
+    if forecast is None:
+        forecast = refresh(owner.pk, today)
+    cache.set(key, forecast, CACHE_TIMEOUT)
+    return forecast
+
+
+async def alookup(owner, today=None):
+    """``lookup`` for async views; a missing forecast is computed in a worker thread."""
+    target = target_month(today)
+    key = cache_key(owner.pk, await versions.acurrent(owner), target)
+    forecast = await cache.aget(key)
+    if forecast is not None:
+        return forecast
+
+    forecast = _stored({category: amount async for category, amount in _stored_rows(owner, target)})
+    if forecast is None:
+        forecast = await sync_to_async(refresh)(owner.pk, today)
+    await cache.aset(key, forecast, CACHE_TIMEOUT)
+    return forecast
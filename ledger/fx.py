@@ -0,0 +1,191 @@
+"""Exchange rates for showing amounts in the user's preferred currency.
+
+Rates come from the local CSV at ``settings.FX_RATES_FILE`` with
+``date,currency,rate`` rows. ``rate`` is the number of units of ``currency``
+that one unit of ``settings.FX_BASE_CURRENCY`` buys on ``date``. Nothing is
+fetched over the network. Each currency is held as two sorted arrays, days
+and rates, so the rate in force on a date is a binary search away. The
+rate in force is the last one published on or before that date. A whole
+column of dates is looked up in one ``searchsorted`` call.
+
+The file is parsed on first use and re-read when its modification time
+changes, checked at most every ``CHECK_INTERVAL`` seconds. ``revision()``
+changes with every reload, so caches of converted values can be keyed by it.
+
+Ledger rows with an empty currency predate per-row currencies and are never
+converted. Amounts in a currency the file has no rates for cannot be
+converted either; ``convert`` returns None for them so totals can leave them
+out, and ``unconvertible`` names those currencies so summaries can say so.
+"""
+import csv
+import datetime
+import io
+import logging
+import math
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from . import money
+
+logger = logging.getLogger(__name__)
+
+CHECK_INTERVAL = 5
+
+_lock = threading.Lock()
+_path = None
+_mtime = None
+_checked_at = 0.0
+# currency -> (days as date ordinals, rates), both sorted numpy arrays
+_tables = {}
+# Currencies already reported as missing since the last load.
+_missing = set()
+
+
+def rates_file():
+    return getattr(settings, 'FX_RATES_FILE', os.path.join(settings.BASE_DIR, 'fx_rates.csv'))
+
+
+def base_currency():
+    return getattr(settings, 'FX_BASE_CURRENCY', 'USD')
+
+
+def load(path=None):
+    """Parse the rates file into per-currency lookup tables."""
+    global _path, _mtime, _checked_at, _tables, _missing
+    import numpy as np
+
+    path = path or rates_file()
+    with _lock:
+        series = {}
+        try:
+            mtime = os.stat(path).st_mtime
+            rates = open(path, newline='')
+        except OSError:
+            logger.warning('No FX rates file at %s; amounts in other currencies cannot be converted', path)
+            mtime, rates = None, io.StringIO()
+        with rates:
+            for line_number, row in enumerate(csv.DictReader(rates), start=2):
+                try:
+                    day = datetime.date.fromisoformat(row['date'].strip()).toordinal()
+                    rate = float(row['rate'])
+                except (KeyError, TypeError, ValueError):
+                    logger.warning('Skipping malformed FX rate on line %s of %s', line_number, path)
+                    continue
+                if rate > 0:
+                    series.setdefault(row['currency'].strip().upper(), {})[day] = rate
+        tables = {}
+        for code, by_day in series.items():
+            days = sorted(by_day)
+            tables[code] = (np.array(days, dtype=np.int64), np.array([by_day[day] for day in days]))
+        _tables = tables
+        _missing = set()
+        _path, _mtime, _checked_at = path, mtime, time.monotonic()
+
+
+def _refresh():
+    global _checked_at
+    if _path is None:
+        load()
+        return
+    now = time.monotonic()
+    if now - _checked_at < CHECK_INTERVAL:
+        return
+    _checked_at = now
+    try:
+        changed = os.stat(_path).st_mtime != _mtime
+    except OSError:
+        return
+    if changed:
+        load(_path)
+
+
+def revision():
+    """Changes whenever the rates are reloaded."""
+    _refresh()
+    return f'{_path}@{_mtime!r}'
+
+
+def currencies():
+    """Codes that can be converted, the base currency included."""
+    _refresh()
+    return {base_currency(), *_tables}
+
+
+def _rates(code, days):
+    """Units of ``code`` per base unit on each of ``days``, or None without rates for ``code``."""
+    import numpy as np
+
+    if code == base_currency():
+        return np.ones(len(days))
+    table = _tables.get(code)
+    if table is None:
+        if code not in _missing:
+            _missing.add(code)
+            logger.warning('No FX rates for %s; amounts in or to it cannot be converted', code)
+        return None
+    known_days, known_rates = table
+    # Dates before the first published rate use the first one.
+    positions = np.maximum(np.searchsorted(known_days, days, side='right') - 1, 0)
+    return known_rates[positions]
+
+
+def unconvertible(codes, target):
+    """The codes among ``codes`` whose amounts cannot be converted into ``target``, sorted."""
+    if not target:
+        return []
+    known = currencies()
+    if target not in known:
+        return sorted({code for code in codes if code and code != target})
+    return sorted({code for code in codes if code and code not in known})
+
+
+def rate(source, target, date):
+    """Units of ``target`` one unit of ``source`` is worth on ``date``, or None without rates."""
+    value = float(factors([source], [date], target)[0])
+    return None if math.isnan(value) else value
+
+
+def factors(codes, dates, target):
+    """Per-row multipliers turning amounts in ``codes`` on ``dates`` into ``target``.
+
+    Rows are grouped by currency and each group is looked up in one
+    vectorized binary search. Rows that cannot be converted get NaN.
+    """
+    import numpy as np
+
+    _refresh()
+    codes = np.asarray(codes, dtype=object)
+    days = np.fromiter((date.toordinal() for date in dates), dtype=np.int64, count=len(codes))
+    result = np.ones(len(codes))
+    if not target or not len(codes):
+        return result
+    target_rates = _rates(target, days)
+    for code in set(codes.tolist()) - {'', target}:
+        rows = codes == code
+        source_rates = _rates(code, days[rows])
+        if target_rates is None or source_rates is None:
+            result[rows] = np.nan
+            continue
+        result[rows] = target_rates[rows] / source_rates
+    return result
+
+
+def convert(amounts, codes, dates, target):
+    """``amounts`` in ``codes`` on ``dates`` converted to ``target``, as cents.
+
+    Amounts that need no conversion come back exact rather than via float;
+    amounts that cannot be converted come back as None.
+    """
+    import numpy as np
+
+    if not amounts:
+        return []
+    if not target:
+        return [money.total(amount) for amount in amounts]
+    multipliers = factors(codes, dates, target)
+    converted = (np.asarray([float(amount) for amount in amounts]) * multipliers).round(2).tolist()
+    return [None if math.isnan(value) else money.total(amount if unchanged else value)
+            for amount, value, unchanged in zip(amounts, converted, (multipliers == 1).tolist())]
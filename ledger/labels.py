@@ -0,0 +1,177 @@
+"""Expense categories and income sources.
+
+``Expense.category`` and ``UserIncome.source`` are foreign keys to the small
+``Category`` and ``Source`` tables, so grouping and filtering work on integer
+ids. Forms, imports and the API still speak names. Names are matched
+case-insensitively with whitespace collapsed. Both tables are shared by every
+user and managed in the admin, so names that match no row are rejected
+rather than created; ``ensure`` creates them for seeding and tests.
+
+Both tables are small and rarely change, so ``choices`` serves them from a
+process-local registry. The registry checks a version token in the shared
+cache and reloads (from the cache, else the database) when a save or delete
+of a Category or Source has replaced the token. With a per-process cache,
+that only reaches the process making the change. The cache entries
+therefore expire after ``CACHE_TIMEOUT``, which bounds how stale any other
+process can get. Form renders cost no query. ``resolve_many`` confirms the
+labels it found in the registry with one primary-key query, and looks up
+by name in the database any that have gone missing. ``revision`` is a digest
+of both registries, so ETags and caches of anything showing label names can
+be keyed by it and change when a label is renamed.
+"""
+import hashlib
+import threading
+import uuid
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+
+from expenses.models import Category, Expense
+from userincome.models import Source, UserIncome
+
+# Ledger model -> (label field, label model)
+LABELS = {
+    Expense: ('category', Category),
+    UserIncome: ('source', Source),
+}
+
+Label = namedtuple('Label', ['id', 'name'])
+
+CACHE_TIMEOUT = 60 * 5
+
+_lock = threading.Lock()
+# label model -> (version token, choices, {lower-cased name: Label}, digest of choices)
+_registry = {}
+
+
+def _cache_key(label_model, *parts):
+    return ':'.join(['ledger:labels', label_model._meta.label_lower, *parts])
+
+
+def _load(label_model):
+    version_key = _cache_key(label_model, 'version')
+    version = cache.get(version_key)
+    entry = _registry.get(label_model)
+    if entry is not None and version is not None and entry[0] == version:
+        return entry
+
+    rows = cache.get(_cache_key(label_model, version)) if version is not None else None
+    if rows is None:
+        rows = tuple(Label(*row) for row in label_model.objects.order_by('name').values_list('pk', 'name'))
+        if version is None:
+            version = uuid.uuid4().hex
+            # Another process may have published a version meanwhile; keep theirs.
+            if not cache.add(version_key, version, CACHE_TIMEOUT):
+                version = cache.get(version_key, version)
+        cache.set(_cache_key(label_model, version), rows, CACHE_TIMEOUT)
+    digest = hashlib.sha1(repr(rows).encode()).hexdigest()[:12]
+    entry = (version, rows, {label.name.lower(): label for label in rows}, digest)
+    with _lock:
+        _registry[label_model] = entry
+    return entry
+
+
+def choices(label_model):
+    """All ``Category`` or ``Source`` rows as ``Label(id, name)`` tuples, ordered by name."""
+    return _load(label_model)[1]
+
+
+def revision():
+    """Changes whenever a Category or Source is added, renamed or deleted."""
+    return '.'.join(_load(label_model)[3] for label_model in (Category, Source))
+
+
+async def arevision():
+    """``revision`` for async views; reloads a stale registry in a worker thread."""
+    digests = []
+    for label_model in (Category, Source):
+        version = await cache.aget(_cache_key(label_model, 'version'))
+        entry = _registry.get(label_model)
+        if entry is None or version is None or entry[0] != version:
+            entry = await sync_to_async(_load)(label_model)
+        digests.append(entry[3])
+    return '.'.join(digests)
+
+
+def invalidate(label_model):
+    """Drop the registry of ``label_model`` in every process sharing the cache."""
+    cache.delete(_cache_key(label_model, 'version'))
+    with _lock:
+        _registry.pop(label_model, None)
+
+
+def clean_name(name):
+    """``name`` with whitespace collapsed; '' for None."""
+    return ' '.join(str(name).split()) if name is not None else ''
+
+
+def unknown(model, name):
+    """The error for a ``name`` that matches no label of ``model``."""
+    return f'Unknown {LABELS[model][0]} "{clean_name(name)}"'
+
+
+def resolve(model, name):
+    """The label of ``model`` called ``name``, or None if there is none or ``name`` is blank."""
+    return resolve_many(model, [name]).get(clean_name(name))
+
+
+def resolve_many(model, names):
+    """Map each (cleaned) name in ``names`` to its existing label.
+
+    Blank names and names that match no label are left out of the result.
+    """
+    label_model = LABELS[model][1]
+    wanted = {clean_name(name) for name in names} - {''}
+    keys = {name.lower(): name for name in wanted}
+    known = _load(label_model)[2]
+    registered = {known[key].id: key for key in keys if key in known}
+    found = {}
+    if registered:
+        for label in label_model.objects.filter(pk__in=registered):
+            if label.name.lower() == registered[label.pk]:
+                found[registered[label.pk]] = label
+        if len(found) < len(registered):
+            # Deleted or renamed by another process since the registry was loaded.
+            invalidate(label_model)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        found.update((label.key, label) for label in
+                     label_model.objects.annotate(key=Lower('name')).filter(key__in=missing))
+    return {name: found[name.lower()] for name in wanted if name.lower() in found}
+
+
+def ensure(model, names):
+    """Like ``resolve_many``, but creates the missing labels. Not for user input."""
+    label_model = LABELS[model][1]
+    found = resolve_many(model, names)
+    for name in {clean_name(name) for name in names} - {''} - set(found):
+        try:
+            with transaction.atomic():
+                found[name] = label_model.objects.create(name=name)
+        except IntegrityError:
+            # Created concurrently.
+            found[name] = label_model.objects.get(name__iexact=name)
+    return found
+
+
+def _columns(queryset, fields):
+    label_field = LABELS[queryset.model][0]
+    lookup = f'{label_field}__name'
+    return [lookup if field == label_field else field for field in fields]
+
+
+def values(queryset, fields):
+    """``queryset.values(*fields)`` with the label field holding the name instead of the id."""
+    columns = _columns(queryset, fields)
+    for row in queryset.values(*columns):
+        yield {field: row[column] for field, column in zip(fields, columns)}
+
+
+async def avalues(queryset, fields):
+    """``values`` on the async ORM."""
+    columns = _columns(queryset, fields)
+    async for row in queryset.values(*columns):
+        yield {field: row[column] for field, column in zip(fields, columns)}
@@ -0,0 +1,21 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from ledger import api
+
+
+class Command(BaseCommand):
+    help = 'Issue an API key for a user, for scripts and mobile clients of /api/.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--name', default='', help='What the key is for, e.g. "phone".')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']} does not exist")
+
+        key = api.create_token(user, options['name'])
+        self.stdout.write(self.style.SUCCESS(f'Send "Authorization: Bearer {key}"; it is not shown again.'))
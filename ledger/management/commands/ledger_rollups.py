@@ -0,0 +1,41 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from ledger import rollups
+from ledger.models import ExpenseRollup, IncomeRollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or validate the monthly expense and income rollup tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['rebuild', 'validate'])
+        parser.add_argument('--user', help='Only process rows owned by this username.')
+
+    def handle(self, *args, **options):
+        owner = None
+        if options['user']:
+            try:
+                owner = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['user']} does not exist")
+
+        failed = False
+        for rollup_model in (ExpenseRollup, IncomeRollup):
+            name = rollup_model._meta.verbose_name_plural
+            if options['action'] == 'rebuild':
+                written = rollups.rebuild(rollup_model, owner=owner)
+                self.stdout.write(self.style.SUCCESS(f'Wrote {written} {name}'))
+                continue
+
+            mismatches = rollups.validate(rollup_model, owner=owner)
+            if mismatches:
+                failed = True
+                self.stdout.write(self.style.ERROR(f'{len(mismatches)} {name} differ from the ledger'))
+                for owner_id, year, month, label in mismatches[:20]:
+                    self.stdout.write(f'  user {owner_id} {year}-{month:02d} {label}')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'All {name} match the ledger'))
+
+        if failed:
+            raise CommandError('Rollups are out of date, run "ledger_rollups rebuild"')
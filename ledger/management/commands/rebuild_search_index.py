@@ -0,0 +1,27 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from ledger import search
+from ledger.models import SearchToken
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the expense and income search index from the ledger tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=[kind for kind, label in SearchToken.KIND_CHOICES],
+                            help='Only rebuild expenses or income.')
+        parser.add_argument('--user', help='Only rebuild rows owned by this username.')
+
+    def handle(self, *args, **options):
+        owner = None
+        if options['user']:
+            try:
+                owner = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['user']} does not exist")
+
+        kinds = [options['kind']] if options['kind'] else list(search.INDEXED_FIELDS)
+        for kind in kinds:
+            indexed = search.rebuild(kind, owner=owner)
+            self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} {kind} rows'))
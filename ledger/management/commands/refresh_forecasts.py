@@ -0,0 +1,24 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from ledger import forecast
+
+
+class Command(BaseCommand):
+    help = "Recompute next month's expense forecasts, e.g. from cron on the first of each month."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only refresh the forecast of this username.')
+
+    def handle(self, *args, **options):
+        owners = User.objects.all()
+        if options['user']:
+            owners = owners.filter(username=options['user'])
+            if not owners.exists():
+                raise CommandError(f"User {options['user']} does not exist")
+
+        refreshed = 0
+        for owner_id in owners.values_list('pk', flat=True).iterator():
+            forecast.refresh(owner_id)
+            refreshed += 1
+        self.stdout.write(self.style.SUCCESS(f'Refreshed {refreshed} forecasts'))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0004_expenseforecast'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='expenserollup',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='incomerollup',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=16),
+        ),
+    ]
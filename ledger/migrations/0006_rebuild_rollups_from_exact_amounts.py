@@ -0,0 +1,46 @@
+from django.db import migrations, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+ROLLUPS = (
+    ('ExpenseRollup', 'expenses', 'Expense', 'category'),
+    ('IncomeRollup', 'userincome', 'UserIncome', 'source'),
+)
+
+
+def rebuild(apps, schema_editor):
+    """Recompute every rollup from the exact amounts, one owner per transaction.
+
+    The old totals were float sums and have drifted by fractions of a cent.
+    """
+    User = apps.get_model('auth', 'User')
+    for rollup_name, app_label, model_name, label in ROLLUPS:
+        Rollup = apps.get_model('ledger', rollup_name)
+        Ledger = apps.get_model(app_label, model_name)
+        for owner_id in User.objects.values_list('pk', flat=True).iterator():
+            rows = (Ledger.objects.filter(owner_id=owner_id)
+                    .annotate(year=ExtractYear('date'), month=ExtractMonth('date'))
+                    .values('year', 'month', label)
+                    .annotate(amount=Sum('amount'), rows=Count('id'))
+                    .order_by())
+            with transaction.atomic():
+                Rollup.objects.filter(owner_id=owner_id).delete()
+                Rollup.objects.bulk_create(
+                    Rollup(owner_id=owner_id, year=row['year'], month=row['month'],
+                           total=row['amount'], count=row['rows'], **{label: row[label]})
+                    for row in rows
+                )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('ledger', '0005_exact_rollup_totals'),
+        ('expenses', '0014_expense_amount_decimal'),
+        ('userincome', '0010_userincome_amount_decimal'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild, migrations.RunPython.noop, elidable=True),
+    ]
@@ -0,0 +1,85 @@
+import django.db.models.deletion
+from django.db import migrations, models, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+ROLLUPS = (
+    ('ExpenseRollup', 'expenses', 'Expense', 'category'),
+    ('IncomeRollup', 'userincome', 'UserIncome', 'source'),
+)
+
+
+def clear(apps, schema_editor):
+    for rollup_name, app_label, model_name, label in ROLLUPS:
+        apps.get_model('ledger', rollup_name).objects.all().delete()
+
+
+def rebuild(apps, schema_editor):
+    """Recompute the rollups, now keyed by label id, one owner per transaction."""
+    User = apps.get_model('auth', 'User')
+    for rollup_name, app_label, model_name, label in ROLLUPS:
+        Rollup = apps.get_model('ledger', rollup_name)
+        Ledger = apps.get_model(app_label, model_name)
+        for owner_id in User.objects.values_list('pk', flat=True).iterator():
+            rows = (Ledger.objects.filter(owner_id=owner_id)
+                    .annotate(year=ExtractYear('date'), month=ExtractMonth('date'))
+                    .values('year', 'month', label)
+                    .annotate(amount=Sum('amount'), rows=Count('id'))
+                    .order_by())
+            with transaction.atomic():
+                Rollup.objects.bulk_create(
+                    Rollup(owner_id=owner_id, year=row['year'], month=row['month'],
+                           total=row['amount'], count=row['rows'], **{f'{label}_id': row[label]})
+                    for row in rows
+                )
+
+
+class Migration(migrations.Migration):
+    """Key the rollups by category/source id. They are derived data, so they are rebuilt."""
+
+    atomic = False
+
+    dependencies = [
+        ('ledger', '0006_rebuild_rollups_from_exact_amounts'),
+        ('expenses', '0017_expense_category_fk'),
+        ('userincome', '0013_userincome_source_fk'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='expenserollup',
+            name='ledger_expense_rollup_key',
+        ),
+        migrations.RemoveConstraint(
+            model_name='incomerollup',
+            name='ledger_income_rollup_key',
+        ),
+        migrations.RemoveField(
+            model_name='expenserollup',
+            name='category',
+        ),
+        migrations.RemoveField(
+            model_name='incomerollup',
+            name='source',
+        ),
+        migrations.AddField(
+            model_name='expenserollup',
+            name='category',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='expenses.category'),
+        ),
+        migrations.AddField(
+            model_name='incomerollup',
+            name='source',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='userincome.source'),
+        ),
+        migrations.AddConstraint(
+            model_name='expenserollup',
+            constraint=models.UniqueConstraint(fields=('owner', 'year', 'month', 'category'), name='ledger_expense_rollup_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='incomerollup',
+            constraint=models.UniqueConstraint(fields=('owner', 'year', 'month', 'source'), name='ledger_income_rollup_key'),
+        ),
+        migrations.RunPython(rebuild, migrations.RunPython.noop, elidable=True),
+    ]
@@ -0,0 +1,76 @@
+from django.db import migrations, models, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+ROLLUPS = (
+    ('ExpenseRollup', 'expenses', 'Expense', 'category'),
+    ('IncomeRollup', 'userincome', 'UserIncome', 'source'),
+)
+
+
+def clear(apps, schema_editor):
+    for rollup_name, app_label, model_name, label in ROLLUPS:
+        apps.get_model('ledger', rollup_name).objects.all().delete()
+
+
+def rebuild(apps, schema_editor):
+    """Recompute the rollups, now split by currency, one owner per transaction."""
+    User = apps.get_model('auth', 'User')
+    for rollup_name, app_label, model_name, label in ROLLUPS:
+        Rollup = apps.get_model('ledger', rollup_name)
+        Ledger = apps.get_model(app_label, model_name)
+        for owner_id in User.objects.values_list('pk', flat=True).iterator():
+            rows = (Ledger.objects.filter(owner_id=owner_id)
+                    .annotate(year=ExtractYear('date'), month=ExtractMonth('date'))
+                    .values('year', 'month', label, 'currency')
+                    .annotate(amount=Sum('amount'), rows=Count('id'))
+                    .order_by())
+            with transaction.atomic():
+                Rollup.objects.bulk_create(
+                    Rollup(owner_id=owner_id, year=row['year'], month=row['month'], currency=row['currency'],
+                           total=row['amount'], count=row['rows'], **{f'{label}_id': row[label]})
+                    for row in rows
+                )
+
+
+class Migration(migrations.Migration):
+    """Key the rollups by currency too. They are derived data, so they are rebuilt."""
+
+    atomic = False
+
+    dependencies = [
+        ('ledger', '0007_rollup_label_foreign_keys'),
+        ('expenses', '0019_backfill_expense_currency'),
+        ('userincome', '0015_backfill_userincome_currency'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='expenserollup',
+            name='ledger_expense_rollup_key',
+        ),
+        migrations.RemoveConstraint(
+            model_name='incomerollup',
+            name='ledger_income_rollup_key',
+        ),
+        migrations.AddField(
+            model_name='expenserollup',
+            name='currency',
+            field=models.CharField(blank=True, default='', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='incomerollup',
+            name='currency',
+            field=models.CharField(blank=True, default='', max_length=3),
+        ),
+        migrations.AddConstraint(
+            model_name='expenserollup',
+            constraint=models.UniqueConstraint(fields=('owner', 'year', 'month', 'category', 'currency'), name='ledger_expense_rollup_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='incomerollup',
+            constraint=models.UniqueConstraint(fields=('owner', 'year', 'month', 'source', 'currency'), name='ledger_income_rollup_key'),
+        ),
+        migrations.RunPython(rebuild, migrations.RunPython.noop, elidable=True),
+    ]
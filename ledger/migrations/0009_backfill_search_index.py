@@ -0,0 +1,68 @@
+import re
+
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+# Frozen copy of the tokenizer in ledger.search as of this migration.
+GRAM_SIZE = 3
+_WORD_RE = re.compile(r'\w+')
+INDEXED_FIELDS = {
+    'expense': (('expenses', 'Expense'), {'category__name': 3, 'descriptions': 2, 'amount': 1, 'date': 1}),
+    'income': (('userincome', 'UserIncome'), {'source__name': 3, 'description': 2, 'amount': 1, 'date': 1}),
+}
+
+
+def _word_grams(word):
+    grams = {'^' + word[:n] for n in range(1, min(len(word), GRAM_SIZE - 1) + 1)}
+    grams.update(word[i:i + GRAM_SIZE] for i in range(len(word) - GRAM_SIZE + 1))
+    return grams
+
+
+def document_tokens(fields, row):
+    tokens = {}
+    for field, weight in fields.items():
+        for word in _WORD_RE.findall(str(row[field]).lower()):
+            for gram in _word_grams(word):
+                if tokens.get(gram, 0) < weight:
+                    tokens[gram] = weight
+    return tokens
+
+
+def backfill(apps, schema_editor):
+    """Index the rows that were stored before the search index existed.
+
+    Rows saved since then already have tokens and are left alone, so this is
+    the same as ``rebuild_search_index`` on a database that predates it.
+    """
+    SearchToken = apps.get_model('ledger', 'SearchToken')
+    for kind, (model, fields) in INDEXED_FIELDS.items():
+        Ledger = apps.get_model(*model)
+        indexed = SearchToken.objects.filter(kind=kind).values('object_id')
+        rows = (Ledger.objects.exclude(pk__in=indexed)
+                .values('id', 'owner_id', *fields)
+                .iterator(chunk_size=BATCH_SIZE))
+        pending = []
+        for row in rows:
+            pending.extend(
+                SearchToken(owner_id=row['owner_id'], kind=kind, object_id=row['id'], token=token, weight=weight)
+                for token, weight in document_tokens(fields, row).items()
+            )
+            if len(pending) >= BATCH_SIZE:
+                SearchToken.objects.bulk_create(pending)
+                pending = []
+        SearchToken.objects.bulk_create(pending)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('ledger', '0008_rollup_currency'),
+        ('expenses', '0019_backfill_expense_currency'),
+        ('userincome', '0015_backfill_userincome_currency'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop, elidable=True),
+    ]
@@ -0,0 +1,110 @@
+from django.db import models
+from django.contrib.auth.models import User
+
+
+class SearchToken(models.Model):
+    """One n-gram of an Expense or UserIncome row in the per-user search index."""
+    EXPENSE = 'expense'
+    INCOME = 'income'
+    KIND_CHOICES = [
+        (EXPENSE, 'Expense'),
+        (INCOME, 'Income'),
+    ]
+
+    owner = models.ForeignKey(to=User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    token = models.CharField(max_length=16)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    def __str__(self):
+        return self.token
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'kind', 'token', 'object_id'], name='ledger_token_lookup_idx'),
+            models.Index(fields=['kind', 'object_id'], name='ledger_token_object_idx'),
+        ]
+
+
+class MonthlyRollup(models.Model):
+    """Per-owner monthly total of one category (expenses) or source (income) in one currency."""
+    owner = models.ForeignKey(to=User, on_delete=models.CASCADE)
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    currency = models.CharField(max_length=3, blank=True, default='')
+    total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class ExpenseRollup(MonthlyRollup):
+    LABEL_FIELD = 'category'
+
+    # Rollups are always read per owner; the unique key below is the index they use.
+    category = models.ForeignKey(to='expenses.Category', on_delete=models.CASCADE, related_name='+', db_index=False)
+
+    def __str__(self):
+        return f'{self.year}-{self.month:02d} {self.category_id}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'year', 'month', 'category', 'currency'], name='ledger_expense_rollup_key'),
+        ]
+
+
+class IncomeRollup(MonthlyRollup):
+    LABEL_FIELD = 'source'
+
+    source = models.ForeignKey(to='userincome.Source', on_delete=models.CASCADE, related_name='+', db_index=False)
+
+    def __str__(self):
+        return f'{self.year}-{self.month:02d} {self.source_id}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'year', 'month', 'source', 'currency'], name='ledger_income_rollup_key'),
+        ]
+
+
+class LedgerVersion(models.Model):
+    """Counter bumped whenever any of the owner's expenses or income change."""
+    owner = models.OneToOneField(to=User, on_delete=models.CASCADE)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.owner} v{self.version}'
+
+
+class ExpenseForecast(models.Model):
+    """Predicted spending of one category, or of all of them when ``category`` is blank, for a month."""
+    TOTAL = ''
+
+    owner = models.ForeignKey(to=User, on_delete=models.CASCADE)
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    category = models.CharField(max_length=300, blank=True)
+    amount = models.FloatField(default=0)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.year}-{self.month:02d} {self.category or "total"}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'year', 'month', 'category'], name='ledger_forecast_key'),
+        ]
+
+
+class ApiToken(models.Model):
+    """A key scripts and mobile clients send as ``Authorization: Bearer <key>``; only its SHA-256 is stored."""
+    user = models.ForeignKey(to=User, on_delete=models.CASCADE)
+    digest = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.user} {self.name or self.pk}'
@@ -0,0 +1,57 @@
+"""Exact money values.
+
+Amounts are stored as ``DecimalField(max_digits=MAX_DIGITS, decimal_places=2)``
+and kept as ``Decimal`` all the way through rollups and sums. Only JSON
+responses turn them back into numbers: a two-decimal amount prints exactly
+as a float, and the charts expect numbers, not strings.
+"""
+import decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+MAX_DIGITS = 12
+DECIMAL_PLACES = 2
+CENT = decimal.Decimal('0.01')
+ZERO = decimal.Decimal('0.00')
+# Rollups add up many rows, so they get more room than a single amount.
+TOTAL_MAX_DIGITS = 16
+
+_LIMIT = decimal.Decimal(10) ** (MAX_DIGITS - DECIMAL_PLACES)
+
+
+def parse(value):
+    """``value`` (str, int, float or Decimal) rounded to cents.
+
+    Raises ``ValueError`` for anything that is not a finite amount that fits
+    the amount column.
+    """
+    try:
+        amount = decimal.Decimal(str(value).strip())
+    except decimal.InvalidOperation:
+        raise ValueError(f'{value!r} is not an amount')
+    if not amount.is_finite():
+        raise ValueError(f'{value!r} is not an amount')
+    amount = amount.quantize(CENT, rounding=decimal.ROUND_HALF_UP)
+    if abs(amount) >= _LIMIT:
+        raise ValueError(f'{value!r} is too large')
+    return amount
+
+
+def total(value):
+    """A DB-side ``Sum`` as exact cents.
+
+    PostgreSQL sums numerics exactly; SQLite keeps them as REAL and hands back
+    values like 9425.08999999999, so they are rounded back to cents here.
+    """
+    if value is None:
+        return ZERO
+    return decimal.Decimal(value).quantize(CENT, rounding=decimal.ROUND_HALF_UP)
+
+
+class JSONEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder that writes Decimals as JSON numbers instead of strings."""
+
+    def default(self, o):
+        if isinstance(o, decimal.Decimal):
+            return float(o)
+        return super().default(o)
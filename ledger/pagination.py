@@ -0,0 +1,120 @@
+"""Keyset pagination of ledger lists on (date, id), newest first.
+
+Pages are addressed by the (date, id) of the row just before or after them
+instead of an OFFSET, so every page costs one index range scan on
+(owner, date, id) however deep the user goes.
+"""
+import datetime
+import math
+from urllib.parse import urlencode
+
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 5
+PAGE_SIZES = (5, 10, 25, 50, 100)
+
+
+def encode_cursor(date, pk):
+    return f'{date.isoformat()}.{pk}'
+
+
+def decode_cursor(value):
+    """Return ``(date, id)`` for a cursor, or None if it is missing or malformed."""
+    if not value:
+        return None
+    try:
+        date, pk = value.split('.')
+        return datetime.date.fromisoformat(date), int(pk)
+    except ValueError:
+        return None
+
+
+def older_than(queryset, cursor):
+    """Rows after ``cursor`` in newest-first order."""
+    date, pk = cursor
+    return queryset.filter(Q(date__lt=date) | Q(date=date, id__lt=pk))
+
+
+def _positive_int(value, default):
+    try:
+        return max(int(value), 1)
+    except (TypeError, ValueError):
+        return default
+
+
+def get_page_size(params):
+    size = _positive_int(params.get('size'), DEFAULT_PAGE_SIZE)
+    return size if size in PAGE_SIZES else DEFAULT_PAGE_SIZE
+
+
+class KeysetPage:
+    def __init__(self, object_list, number, page_size, total_count, has_next, has_previous):
+        self.object_list = object_list
+        self.number = number
+        self.page_size = page_size
+        self.total_count = total_count
+        self.num_pages = max(math.ceil(total_count / page_size), 1)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def _query(self, **params):
+        return urlencode({'size': self.page_size, **params})
+
+    def first_query(self):
+        return self._query()
+
+    def last_query(self):
+        return self._query(last=1)
+
+    def next_query(self):
+        return self._query(after=encode_cursor(self.object_list[-1].date, self.object_list[-1].pk), page=self.number + 1)
+
+    def previous_query(self):
+        if not self.object_list:
+            return self.first_query()
+        return self._query(before=encode_cursor(self.object_list[0].date, self.object_list[0].pk), page=max(self.number - 1, 1))
+
+
+def paginate(queryset, params, total_count):
+    """Return the ``KeysetPage`` of ``queryset`` selected by ``params``.
+
+    ``params`` may carry ``after`` or ``before`` cursors, ``last``, ``size`` and
+    the display-only ``page`` number. ``total_count`` is supplied by the caller
+    so it can come from a cheap or cached source.
+    """
+    page_size = get_page_size(params)
+    number = _positive_int(params.get('page'), 1)
+    after = decode_cursor(params.get('after'))
+    before = decode_cursor(params.get('before'))
+    num_pages = max(math.ceil(total_count / page_size), 1)
+
+    if params.get('last'):
+        remainder = total_count - (num_pages - 1) * page_size
+        rows = list(queryset.order_by('date', 'id')[:max(remainder, 1)])[::-1]
+        return KeysetPage(rows, num_pages, page_size, total_count, False, num_pages > 1)
+
+    if before is not None:
+        date, pk = before
+        rows = list(queryset.filter(Q(date__gt=date) | Q(date=date, id__gt=pk)).order_by('date', 'id')[:page_size + 1])
+        has_previous = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        return KeysetPage(rows, number if has_previous else 1, page_size, total_count, True, has_previous)
+
+    if after is not None:
+        queryset = older_than(queryset, after)
+    else:
+        number = 1
+    rows = list(queryset.order_by('-date', '-id')[:page_size + 1])
+    return KeysetPage(rows[:page_size], number, page_size, total_count, len(rows) > page_size, after is not None)
@@ -0,0 +1,95 @@
+"""PDF expense reports.
+
+Rendered PDFs are cached under (user, ledger version, currency, FX rates,
+template), so repeat downloads are free until one of them changes. The total
+is converted into the user's currency like the summaries are; without a
+preferred currency, each currency gets its own subtotal. Reports over
+``PDF_BACKGROUND_ROWS`` rows are rendered by a small thread pool and picked
+up from the cache on a later request instead of holding up a worker.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connections
+from django.db.models import Sum
+from django.template.loader import render_to_string
+
+from expenses.models import Expense
+from .models import ExpenseRollup
+from . import fx, labels, money, rollups, versions
+
+logger = logging.getLogger(__name__)
+
+PDF_TEMPLATE = 'expenses/pdf_op.html'
+BACKGROUND_ROWS = getattr(settings, 'PDF_BACKGROUND_ROWS', 500)
+CACHE_TIMEOUT = getattr(settings, 'PDF_CACHE_TIMEOUT', 60 * 60 * 24)
+JOB_TIMEOUT = 60 * 10
+
+_executor = ThreadPoolExecutor(max_workers=getattr(settings, 'PDF_WORKERS', 2), thread_name_prefix='pdf-report')
+
+
+def cache_key(owner_id, version, currency, template=PDF_TEMPLATE):
+    return f'ledger:pdf:{owner_id}:{version}:{currency}:{fx.revision()}:{template}'
+
+
+def context(owner, currency):
+    """The template context of ``owner``'s report with totals in ``currency``."""
+    expenses = Expense.objects.filter(owner=owner)
+    rows = labels.values(expenses, ('amount', 'currency', 'category', 'descriptions', 'date'))
+    if not currency:
+        subtotals = expenses.values_list('currency').annotate(total=Sum('amount')).order_by('currency')
+        return {'expenses': rows, 'subtotals': [(code, money.total(total)) for code, total in subtotals]}
+    return {
+        'expenses': rows,
+        'currency': currency,
+        'total': sum(rollups.summarize(ExpenseRollup, owner, currency=currency).values(), money.ZERO),
+        'unconverted_currencies': rollups.unconverted(ExpenseRollup, owner, currency),
+    }
+
+
+def render_pdf(owner, currency, template=PDF_TEMPLATE):
+    html_string = render_to_string(template, context(owner, currency))
+    # weasyprint pulls in pango/cairo bindings; only pay for them when a PDF is rendered.
+    from weasyprint import HTML
+
+    return HTML(string=html_string).write_pdf()
+
+
+def cached_pdf(owner, currency, template=PDF_TEMPLATE):
+    """Return ``(version, pdf)``; ``pdf`` is None when nothing is cached for the current ledger."""
+    version = versions.current(owner)
+    return version, cache.get(cache_key(owner.pk, version, currency, template))
+
+
+def build(owner, version, currency, template=PDF_TEMPLATE):
+    """Render and cache the report for ``version`` of the owner's ledger."""
+    pdf = render_pdf(owner, currency, template)
+    cache.set(cache_key(owner.pk, version, currency, template), pdf, CACHE_TIMEOUT)
+    return pdf
+
+
+def _build_in_background(owner, version, currency, template):
+    close_old_connections()
+    try:
+        build(owner, version, currency, template)
+    except Exception:
+        logger.exception('PDF report for user %s failed', owner.pk)
+    finally:
+        cache.delete(cache_key(owner.pk, version, currency, template) + ':job')
+        connections.close_all()
+
+
+def submit(owner, version, currency, template=PDF_TEMPLATE):
+    """Queue a background render unless one is already running for this version.
+
+    Returns the render's ``Future``, or None if it was already queued.
+    """
+    if cache.add(cache_key(owner.pk, version, currency, template) + ':job', True, JOB_TIMEOUT):
+        return _executor.submit(_build_in_background, owner, version, currency, template)
+    return None
+
+
+def is_large(owner):
+    return Expense.objects.filter(owner=owner)[BACKGROUND_ROWS:BACKGROUND_ROWS + 1].exists()
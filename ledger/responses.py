@@ -0,0 +1,102 @@
+"""Per-user response cache for the JSON chart endpoints.
+
+Responses are cached under (user, endpoint, query, day, FX rates revision,
+label revision, ledger version), so the next save or delete makes every
+cached answer for that user unreachable without any explicit invalidation.
+The day is part of the key because the summaries look at windows relative
+to today, the rates revision because they convert amounts, and the label
+revision because they show category and source names. The same key doubles as the
+ETag. A browser that revalidates an unchanged chart gets a 304 after one
+indexed lookup. No Last-Modified is sent: the ledger's last write says
+nothing about a new day or new rates, so If-Modified-Since could serve
+stale charts.
+"""
+import datetime
+import functools
+import hashlib
+from urllib.parse import urlencode
+
+from asgiref.sync import iscoroutinefunction
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from . import fx, labels, versions
+
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _digest(request, endpoint, label_revision):
+    query = urlencode(sorted((key, value) for key, values in request.GET.lists() for value in values))
+    state = f'{datetime.date.today()}:{fx.revision()}:{label_revision}'
+    return hashlib.sha1(f'{endpoint}?{query}@{state}'.encode()).hexdigest()[:20]
+
+
+def cache_key(owner_id, version, digest):
+    return f'ledger:response:{owner_id}:{version}:{digest}'
+
+
+def _conditional(request, version, label_revision, endpoint):
+    """``(etag, cache key, 304 response or None)`` for ``request``."""
+    digest = _digest(request, endpoint, label_revision)
+    etag = quote_etag(f'{version}-{digest}')
+    response = get_conditional_response(request, etag=etag)
+    return etag, cache_key(request.user.pk, version, digest), response
+
+
+def _finish(response, etag):
+    response.headers.setdefault('ETag', etag)
+    # Let browsers keep the body but revalidate it on every use.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def cached_per_version(view):
+    """Cache ``view``'s successful GET responses per user and ledger version.
+
+    Works on async views too; they must have resolved ``request.auser()`` first,
+    as ``ledger.api.api_login_required`` does.
+    """
+    endpoint = f'{view.__module__}.{view.__qualname__}'
+
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await view(request, *args, **kwargs)
+
+            version = await versions.acurrent(request.user)
+            etag, key, response = _conditional(request, version, await labels.arevision(), endpoint)
+            if response is None:
+                cached = await cache.aget(key)
+                if cached is not None:
+                    content, content_type = cached
+                    response = HttpResponse(content, content_type=content_type)
+                else:
+                    response = await view(request, *args, **kwargs)
+                    if response.status_code != 200:
+                        return response
+                    await cache.aset(key, (response.content, response['Content-Type']), CACHE_TIMEOUT)
+            return _finish(response, etag)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+
+        version = versions.current(request.user)
+        etag, key, response = _conditional(request, version, labels.revision(), endpoint)
+        if response is None:
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+            else:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                cache.set(key, (response.content, response['Content-Type']), CACHE_TIMEOUT)
+        return _finish(response, etag)
+    return wrapper
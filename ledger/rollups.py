@@ -0,0 +1,242 @@
+"""Monthly per-category (expenses) and per-source (income) totals.
+
+The rollup tables are kept current by the save/delete signals in
+``ledger.signals`` so the summary views read a handful of rows per month
+instead of aggregating the ledger. ``rebuild`` and ``validate`` recompute
+them from the ledger in bulk.
+
+Rows are kept per currency as well. ``summarize`` converts them into the
+viewer's currency at the rate in force mid-month (see ``conversion_date``)
+and caches the converted totals per ledger version and FX rates revision.
+"""
+import datetime
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from expenses.models import Expense
+from userincome.models import UserIncome
+from .models import ExpenseRollup, IncomeRollup
+from . import fx, labels, money, versions
+
+BATCH_SIZE = 2000
+CACHE_TIMEOUT = 60 * 60 * 24
+# Rollup months are converted at the rate of this day of the month.
+CONVERSION_DAY = 15
+
+ROLLUP_FOR_MODEL = {
+    Expense: ExpenseRollup,
+    UserIncome: IncomeRollup,
+}
+
+LEDGER_FOR_ROLLUP = {rollup: model for model, rollup in ROLLUP_FOR_MODEL.items()}
+
+
+def as_date(value):
+    """Dates arrive as strings from the edit views and as datetimes from ``now``."""
+    if isinstance(value, datetime.datetime):
+        if timezone.is_aware(value):
+            value = timezone.make_naive(value, timezone.get_default_timezone())
+        return value.date()
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value)
+    return value
+
+
+def apply_delta(rollup_model, owner_id, date, label, currency, amount, count):
+    """Add ``amount``/``count`` to the rollup row of ``date``'s month."""
+    date = as_date(date)
+    key = {'owner_id': owner_id, 'year': date.year, 'month': date.month,
+           f'{rollup_model.LABEL_FIELD}_id': label, 'currency': currency}
+    rows = rollup_model.objects.filter(**key)
+    if rows.update(total=F('total') + amount, count=F('count') + count):
+        if count < 0:
+            rows.filter(count__lte=0).delete()
+        return
+    if count <= 0:
+        return
+    try:
+        with transaction.atomic():
+            rollup_model.objects.create(total=amount, count=count, **key)
+    except IntegrityError:
+        rows.update(total=F('total') + amount, count=F('count') + count)
+
+
+def snapshot(instance):
+    """The values of ``instance`` that feed its rollup row; ``label`` is the category/source id."""
+    rollup_model = ROLLUP_FOR_MODEL[type(instance)]
+    return {
+        'owner_id': instance.owner_id,
+        'date': as_date(instance.date),
+        'label': getattr(instance, f'{rollup_model.LABEL_FIELD}_id'),
+        'currency': instance.currency,
+        'amount': money.parse(instance.amount),
+    }
+
+
+def add(rollup_model, values, sign=1):
+    apply_delta(rollup_model, values['owner_id'], values['date'], values['label'], values['currency'],
+                sign * values['amount'], sign)
+
+
+def month_range(start=None, end=None):
+    """Q object selecting the rollup months that contain ``start`` through ``end``."""
+    query = Q()
+    if start is not None:
+        query &= Q(year__gt=start.year) | Q(year=start.year, month__gte=start.month)
+    if end is not None:
+        query &= Q(year__lt=end.year) | Q(year=end.year, month__lte=end.month)
+    return query
+
+
+def conversion_date(year, month, today=None):
+    """The day whose FX rates convert a rollup month; today for the current month's first half."""
+    return min(datetime.date(year, month, CONVERSION_DAY), today or datetime.date.today())
+
+
+def convert_monthly(rows, currency):
+    """Sum ``(name, currency, year, month, amount)`` rows into ``{name: total}`` in ``currency``.
+
+    Rows in a currency without FX rates are left out; see ``unconverted``.
+    """
+    rows = list(rows)
+    today = datetime.date.today()
+    amounts = fx.convert([row[4] for row in rows], [row[1] for row in rows],
+                         [conversion_date(row[2], row[3], today) for row in rows], currency)
+    totals = {}
+    for row, amount in zip(rows, amounts):
+        if amount is not None:
+            totals[row[0]] = totals.get(row[0], money.ZERO) + amount
+    return dict(sorted(totals.items()))
+
+
+def _summary_rows(rollup_model, owner, start, end, currency):
+    label = rollup_model.LABEL_FIELD
+    rows = rollup_model.objects.filter(month_range(start, end), owner=owner)
+    if not currency:
+        return rows.values_list(label, f'{label}__name').annotate(amount=Sum('total')).order_by(f'{label}__name')
+    return rows.values_list(f'{label}__name', 'currency', 'year', 'month').annotate(amount=Sum('total')).order_by()
+
+
+def _summary_key(rollup_model, owner, version, label_revision, currency, start, end):
+    return (f'ledger:rollups:{rollup_model._meta.model_name}:{owner.pk}:{version}:'
+            f'{currency}:{start}:{end}:{fx.revision()}:{label_revision}')
+
+
+def summarize(rollup_model, owner, start=None, end=None, currency=None):
+    """Return ``{label name: total}`` for ``owner`` over the months ``start`` through ``end``.
+
+    With ``currency``, every total is converted into it and the result is cached.
+    """
+    rows = _summary_rows(rollup_model, owner, start, end, currency)
+    if not currency:
+        return {name: money.total(amount) for label_id, name, amount in rows}
+
+    key = _summary_key(rollup_model, owner, versions.current(owner), labels.revision(), currency, start, end)
+    totals = cache.get(key)
+    if totals is None:
+        totals = convert_monthly(rows, currency)
+        cache.set(key, totals, CACHE_TIMEOUT)
+    return totals
+
+
+async def asummarize(rollup_model, owner, start=None, end=None, currency=None):
+    """``summarize`` on the async ORM and cache API."""
+    rows = _summary_rows(rollup_model, owner, start, end, currency)
+    if not currency:
+        return {name: money.total(amount) async for label_id, name, amount in rows}
+
+    key = _summary_key(rollup_model, owner, await versions.acurrent(owner), await labels.arevision(),
+                       currency, start, end)
+    totals = await cache.aget(key)
+    if totals is None:
+        totals = convert_monthly([row async for row in rows], currency)
+        await cache.aset(key, totals, CACHE_TIMEOUT)
+    return totals
+
+
+def _currencies(rollup_model, owner, start, end, currency):
+    return (rollup_model.objects.filter(month_range(start, end), owner=owner)
+            .exclude(currency__in=['', currency]).values_list('currency', flat=True).distinct())
+
+
+def unconverted(rollup_model, owner, currency, start=None, end=None):
+    """Currencies of ``owner``'s rows in the months ``start`` through ``end`` that ``summarize`` left out.
+
+    Those have no FX rates to convert them into ``currency``, so the
+    converted totals do not include them.
+    """
+    if not currency:
+        return []
+    return fx.unconvertible(_currencies(rollup_model, owner, start, end, currency), currency)
+
+
+async def aunconverted(rollup_model, owner, currency, start=None, end=None):
+    """``unconverted`` on the async ORM."""
+    if not currency:
+        return []
+    return fx.unconvertible([code async for code in _currencies(rollup_model, owner, start, end, currency)],
+                            currency)
+
+
+def count(rollup_model, owner):
+    """Number of ledger rows ``owner`` has, read from the rollups."""
+    return rollup_model.objects.filter(owner=owner).aggregate(rows=Sum('count'))['rows'] or 0
+
+
+def _ledger_totals(rollup_model, owner=None):
+    label = rollup_model.LABEL_FIELD
+    ledger = LEDGER_FOR_ROLLUP[rollup_model].objects.all()
+    if owner is not None:
+        ledger = ledger.filter(owner=owner)
+    return (ledger
+            .annotate(year=ExtractYear('date'), month=ExtractMonth('date'))
+            .values('owner_id', 'year', 'month', label, 'currency')
+            .annotate(amount=Sum('amount'), rows=Count('id'))
+            .order_by())
+
+
+def rebuild(rollup_model, owner=None):
+    """Recompute the rollup table from the ledger. Returns the number of rows written."""
+    label = rollup_model.LABEL_FIELD
+    existing = rollup_model.objects.all()
+    if owner is not None:
+        existing = existing.filter(owner=owner)
+
+    written = 0
+    with transaction.atomic():
+        existing.delete()
+        pending = []
+        for row in _ledger_totals(rollup_model, owner).iterator(chunk_size=BATCH_SIZE):
+            pending.append(rollup_model(owner_id=row['owner_id'], year=row['year'], month=row['month'],
+                                        currency=row['currency'], total=row['amount'], count=row['rows'],
+                                        **{f'{label}_id': row[label]}))
+            if len(pending) >= BATCH_SIZE:
+                written += len(rollup_model.objects.bulk_create(pending))
+                pending = []
+        written += len(rollup_model.objects.bulk_create(pending))
+    return written
+
+
+def validate(rollup_model, owner=None):
+    """Compare the rollup table with the ledger and return the mismatching keys."""
+    label = rollup_model.LABEL_FIELD
+    stored = rollup_model.objects.all()
+    if owner is not None:
+        stored = stored.filter(owner=owner)
+    expected = {
+        (row['owner_id'], row['year'], row['month'], row[label], row['currency']): (money.total(row['amount']), row['rows'])
+        for row in _ledger_totals(rollup_model, owner).iterator(chunk_size=BATCH_SIZE)
+    }
+
+    mismatches = []
+    for row in stored.values('owner_id', 'year', 'month', label, 'currency', 'total', 'count').iterator(chunk_size=BATCH_SIZE):
+        key = (row['owner_id'], row['year'], row['month'], row[label], row['currency'])
+        amount, rows = expected.pop(key, (0, 0))
+        if rows != row['count'] or amount != row['total']:
+            mismatches.append(key)
+    mismatches.extend(expected)
+    return mismatches
@@ -0,0 +1,228 @@
+"""Per-user inverted n-gram index behind the expense and income search boxes.
+
+Every Expense/UserIncome row is broken into lower-cased words and each word
+into trigrams plus one- and two-character prefix grams. A query matches a row
+when the row holds every gram of the query, so lookups are equality probes on
+the (owner, kind, token) index on both PostgreSQL and SQLite instead of
+LIKE scans over the ledger.
+"""
+import re
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+
+from expenses.models import Expense
+from userincome.models import UserIncome
+from .models import SearchToken
+from . import labels
+
+GRAM_SIZE = 3
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+BATCH_SIZE = 2000
+DELETE_BATCH_SIZE = 500
+
+_WORD_RE = re.compile(r'\w+')
+
+# Searchable fields (as lookup paths) and the weight a match in each of them adds to the rank.
+INDEXED_FIELDS = {
+    SearchToken.EXPENSE: (Expense, {'category__name': 3, 'descriptions': 2, 'amount': 1, 'date': 1}),
+    SearchToken.INCOME: (UserIncome, {'source__name': 3, 'description': 2, 'amount': 1, 'date': 1}),
+}
+
+# Fields of each search hit, with the label as a name.
+RESULT_FIELDS = {
+    SearchToken.EXPENSE: ('id', 'amount', 'date', 'descriptions', 'owner_id', 'category'),
+    SearchToken.INCOME: ('id', 'amount', 'date', 'description', 'owner_id', 'source'),
+}
+
+KIND_FOR_MODEL = {model: kind for kind, (model, fields) in INDEXED_FIELDS.items()}
+
+
+def _words(value):
+    return _WORD_RE.findall(str(value).lower())
+
+
+def word_grams(word):
+    """Grams stored for a single indexed word."""
+    grams = {'^' + word[:n] for n in range(1, min(len(word), GRAM_SIZE - 1) + 1)}
+    grams.update(word[i:i + GRAM_SIZE] for i in range(len(word) - GRAM_SIZE + 1))
+    return grams
+
+
+def query_grams(text):
+    """Grams a row must contain to match ``text``.
+
+    Words shorter than the gram size match as word prefixes, longer words
+    match anywhere inside a word, like the old ``icontains`` lookups did.
+    """
+    grams = set()
+    for word in _words(text or ''):
+        if len(word) < GRAM_SIZE:
+            grams.add('^' + word)
+        else:
+            grams.update(word[i:i + GRAM_SIZE] for i in range(len(word) - GRAM_SIZE + 1))
+    return grams
+
+
+def document_tokens(kind, row):
+    """Map each gram of ``row`` (a dict of field values) to its highest weight."""
+    model, fields = INDEXED_FIELDS[kind]
+    tokens = {}
+    for field, weight in fields.items():
+        for word in _words(row[field]):
+            for gram in word_grams(word):
+                if tokens.get(gram, 0) < weight:
+                    tokens[gram] = weight
+    return tokens
+
+
+def _lookup(instance, path):
+    for name in path.split('__'):
+        instance = getattr(instance, name)
+    return instance
+
+
+def _build_tokens(kind, row):
+    return [
+        (row['owner_id'], kind, row['id'], token, weight)
+        for token, weight in document_tokens(kind, row).items()
+    ]
+
+
+def _insert_tokens(tokens):
+    """Write ``(owner_id, kind, object_id, token, weight)`` tuples.
+
+    Imports create tens of tokens per row, so this skips model instantiation
+    and goes straight to ``executemany``.
+    """
+    if not tokens:
+        return
+    opts = SearchToken._meta
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(opts.get_field(name).column) for name in ('owner', 'kind', 'object_id', 'token', 'weight'))
+    sql = f'INSERT INTO {quote(opts.db_table)} ({columns}) VALUES (%s, %s, %s, %s, %s)'
+    with connection.cursor() as cursor:
+        for start in range(0, len(tokens), BATCH_SIZE):
+            cursor.executemany(sql, tokens[start:start + BATCH_SIZE])
+
+
+def index_instance(instance):
+    with transaction.atomic():
+        remove_objects([instance])
+        index_objects([instance])
+
+
+def remove_instance(instance):
+    remove_objects([instance])
+
+
+def index_objects(instances):
+    """Index new instances of one model in bulk."""
+    if not instances:
+        return
+    kind = KIND_FOR_MODEL[type(instances[0])]
+    fields = INDEXED_FIELDS[kind][1]
+    pending = []
+    for instance in instances:
+        row = {field: _lookup(instance, field) for field in fields}
+        row.update(id=instance.pk, owner_id=instance.owner_id)
+        pending.extend(_build_tokens(kind, row))
+    _insert_tokens(pending)
+
+
+def remove_objects(instances):
+    if not instances:
+        return
+    kind = KIND_FOR_MODEL[type(instances[0])]
+    ids = [instance.pk for instance in instances]
+    for start in range(0, len(ids), DELETE_BATCH_SIZE):
+        SearchToken.objects.filter(kind=kind, object_id__in=ids[start:start + DELETE_BATCH_SIZE]).delete()
+
+
+def index_rows(kind, queryset):
+    """Index every row of ``queryset`` without touching existing tokens."""
+    model, fields = INDEXED_FIELDS[kind]
+    rows = queryset.values('id', 'owner_id', *fields).iterator(chunk_size=BATCH_SIZE)
+    pending = []
+    indexed = 0
+    for row in rows:
+        pending.extend(_build_tokens(kind, row))
+        indexed += 1
+        if len(pending) >= BATCH_SIZE:
+            _insert_tokens(pending)
+            pending = []
+    _insert_tokens(pending)
+    return indexed
+
+
+def rebuild(kind, owner=None):
+    """Drop and rebuild the index for one kind, optionally for a single owner."""
+    model = INDEXED_FIELDS[kind][0]
+    tokens = SearchToken.objects.filter(kind=kind)
+    rows = model.objects.all()
+    if owner is not None:
+        tokens = tokens.filter(owner=owner)
+        rows = rows.filter(owner=owner)
+    with transaction.atomic():
+        tokens.delete()
+        return index_rows(kind, rows)
+
+
+def _page(page, page_size):
+    """``(offset, limit)`` of a page; ``ValueError`` unless both are whole numbers."""
+    try:
+        page = max(int(page or 1), 1)
+        page_size = max(1, min(int(page_size or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        raise ValueError('page and pageSize must be whole numbers') from None
+    return (page - 1) * page_size, page_size
+
+
+def _ranked_ids(owner, kind, grams, offset, page_size):
+    return (SearchToken.objects
+            .filter(owner=owner, kind=kind, token__in=grams)
+            .values('object_id')
+            .annotate(matched=Count('id'), rank=Sum('weight'))
+            .filter(matched=len(grams))
+            .order_by('-rank', '-object_id')
+            .values_list('object_id', flat=True)[offset:offset + page_size])
+
+
+def search(owner, kind, text, page=1, page_size=DEFAULT_PAGE_SIZE):
+    """Return one page of ``owner``'s rows matching ``text`` as ``RESULT_FIELDS`` dicts.
+
+    Rows are ranked by the summed weight of the fields the query hit, the
+    most recently added (highest id) first on ties. ``page_size`` is capped
+    at ``MAX_PAGE_SIZE``. Raises ``ValueError`` if ``page`` or ``page_size``
+    is not a number.
+    """
+    offset, limit = _page(page, page_size)
+    grams = query_grams(text)
+    if not grams:
+        return []
+
+    ids = list(_ranked_ids(owner, kind, grams, offset, limit))
+    if not ids:
+        return []
+
+    model = INDEXED_FIELDS[kind][0]
+    rows = {row['id']: row for row in labels.values(model.objects.filter(owner=owner, pk__in=ids), RESULT_FIELDS[kind])}
+    return [rows[pk] for pk in ids if pk in rows]
+
+
+async def asearch(owner, kind, text, page=1, page_size=DEFAULT_PAGE_SIZE):
+    """``search`` on the async ORM."""
+    offset, limit = _page(page, page_size)
+    grams = query_grams(text)
+    if not grams:
+        return []
+
+    ids = [pk async for pk in _ranked_ids(owner, kind, grams, offset, limit)]
+    if not ids:
+        return []
+
+    model = INDEXED_FIELDS[kind][0]
+    rows = {row['id']: row async for row in labels.avalues(model.objects.filter(owner=owner, pk__in=ids),
+                                                           RESULT_FIELDS[kind])}
+    return [rows[pk] for pk in ids if pk in rows]
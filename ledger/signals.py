@@ -0,0 +1,106 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from expenses.models import Category, Expense
+from userincome.models import Source, UserIncome
+from userpreferences.models import UserPreference
+from . import bulk, forecast, labels, rollups, search, versions
+
+
+def _owner_deleted(instance, origin):
+    """True while the row is being removed as part of deleting its owner."""
+    return isinstance(origin, User) and origin.pk == instance.owner_id
+
+
+def _accounted_for(instance, origin):
+    """True if the deletion needs no per-row upkeep: the owner is going too, or ``bulk.delete`` did it."""
+    return _owner_deleted(instance, origin) or bulk.handled(origin)
+
+
+@receiver(pre_save, sender=Expense)
+@receiver(pre_save, sender=UserIncome)
+def remember_previous_values(sender, instance, **kwargs):
+    """Keep the stored row around so post_save can move it out of its old rollup."""
+    instance._ledger_previous = None
+    if instance.pk is not None:
+        previous = sender.objects.filter(pk=instance.pk).first()
+        if previous is not None:
+            instance._ledger_previous = rollups.snapshot(previous)
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_save, sender=UserIncome)
+def update_rollups(sender, instance, **kwargs):
+    rollup_model = rollups.ROLLUP_FOR_MODEL[sender]
+    previous = getattr(instance, '_ledger_previous', None)
+    if previous is not None:
+        rollups.add(rollup_model, previous, sign=-1)
+    rollups.add(rollup_model, rollups.snapshot(instance))
+
+
+@receiver(post_delete, sender=Expense)
+@receiver(post_delete, sender=UserIncome)
+def remove_from_rollups(sender, instance, origin=None, **kwargs):
+    if not _accounted_for(instance, origin):
+        rollups.add(rollups.ROLLUP_FOR_MODEL[sender], rollups.snapshot(instance), sign=-1)
+
+
+@receiver(post_save, sender=Expense)
+def discard_forecast_on_save(sender, instance, **kwargs):
+    previous = getattr(instance, '_ledger_previous', None)
+    dates = [instance.date] if previous is None else [instance.date, previous['date']]
+    forecast.changed(instance.owner_id, dates)
+
+
+@receiver(post_delete, sender=Expense)
+def discard_forecast_on_delete(sender, instance, origin=None, **kwargs):
+    if not _accounted_for(instance, origin):
+        forecast.changed(instance.owner_id, [instance.date])
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_save, sender=UserIncome)
+def update_search_index(sender, instance, **kwargs):
+    search.index_instance(instance)
+
+
+@receiver(post_delete, sender=Expense)
+@receiver(post_delete, sender=UserIncome)
+def remove_from_search_index(sender, instance, origin=None, **kwargs):
+    if not _accounted_for(instance, origin):
+        search.remove_instance(instance)
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_save, sender=UserIncome)
+def bump_ledger_version_on_save(sender, instance, **kwargs):
+    versions.bump(instance.owner_id)
+
+
+@receiver(post_delete, sender=Expense)
+@receiver(post_delete, sender=UserIncome)
+def bump_ledger_version_on_delete(sender, instance, origin=None, **kwargs):
+    if not _accounted_for(instance, origin):
+        versions.bump(instance.owner_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Source)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Source)
+def invalidate_label_choices(sender, **kwargs):
+    labels.invalidate(sender)
+    # Again once committed, in case the registry was reloaded from inside the transaction.
+    transaction.on_commit(lambda: labels.invalidate(sender))
+
+
+@receiver(post_save, sender=UserPreference)
+@receiver(post_delete, sender=UserPreference)
+def reconvert_on_currency_change(sender, instance, origin=None, **kwargs):
+    """Summaries and forecasts are stated in the preferred currency; retire the cached ones."""
+    if isinstance(origin, User) and origin.pk == instance.user_id:
+        return
+    versions.bump(instance.user_id)
+    forecast.discard(instance.user_id)
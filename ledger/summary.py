@@ -0,0 +1,96 @@
+"""Per-category totals shared by the expense and income summary endpoints."""
+import datetime
+
+from django.db.models import Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from . import money, rollups
+
+BATCH_SIZE = 500
+
+
+def parse_date_range(params):
+    """Read optional ISO ``start``/``end`` dates from a QueryDict.
+
+    Raises ``ValueError`` when either date is malformed or the range is reversed.
+    """
+    start = params.get('start')
+    end = params.get('end')
+    start = datetime.date.fromisoformat(start) if start else None
+    end = datetime.date.fromisoformat(end) if end else None
+    if start and end and start > end:
+        raise ValueError('start must not be after end')
+    return start, end
+
+
+def parse_month(params, today):
+    """First day of the optional ``month`` (1-12) of ``today``'s year, or None.
+
+    Raises ``ValueError`` when the month is not a number from 1 to 12.
+    """
+    month = params.get('month')
+    if not month:
+        return None
+    try:
+        month = int(month)
+    except ValueError:
+        raise ValueError('month must be a number from 1 to 12') from None
+    if not 1 <= month <= 12:
+        raise ValueError('month must be a number from 1 to 12')
+    return datetime.date(today.year, month, 1)
+
+
+def _ledger_rows(model, owner, start, end, currency):
+    label = rollups.ROLLUP_FOR_MODEL[model].LABEL_FIELD
+    ledger = model.objects.filter(owner=owner)
+    if start is not None:
+        ledger = ledger.filter(date__gte=start)
+    if end is not None:
+        ledger = ledger.filter(date__lte=end)
+    if currency:
+        return (ledger
+                .annotate(year=ExtractYear('date'), month=ExtractMonth('date'))
+                .values_list(f'{label}__name', 'currency', 'year', 'month')
+                .annotate(amount=Sum('amount'))
+                .order_by())
+    return (ledger
+            .values_list(label, f'{label}__name')
+            .annotate(amount=Sum('amount'))
+            .order_by(f'{label}__name')
+            .values_list(f'{label}__name', 'amount'))
+
+
+def _totals(rows):
+    labels = []
+    totals = []
+    for name, amount in rows:
+        labels.append(name)
+        totals.append(money.total(amount))
+    return labels, totals, sum(totals)
+
+
+def category_totals(model, owner, start=None, end=None, currency=None):
+    """Return ``(labels, totals, grand_total)`` for ``owner``'s rows of ``model``.
+
+    Without a date range the answer comes straight from the monthly rollups;
+    with one, the ledger is grouped in the database and streamed back. With
+    ``currency``, totals are converted into it the same way the rollups are.
+    """
+    if start is None and end is None:
+        return _totals(rollups.summarize(rollups.ROLLUP_FOR_MODEL[model], owner, currency=currency).items())
+    rows = _ledger_rows(model, owner, start, end, currency).iterator(chunk_size=BATCH_SIZE)
+    if currency:
+        rows = rollups.convert_monthly(rows, currency).items()
+    return _totals(rows)
+
+
+async def acategory_totals(model, owner, start=None, end=None, currency=None):
+    """``category_totals`` on the async ORM."""
+    if start is None and end is None:
+        totals = await rollups.asummarize(rollups.ROLLUP_FOR_MODEL[model], owner, currency=currency)
+        return _totals(totals.items())
+    # Grouped rows are few; aiterator() would run this values_list query synchronously.
+    rows = [row async for row in _ledger_rows(model, owner, start, end, currency)]
+    if currency:
+        rows = rollups.convert_monthly(rows, currency).items()
+    return _totals(rows)
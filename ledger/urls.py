@@ -0,0 +1,25 @@
+from django.urls import path
+
+from expenses.models import Expense
+from userincome.models import UserIncome
+from .models import SearchToken
+from . import api, async_api
+
+urlpatterns = [
+    path('expenses/', api.collection, {'model': Expense}, name='api-expenses'),
+    path('expenses/batch', api.batch, {'model': Expense}, name='api-expenses-batch'),
+    path('expenses/<int:id>', api.detail, {'model': Expense}, name='api-expense'),
+    path('income/', api.collection, {'model': UserIncome}, name='api-income'),
+    path('income/batch', api.batch, {'model': UserIncome}, name='api-income-batch'),
+    path('income/<int:id>', api.detail, {'model': UserIncome}, name='api-income-detail'),
+    path('dashboard', api.dashboard, name='api-dashboard'),
+    path('async/expense_category_summary', async_api.expense_category_summary,
+         name='async-expense-category-summary'),
+    path('async/income_category_summary', async_api.income_category_summary, name='async-income-category-summary'),
+    path('async/all_expenses_summary', async_api.all_expenses_summary, name='async-all-expenses-summary'),
+    path('async/all_income_summary', async_api.all_income_summary, name='async-all-income-summary'),
+    path('async/search-expenses', async_api.search_ledger, {'kind': SearchToken.EXPENSE},
+         name='async-search-expenses'),
+    path('async/search-income', async_api.search_ledger, {'kind': SearchToken.INCOME}, name='async-search-income'),
+    path('async/notifications', async_api.unread_notifications, name='async-notifications'),
+]
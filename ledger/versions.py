@@ -0,0 +1,25 @@
+"""Per-user ledger version used to key caches of anything derived from the ledger."""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import LedgerVersion
+
+
+def bump(owner_id):
+    if LedgerVersion.objects.filter(owner_id=owner_id).update(version=F('version') + 1, updated_at=timezone.now()):
+        return
+    try:
+        with transaction.atomic():
+            LedgerVersion.objects.create(owner_id=owner_id, version=1)
+    except IntegrityError:
+        LedgerVersion.objects.filter(owner_id=owner_id).update(version=F('version') + 1, updated_at=timezone.now())
+
+
+def current(owner):
+    """The owner's ledger version, 0 if the ledger was never written to."""
+    return LedgerVersion.objects.filter(owner=owner).values_list('version', flat=True).first() or 0
+
+
+async def acurrent(owner):
+    return await LedgerVersion.objects.filter(owner=owner).values_list('version', flat=True).afirst() or 0
@@ -5,6 +5,7 @@ class UserIncomeAdmin(admin.ModelAdmin):
     list_display = ('amount', 'description', 'owner', 'source', 'date',)
     search_fields = ('description', 'source__name', 'date',)
     list_filter = ('source', 'date')
+    list_select_related = ('owner', 'source')
     list_per_page = 10 
 
 admin.site.register(UserIncome, UserIncomeAdmin)
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """First step of moving UserIncome.amount from float to exact cents.
+
+    The new column is nullable so adding it is a catalog-only change, and
+    0009_backfill_userincome_amount_exact fills it in batches.
+    """
+
+    dependencies = [
+        ('userincome', '0007_userincome_income_owner_source_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userincome',
+            name='amount_exact',
+            field=models.DecimalField(decimal_places=2, max_digits=12, null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations, models
+from django.db.models import Max, Min
+from django.db.models.functions import Cast, Round
+
+BATCH_SIZE = 5000
+
+
+def backfill(apps, schema_editor):
+    """Copy the float amounts into amount_exact, rounded to cents, one id range at a time.
+
+    The migration is not atomic, so every batch commits on its own and only
+    locks the rows it touches, and the site keeps serving while it runs.
+    """
+    UserIncome = apps.get_model('userincome', 'UserIncome')
+    bounds = UserIncome.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return
+    exact = Round(Cast('amount', models.DecimalField(max_digits=12, decimal_places=2)), 2)
+    for start in range(bounds['low'], bounds['high'] + 1, BATCH_SIZE):
+        (UserIncome.objects
+         .filter(pk__gte=start, pk__lt=start + BATCH_SIZE, amount_exact__isnull=True)
+         .update(amount_exact=exact))
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('userincome', '0008_userincome_amount_exact'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop, elidable=True),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations, models
+from django.db.models.functions import Cast, Round
+
+
+def catch_up(apps, schema_editor):
+    """Convert rows written by the old code while the backfill was running."""
+    UserIncome = apps.get_model('userincome', 'UserIncome')
+    exact = Round(Cast('amount', models.DecimalField(max_digits=12, decimal_places=2)), 2)
+    UserIncome.objects.filter(amount_exact__isnull=True).update(amount_exact=exact)
+
+
+class Migration(migrations.Migration):
+    """Swap the exact column in for the float one.
+
+    Dropping and renaming columns only touches the catalog. Setting NOT NULL
+    scans the table once but does not rewrite it.
+    """
+
+    dependencies = [
+        ('userincome', '0009_backfill_userincome_amount_exact'),
+    ]
+
+    operations = [
+        migrations.RunPython(catch_up, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='userincome',
+            name='amount',
+        ),
+        migrations.RenameField(
+            model_name='userincome',
+            old_name='amount_exact',
+            new_name='amount',
+        ),
+        migrations.AlterField(
+            model_name='userincome',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, max_digits=12),
+        ),
+    ]
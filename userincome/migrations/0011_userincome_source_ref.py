@@ -0,0 +1,43 @@
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.db import migrations, models
+
+FALLBACK = 'Other'
+
+
+def merge_duplicate_sources(apps, schema_editor):
+    """Keep one Source per case-insensitive name so the new unique constraint holds."""
+    Source = apps.get_model('userincome', 'Source')
+    seen = {}
+    for pk, name in Source.objects.order_by('pk').values_list('pk', 'name'):
+        clean = ' '.join(name.split()) or FALLBACK
+        if clean.lower() in seen:
+            Source.objects.filter(pk=pk).delete()
+            continue
+        seen[clean.lower()] = pk
+        if clean != name:
+            Source.objects.filter(pk=pk).update(name=clean)
+
+
+class Migration(migrations.Migration):
+    """First step of turning UserIncome.source into a foreign key to Source.
+
+    The new column is nullable, and 0012_backfill_userincome_source_ref fills it in batches.
+    """
+
+    dependencies = [
+        ('userincome', '0010_userincome_amount_decimal'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_sources, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='source',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='userincome_source_name_key'),
+        ),
+        migrations.AddField(
+            model_name='userincome',
+            name='source_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='userincome.source'),
+        ),
+    ]
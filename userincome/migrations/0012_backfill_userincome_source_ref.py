@@ -0,0 +1,48 @@
+from django.db import migrations
+from django.db.models import Case, Max, Min, Value, When
+
+BATCH_SIZE = 5000
+FALLBACK = 'Other'
+
+
+def source_ids(apps):
+    """Map every distinct source string in the ledger to a Source id, creating missing ones.
+
+    Strings that differ only in case or spacing share one Source.
+    """
+    UserIncome = apps.get_model('userincome', 'UserIncome')
+    Source = apps.get_model('userincome', 'Source')
+    by_key = {name.lower(): pk for pk, name in Source.objects.values_list('pk', 'name')}
+    ids = {}
+    for text in UserIncome.objects.values_list('source', flat=True).distinct().order_by():
+        clean = ' '.join(text.split()) or FALLBACK
+        if clean.lower() not in by_key:
+            by_key[clean.lower()] = Source.objects.create(name=clean).pk
+        ids[text] = by_key[clean.lower()]
+    return ids
+
+
+def backfill(apps, schema_editor):
+    """Point source_ref at the matching Source, one id range per transaction."""
+    UserIncome = apps.get_model('userincome', 'UserIncome')
+    ids = source_ids(apps)
+    if not ids:
+        return
+    source_ref = Case(*[When(source=text, then=Value(pk)) for text, pk in ids.items()])
+    bounds = UserIncome.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    for start in range(bounds['low'], bounds['high'] + 1, BATCH_SIZE):
+        (UserIncome.objects
+         .filter(pk__gte=start, pk__lt=start + BATCH_SIZE, source_ref__isnull=True)
+         .update(source_ref_id=source_ref))
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('userincome', '0011_userincome_source_ref'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop, elidable=True),
+    ]
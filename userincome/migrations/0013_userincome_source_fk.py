@@ -0,0 +1,48 @@
+import importlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The catch-up reuses the batched backfill of the previous migration.
+backfill = importlib.import_module('userincome.migrations.0012_backfill_userincome_source_ref')
+
+
+def catch_up(apps, schema_editor):
+    """Link rows written by the old code while the backfill was running."""
+    UserIncome = apps.get_model('userincome', 'UserIncome')
+    if UserIncome.objects.filter(source_ref__isnull=True).exists():
+        backfill.backfill(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+    """Swap the Source foreign key in for the free-text source column."""
+
+    dependencies = [
+        ('userincome', '0012_backfill_userincome_source_ref'),
+    ]
+
+    operations = [
+        migrations.RunPython(catch_up, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='userincome',
+            name='income_owner_source_idx',
+        ),
+        migrations.RemoveField(
+            model_name='userincome',
+            name='source',
+        ),
+        migrations.RenameField(
+            model_name='userincome',
+            old_name='source_ref',
+            new_name='source',
+        ),
+        migrations.AlterField(
+            model_name='userincome',
+            name='source',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='userincome.source'),
+        ),
+        migrations.AddIndex(
+            model_name='userincome',
+            index=models.Index(fields=['owner', 'source', 'date'], name='income_owner_source_idx'),
+        ),
+    ]
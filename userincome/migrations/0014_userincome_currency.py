@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userincome', '0013_userincome_source_fk'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userincome',
+            name='currency',
+            field=models.CharField(blank=True, default='', max_length=3),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def backfill(apps, schema_editor):
+    """Stamp each owner's income with their preferred currency, like expenses 0019."""
+    UserIncome = apps.get_model('userincome', 'UserIncome')
+    UserPreference = apps.get_model('userpreferences', 'UserPreference')
+    for owner_id, label in UserPreference.objects.exclude(currency=None).values_list('user_id', 'currency').iterator():
+        code = label.split(' - ', 1)[0].strip().upper()
+        if len(code) == 3:
+            UserIncome.objects.filter(owner_id=owner_id, currency='').update(currency=code)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('userincome', '0014_userincome_currency'),
+        ('userpreferences', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop, elidable=True),
+    ]
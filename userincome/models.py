@@ -1,26 +1,38 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.db.models.functions import Lower
 from django.utils.timezone import now
 
 # Create your models here.
 
 
 class UserIncome(models.Model):
-    amount = models.FloatField() 
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
     date = models.DateField(default=now)
     description = models.TextField()
     owner = models.ForeignKey(to=User, on_delete=models.CASCADE)
-    source = models.CharField(max_length=266)
+    source = models.ForeignKey(to='Source', on_delete=models.PROTECT)
+    # ISO code; blank on rows entered before amounts carried a currency.
+    currency = models.CharField(max_length=3, blank=True, default='')
 
     def __str__(self):
-        return self.source
+        return self.source.name
 
     class Meta:
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['owner', 'date', 'id'], name='income_owner_date_id_idx'),
+            models.Index(fields=['owner', 'source', 'date'], name='income_owner_source_idx'),
+        ]
 
 
 class Source(models.Model):
     name = models.CharField(max_length=255)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(Lower('name'), name='userincome_source_name_key'),
+        ]
+
     def __str__(self):
         return self.name
\ No newline at end of file
@@ -1,3 +1,82 @@
+import datetime
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
+
+from benchmarks import seed
+from ledger import explain, rollups, search
+from ledger.models import IncomeRollup, SearchToken
+
+
+class IncomeQueryPlanTests(explain.IndexedQueriesMixin, TestCase):
+    """Every query the income views send must reach the ledger tables through an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed.get_user('plan-owner')
+        other = seed.get_user('plan-other')
+        for owner in (cls.user, other):
+            seed.seed_income(owner, 300, seed=owner.pk)
+            rollups.rebuild(IncomeRollup, owner=owner)
+            search.rebuild(SearchToken.INCOME, owner=owner)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_list_page(self):
+        self.assertIndexedQueries('get', reverse('income'))
+        self.assertIndexedQueries('get', reverse('income'), {'size': 25, 'last': 1})
+
+    def test_summaries(self):
+        month = datetime.date.today().month
+        self.assertIndexedQueries('get', reverse('income_category_summary'))
+        self.assertIndexedQueries('get', reverse('income_category_summary'), {'month': month})
+        self.assertIndexedQueries('get', reverse('all_income_summary'))
+        self.assertIndexedQueries('get', reverse('all_income_summary'), {'start': '2020-01-01'})
+        self.assertIndexedQueries('get', reverse('income_stats'))
+
+    def test_search(self):
+        self.assertIndexedQueries('post', reverse('search_income'), json.dumps({'searchText': 'salary'}),
+                                  content_type='application/json')
+
+    def test_export(self):
+        self.assertIndexedQueries('get', reverse('export-income-csv'), {'category': 'Salary', 'start': '2020-01-01'})
+
+
+class AsyncIncomeEndpointTests(TestCase):
+    """The async income endpoints answer exactly like their sync counterparts."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cache.clear()
+        cls.user = seed.get_user('async-income-owner')
+        seed.fill(cls.user, 0, 200)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    async def test_summaries_and_search_match(self):
+        await self.async_client.aforce_login(self.user)
+        month = {'month': datetime.date.today().month}
+        for sync_name, async_name, params in [
+            ('income_category_summary', 'async-income-category-summary', {}),
+            ('income_category_summary', 'async-income-category-summary', month),
+            ('all_income_summary', 'async-all-income-summary', {'start': '2020-01-01'}),
+        ]:
+            with self.subTest(async_name, **params):
+                expected = (await sync_to_async(self.client.get)(reverse(sync_name), params)).json()
+                response = await self.async_client.get(reverse(async_name), params)
+                self.assertEqual(response.json(), expected)
 
-# Create your tests here.
+        body = json.dumps({'searchText': 'salary'})
+        expected = (await sync_to_async(self.client.post)(reverse('search_income'), body,
+                                                          content_type='application/json')).json()
+        response = await self.async_client.post(reverse('async-search-income'), body, content_type='application/json')
+        self.assertEqual(response.json(), expected)
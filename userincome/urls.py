@@ -11,4 +11,6 @@ urlpatterns = [
     path('income_category_summary', views.income_category_summary, name="income_category_summary"),
     path('all_income_summary', views.all_income_summary, name="all_income_summary"),
     path('income_stats', views.income_stats_view, name="income_stats"),
+    path('export_csv', views.export_csv, name="export-income-csv"),
+    path('import', views.import_income, name="import-income"),
 ]
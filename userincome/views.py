@@ -1,48 +1,39 @@
 import datetime
 from django.shortcuts import render, redirect
 from .models import Source, UserIncome
-from django.core.paginator import Paginator
-from userpreferences.models import UserPreference
+from userpreferences import currencies
+from userpreferences.cache import get_currency, get_currency_code
+from ledger import export, imports, labels, money, pagination, responses, rollups, search, summary
+from ledger.models import IncomeRollup, SearchToken
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum
 import json
 from django.http import JsonResponse
 
-def get_user_currency(user):
-    """Helper function to get user's preferred currency."""
-    try:
-        return UserPreference.objects.get(user=user).currency
-    except UserPreference.DoesNotExist:
-        return 'DefaultCurrency'  
-
 def search_income(request):
     """Search income records based on amount, date, description, or source."""
     if request.method == 'POST':
-        search_str = json.loads(request.body).get('searchText')
-        income = UserIncome.objects.filter(
-            amount__istartswith=search_str, owner=request.user) | UserIncome.objects.filter(
-            date__istartswith=search_str, owner=request.user) | UserIncome.objects.filter(
-            description__icontains=search_str, owner=request.user) | UserIncome.objects.filter(
-            source__icontains=search_str, owner=request.user)
-        data = income.values()
-        return JsonResponse(list(data), safe=False)
+        body = json.loads(request.body)
+        try:
+            data = search.search(request.user, SearchToken.INCOME, body.get('searchText'),
+                                 page=body.get('page', 1), page_size=body.get('pageSize', search.DEFAULT_PAGE_SIZE))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse(data, safe=False, encoder=money.JSONEncoder)
 
 
 @login_required(login_url='/authentication/login')
 def index(request):
     """Display all income records for the logged-in user."""
-    sources = Source.objects.all()
-    income = UserIncome.objects.filter(owner=request.user)
-    paginator = Paginator(income, 5)  # Paginate income records
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    sources = labels.choices(Source)
+    income = UserIncome.objects.filter(owner=request.user).select_related('source')
+    page_obj = pagination.paginate(income, request.GET, rollups.count(IncomeRollup, request.user))  # Keyset pages on (date, id)
 
-    currency = get_user_currency(request.user)
+    currency = get_currency(request)
 
     context = {
-        'income': income,
         'page_obj': page_obj,
+        'page_sizes': pagination.PAGE_SIZES,
         'currency': currency,
         'sources': sources
     }
@@ -52,9 +43,11 @@ def index(request):
 @login_required(login_url='/authentication/login')
 def add_income(request):
     """Add a new income record."""
-    sources = Source.objects.all()
+    sources = labels.choices(Source)
     context = {
         'sources': sources,
+        'currencies': currencies.choices(),
+        'selected_currency': request.POST.get('currency') or get_currency_code(request),
         'values': request.POST
     }
     
@@ -66,6 +59,7 @@ def add_income(request):
         description = request.POST.get('description')
         date = request.POST.get('income_date')
         source = request.POST.get('source')
+        currency = request.POST.get('currency', '')
 
         # Get today's date
         today = datetime.date.today()
@@ -74,10 +68,24 @@ def add_income(request):
         if not amount:
             messages.error(request, 'Amount is required')
             return render(request, 'income/add_income.html', context)
+        try:
+            amount = money.parse(amount)
+        except ValueError as e:
+            messages.error(request, str(e))
+            return render(request, 'income/add_income.html', context)
+
+        if currency and currency not in currencies.currencies():
+            messages.error(request, 'Please choose a currency from the list')
+            return render(request, 'income/add_income.html', context)
 
         if not description:
             messages.error(request, 'Description is required')
             return render(request, 'income/add_income.html', context)
+
+        source = labels.resolve(UserIncome, source)
+        if source is None:
+            messages.error(request, 'Please choose a source from the list')
+            return render(request, 'income/add_income.html', context)
         
         if not date:
             messages.error(request, 'Date is required')
@@ -88,7 +96,7 @@ def add_income(request):
             messages.error(request, 'Date cannot be in the future')
             return render(request, 'income/add_income.html', context)
 
-        UserIncome.objects.create(owner=request.user, amount=amount, date=date,
+        UserIncome.objects.create(owner=request.user, amount=amount, date=date, currency=currency,
                                   source=source, description=description)
         messages.success(request, 'Record saved successfully')
         return redirect('income')
@@ -104,11 +112,13 @@ def income_edit(request, id):
         messages.error(request, 'Income record not found.')
         return redirect('income')
 
-    sources = Source.objects.all()
+    sources = labels.choices(Source)
     context = {
         'income': income,
         'values': income,
-        'sources': sources
+        'sources': sources,
+        'currencies': currencies.choices(),
+        'selected_currency': income.currency,
     }
     
     if request.method == 'GET':
@@ -119,6 +129,7 @@ def income_edit(request, id):
         description = request.POST.get('description')
         date = request.POST.get('income_date')
         source = request.POST.get('source')
+        currency = request.POST.get('currency', income.currency)
 
         # Get today's date
         today = datetime.date.today()
@@ -127,10 +138,23 @@ def income_edit(request, id):
         if not amount:
             messages.error(request, 'Amount is required')
             return render(request, 'income/edit_income.html', context)
+        try:
+            amount = money.parse(amount)
+        except ValueError as e:
+            messages.error(request, str(e))
+            return render(request, 'income/edit_income.html', context)
+        if currency and currency not in currencies.currencies():
+            messages.error(request, 'Please choose a currency from the list')
+            return render(request, 'income/edit_income.html', context)
         if not description:
             messages.error(request, 'Description is required')
             return render(request, 'income/edit_income.html', context)
 
+        source = labels.resolve(UserIncome, source)
+        if source is None:
+            messages.error(request, 'Please choose a source from the list')
+            return render(request, 'income/edit_income.html', context)
+
         # Check if the date is in the future
         if datetime.datetime.strptime(date, '%Y-%m-%d').date() > today:
             messages.error(request, 'Date cannot be in the future')
@@ -138,6 +162,7 @@ def income_edit(request, id):
 
         # Update income record
         income.amount = amount
+        income.currency = currency
         income.date = date
         income.source = source
         income.description = description
@@ -160,34 +185,29 @@ def delete_income(request, id):
     return redirect('income')
 
 @login_required(login_url='/authentication/login')
+@responses.cached_per_version
 def income_category_summary(request):
     """Provide a summary of income by category for a selected month."""
     todays_date = datetime.date.today()
+    currency_code = get_currency_code(request)
     six_months_ago = todays_date - datetime.timedelta(days=30 * 6)
 
     # Get the month from the request
-    selected_month = request.GET.get('month')
+    try:
+        month_start = summary.parse_month(request.GET, todays_date)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
 
     # If a month is selected, filter the income by that month
-    if selected_month:
-        income = UserIncome.objects.filter(owner=request.user, 
-                                            date__year=todays_date.year, 
-                                            date__month=selected_month)
+    if month_start:
+        start, end = month_start, month_start
     else:
         # Default to the last 6 months if no month is selected
-        income = UserIncome.objects.filter(owner=request.user, date__gte=six_months_ago, date__lte=todays_date)
+        start, end = six_months_ago, todays_date
+    finalrep = rollups.summarize(IncomeRollup, request.user, start, end, currency=currency_code)
 
     # Calculate total income for the selected month
-    total_income = income.aggregate(total=Sum('amount'))['total'] or 0
-
-    # Group income by category and calculate total amounts
-    income_by_category = income.values('source').annotate(total_amount=Sum('amount'))
-
-    # Prepare the final report in dictionary format
-    finalrep = {}
-    for income_item in income_by_category:
-        category_name = income_item['source']
-        finalrep[category_name] = income_item['total_amount']
+    total_income = sum(finalrep.values())
 
     # Prepare categories and total amounts for the response
     categories = list(finalrep.keys())
@@ -196,52 +216,69 @@ def income_category_summary(request):
     return JsonResponse({
         'categories': categories,
         'total_amounts': total_amounts,
-        'total_income': total_income
-    }, safe=False)
+        'total_income': total_income,
+        'unconverted_currencies': rollups.unconverted(IncomeRollup, request.user, currency_code, start, end),
+    }, safe=False, encoder=money.JSONEncoder)
 
 
 
 @login_required(login_url='/authentication/login')
+@responses.cached_per_version
 def all_income_summary(request):
-    """Provide a summary of all income records by category."""
-    
-    # Fetch all income records for the logged-in user
-    income = UserIncome.objects.filter(owner=request.user)
-
-    # Prepare data for response
-    categories = []
-    total_amounts = []
-    total_income = sum(user_income.amount for user_income in income)
-
-    for user_income in income:
-        if user_income.source not in categories:
-            categories.append(user_income.source)
-            total_amounts.append(user_income.amount)
-        else:
-            index = categories.index(user_income.source)
-            total_amounts[index] += user_income.amount
+    """Provide a summary of all income records by category, optionally within ?start=&end=."""
+    try:
+        start, end = summary.parse_date_range(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    currency_code = get_currency_code(request)
+    categories, total_amounts, total_income = summary.category_totals(UserIncome, request.user, start, end, currency_code)
 
     data = {
         'total_income': total_income,
         'categories': categories,
         'total_amounts': total_amounts,
+        'unconverted_currencies': rollups.unconverted(IncomeRollup, request.user, currency_code, start, end),
     }
 
-    return JsonResponse(data)
+    return JsonResponse(data, encoder=money.JSONEncoder)
 
 
 @login_required(login_url='/authentication/login')
 def income_stats_view(request):
-    
-    user_preferences = UserPreference.objects.filter(user=request.user).first()
     """Display the statistics page for income records."""
-    currency = get_user_currency(request.user)
+    currency = get_currency(request)
 
     # Calculate total income
-    total_income = UserIncome.objects.filter(owner=request.user).aggregate(Sum('amount'))['amount__sum'] or 0
+    currency_code = get_currency_code(request)
+    total_income = sum(rollups.summarize(IncomeRollup, request.user, currency=currency_code).values())
 
     context = {
         'currency': currency,
         'total_income': total_income, 
+        'unconverted_currencies': rollups.unconverted(IncomeRollup, request.user, currency_code),
     }
-    return render(request, 'income/income_stats.html', context)
\ No newline at end of file
+    return render(request, 'income/income_stats.html', context)
+
+
+@login_required(login_url='/authentication/login')
+def export_csv(request):
+    """Stream the user's income records as CSV, optionally filtered and gzipped."""
+    try:
+        return export.csv_response(UserIncome, request.user, request.GET, 'Income')
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+
+@login_required(login_url='/authentication/login')
+def import_income(request):
+    """Bulk-import income records from an uploaded CSV or OFX file."""
+    if request.method != 'POST' or 'file' not in request.FILES:
+        return JsonResponse({'error': 'POST a CSV or OFX file as "file"'}, status=400)
+
+    upload = request.FILES['file']
+    file_format = imports.detect_format(upload, request.POST.get('format'))
+    result = imports.run(UserIncome, request.user, upload, file_format, request.POST.get('source', ''),
+                         get_currency_code(request) or '')
+    return JsonResponse(result)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class UserpreferencesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'userpreferences'
+
+    def ready(self):
+        from . import currencies, signals  # noqa: F401
+        currencies.load()
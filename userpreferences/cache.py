@@ -0,0 +1,64 @@
+"""Cached lookups of a user's UserPreference row.
+
+Preferences are read through Django's cache framework and memoized on the
+request by ``UserPreferencesMiddleware``, so a page load costs at most one
+query and usually none. Saving or deleting a preference drops the entry.
+"""
+from django.core.cache import cache
+
+from . import currencies
+from .models import UserPreference
+
+CACHE_TIMEOUT = 60 * 60
+DEFAULT_CURRENCY = 'DefaultCurrency'
+_MISSING = 'missing'
+
+
+def cache_key(user_id):
+    return f'userpreferences:{user_id}'
+
+
+def get_preferences(user):
+    """Return ``user``'s UserPreference, or None if they have not saved any."""
+    if not user.is_authenticated:
+        return None
+    preferences = cache.get(cache_key(user.pk))
+    if preferences is None:
+        preferences = UserPreference.objects.filter(user=user).first() or _MISSING
+        cache.set(cache_key(user.pk), preferences, CACHE_TIMEOUT)
+    return None if preferences == _MISSING else preferences
+
+
+async def aget_preferences(user):
+    """``get_preferences`` for async views."""
+    if not user.is_authenticated:
+        return None
+    preferences = await cache.aget(cache_key(user.pk))
+    if preferences is None:
+        preferences = await UserPreference.objects.filter(user=user).afirst() or _MISSING
+        await cache.aset(cache_key(user.pk), preferences, CACHE_TIMEOUT)
+    return None if preferences == _MISSING else preferences
+
+
+def get_currency(request):
+    """The request user's preferred currency, or ``DEFAULT_CURRENCY``."""
+    if hasattr(request, 'user_preferences'):
+        preferences = request.user_preferences
+    else:
+        preferences = get_preferences(request.user)
+    return preferences.currency if preferences else DEFAULT_CURRENCY
+
+
+def get_currency_code(request):
+    """The code of the request user's preferred currency, or None if they have not picked one."""
+    return currencies.code_from_label(get_currency(request))
+
+
+async def aget_currency_code(user):
+    """``get_currency_code`` for async views, which pass the user from ``request.auser()``."""
+    preferences = await aget_preferences(user)
+    return currencies.code_from_label(preferences.currency if preferences else DEFAULT_CURRENCY)
+
+
+def invalidate(user_id):
+    cache.delete(cache_key(user_id))
@@ -0,0 +1,96 @@
+"""Registry of the currencies listed in ``currencies.json``.
+
+The file is parsed once when the app is ready into an immutable mapping and
+re-read only when its modification time changes, checked at most every
+``CHECK_INTERVAL`` seconds. Preferences store currencies as labels such as
+``"USD - United States Dollar"``.
+"""
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from django.conf import settings
+
+CHECK_INTERVAL = 5
+
+Currency = namedtuple('Currency', ['code', 'name'])
+
+_lock = threading.Lock()
+_path = None
+_mtime = None
+_checked_at = 0.0
+_by_code = MappingProxyType({})
+_choices = ()
+
+
+def currencies_file():
+    return os.path.join(settings.BASE_DIR, 'currencies.json')
+
+
+def load(path=None):
+    """Parse the currencies file into the registry."""
+    global _path, _mtime, _checked_at, _by_code, _choices
+    path = path or currencies_file()
+    with _lock:
+        mtime = os.stat(path).st_mtime
+        with open(path, 'r') as json_file:
+            data = json.load(json_file)
+        _by_code = MappingProxyType(dict(data))
+        _choices = tuple(Currency(code, name) for code, name in data.items())
+        _path, _mtime, _checked_at = path, mtime, time.monotonic()
+
+
+def _refresh():
+    global _checked_at
+    if _path is None:
+        load()
+        return
+    now = time.monotonic()
+    if now - _checked_at < CHECK_INTERVAL:
+        return
+    _checked_at = now
+    try:
+        changed = os.stat(_path).st_mtime != _mtime
+    except OSError:
+        return
+    if changed:
+        load(_path)
+
+
+def currencies():
+    """Read-only mapping of currency code to name."""
+    _refresh()
+    return _by_code
+
+
+def choices():
+    """``Currency`` tuples in file order, for select boxes."""
+    _refresh()
+    return _choices
+
+
+def name(code):
+    return currencies().get(code)
+
+
+def label(code):
+    """The ``"CODE - Name"`` form stored on UserPreference, or None for unknown codes."""
+    currency_name = name(code)
+    return f'{code} - {currency_name}' if currency_name else None
+
+
+def code_from_label(value):
+    """The code of a ``"CODE - Name"`` label or bare code, or None if it is not a known currency."""
+    code = (value or '').split(' - ', 1)[0].strip()
+    if code not in currencies():
+        return None
+    if value.strip() not in (code, label(code)):
+        return None
+    return code
+
+
+def is_valid(value):
+    return code_from_label(value) is not None
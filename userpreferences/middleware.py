@@ -0,0 +1,24 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import SimpleLazyObject
+
+from .cache import get_preferences
+
+
+class UserPreferencesMiddleware:
+    """Attach a lazy, memoized ``request.user_preferences``.
+
+    Must come after ``AuthenticationMiddleware``. Async views should await
+    ``cache.aget_preferences`` instead, since resolving the lazy object queries
+    the database.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.user_preferences = SimpleLazyObject(lambda: get_preferences(request.user))
+        return self.get_response(request)
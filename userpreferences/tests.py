@@ -1,3 +1,82 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from benchmarks import seed
+from . import cache as preferences, currencies
+from .models import UserPreference
+
+
+class PreferenceCacheTests(TestCase):
+    """Preferences are served from the cache until they are saved or deleted."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = seed.get_user('preference-owner')
+        self.client.force_login(self.user)
+
+    def test_cached_until_changed(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(preferences.get_preferences(self.user))
+        with self.assertNumQueries(0):
+            self.assertIsNone(preferences.get_preferences(self.user))
+
+        self.client.post(reverse('preferences'), {'currency': 'EUR - Euro'})
+        self.assertEqual(preferences.get_preferences(self.user).currency, 'EUR - Euro')
+        with self.assertNumQueries(0):
+            preferences.get_preferences(self.user)
+
+        self.client.post(reverse('preferences'), {'currency': 'INR'})
+        self.assertEqual(self.client.get(reverse('stats')).context['currency'], 'INR - Indian Rupee')
+
+        UserPreference.objects.get(user=self.user).delete()
+        self.assertEqual(self.client.get(reverse('stats')).context['currency'], preferences.DEFAULT_CURRENCY)
+
+    async def test_async_lookups_see_changes(self):
+        self.assertIsNone(await preferences.aget_preferences(self.user))
+        preference = await UserPreference.objects.acreate(user=self.user, currency='GBP - British Pound Sterling')
+        self.assertEqual(await preferences.aget_currency_code(self.user), 'GBP')
+        preference.currency = 'JPY - Japanese Yen'
+        await preference.asave()
+        self.assertEqual(await preferences.aget_currency_code(self.user), 'JPY')
+
+
+class CurrencyRegistryTests(SimpleTestCase):
+    """The registry re-reads currencies.json only when its modification time changes."""
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        self.write({'USD': 'United States Dollar', 'EUR': 'Euro'}, mtime=1_000_000)
+        currencies.load(self.path)
+        self.addCleanup(currencies.load, currencies.currencies_file())
+
+    def write(self, data, mtime):
+        with open(self.path, 'w') as json_file:
+            json.dump(data, json_file)
+        os.utime(self.path, (mtime, mtime))
+
+    def test_reloads_when_the_file_changes(self):
+        self.assertEqual(currencies.choices(), (('USD', 'United States Dollar'), ('EUR', 'Euro')))
+        self.assertIsNone(currencies.code_from_label('CHF - Swiss Franc'))
+
+        self.write({'USD': 'United States Dollar', 'CHF': 'Swiss Franc'}, mtime=2_000_000)
+        # Not looked at again until CHECK_INTERVAL has passed.
+        self.assertEqual(currencies.label('EUR'), 'EUR - Euro')
+        with mock.patch.object(currencies, 'CHECK_INTERVAL', 0):
+            self.assertEqual(currencies.code_from_label('CHF - Swiss Franc'), 'CHF')
+            self.assertIsNone(currencies.label('EUR'))
+            self.assertEqual([currency.code for currency in currencies.choices()], ['USD', 'CHF'])
+
+    def test_same_mtime_is_not_reread(self):
+        self.write({'JPY': 'Japanese Yen'}, mtime=1_000_000)
+        with mock.patch.object(currencies, 'CHECK_INTERVAL', 0):
+            self.assertEqual(set(currencies.currencies()), {'USD', 'EUR'})
+        with self.assertRaises(TypeError):
+            currencies.currencies()['JPY'] = 'Japanese Yen'
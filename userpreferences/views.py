@@ -1,35 +1,31 @@
 from django.shortcuts import render
-import os
-import json
-from django.conf import settings
 from .models import UserPreference
+from .cache import get_preferences
+from . import currencies
 from django.contrib import messages
 # Create your views here.
 
 
 def index(request):
-    currency_data = []
-    file_path = os.path.join(settings.BASE_DIR, 'currencies.json')
+    currency_data = currencies.choices()
 
-    with open(file_path, 'r') as json_file:
-        data = json.load(json_file)
-        for k, v in data.items():
-            currency_data.append({'name': k, 'value': v})
-
-    exists = UserPreference.objects.filter(user=request.user).exists()
-    user_preferences = None
-    if exists:
-        user_preferences = UserPreference.objects.get(user=request.user)
+    user_preferences = get_preferences(request.user)
     if request.method == 'GET':
 
         return render(request, 'preferences/index.html', {'currencies': currency_data,'user_preferences': user_preferences})
     else:
 
         currency = request.POST['currency']
-        if exists:
+        code = currencies.code_from_label(currency)
+        if code is None:
+            messages.error(request, 'Please choose a currency from the list')
+            return render(request, 'preferences/index.html', {'currencies': currency_data, 'user_preferences': user_preferences})
+
+        currency = currencies.label(code)
+        if user_preferences:
             user_preferences.currency = currency
             user_preferences.save()
         else:
-            UserPreference.objects.create(user=request.user, currency=currency)
+            user_preferences = UserPreference.objects.create(user=request.user, currency=currency)
         messages.success(request, 'Changes saved')
         return render(request, 'preferences/index.html', {'currencies': currency_data, 'user_preferences': user_preferences})
\ No newline at end of file